@@ -1,14 +1,570 @@
+from enum import IntEnum
 
 
+"""
+Compiler for shift DMA programs
+
+Takes a list of copies between nodes and packs them into as few instructions as possible.
+Copies that do not depend on each other are issued back to back, NOPs are only inserted
+where a copy would otherwise read or write a location before an earlier copy is done with it.
+
+Ring timing (see shift_dma.py and Controller.elaborate):
+    - each node (including the internal node 0 of the controller) is 3 register stages long
+    - the controller adds 1 extra register stage on the loop back input
+    - a copy issued at cycle c reaches node n at cycle c + 1 + 3*n
+    - reads happen on the first pass, writes happen on the first pass after the read (so the write
+      wraps around the ring when the destination is at or before the source)
+    - a copy that wraps around blocks the controller from issuing for 1 cycle when it passes back through
+    - the first instruction of a program is executed twice
+    - a COPY_BLOCK issues one word per cycle and stalls the same way as a run of single COPYs
+    - a WAIT_CYCLES takes the same time as the same number of NOPs (at least 1 cycle), WAIT_EVENT takes at least 1 cycle
+    - a COPY_MULTICAST is timed like a COPY, each destination is written as the data passes it (destinations at or
+      before the source on the second pass)
+
+The controller also has a read after write scoreboard that holds back a copy until its source has been written.
+Compiled programs never trigger it (reads are already scheduled after the writes they depend on), so the
+predicted timing stays exact, it only protects hand written programs. Write after read and write after write
+ordering is still up to the compiler.
+Copies that wrap around take a scoreboard entry until their write lands and the controller stalls them while all
+entries are in use, the compiler tracks the entries and only issues wrapping copies when one is free.
+"""
+
+
+class Instruction(IntEnum):
+    # must match shift_dma_controller.Instruction
+    END = 0     # end of program
+    NOP = 1     # no operation
+    COPY = 2    # copy data from source to destination
+    WAIT_CYCLES = 3 # stall for the number of cycles in bits 0-31
+    COPY_BLOCK = 4  # copy a block of consecutive words, length is set in bits 52-63
+    WAIT_EVENT = 5  # stall until an event in the bits 0-15 mask happens, optional timeout (cycles) in bits 16-47
+    COPY_MULTICAST = 6  # copy one word to every node in the destination node mask (bits 8-15 nodes 0-7, bits 52-59 nodes 8-15)
+
+
+MAX_BLOCK_LENGTH = 0xFFF
+MULTICAST_NODES = 16    # nodes 0-15 of a ring can be COPY_MULTICAST destinations
+
+COPY_KINDS = ("copy", "multicast")     # high level instructions that move data, everything else splits the program into sections
+MAX_WAIT_CYCLES = 0xFFFFFFFF
+
+
+def create_instruction(source_node, destination_node, source_address, destination_address, instruction, length=0):
+    data = source_node | (destination_node << 8) | (source_address << 16) | (destination_address << 32) | (instruction << 48) | (length << 52)
+    return data
+
+
+def transfer_lengths_word(compilers) -> int:
+    """
+    Get PS to PL control word 1 (Controller.TRANSFER_LENGTHS_OFFSET) for the compiled programs of all rings,
+    the axi transfer then only moves the data and instructions the programs use
+
+    compilers: the compiler of each ring in ring order, after compile()
+    """
+
+    lengths = {"ps_to_pl_data": 0, "pl_to_ps_data": 0, "instructions": 0}
+    for ring, ring_compiler in enumerate(compilers):
+        # banks of all rings are one continuous region, ring 0 first
+        bank_sizes = {"ps_to_pl_data": ring_compiler.data_memory_depth // 2, "pl_to_ps_data": ring_compiler.data_memory_depth // 2, "instructions": ring_compiler.instruction_memory_depth}
+        for region, length in ring_compiler.transfer_lengths.items():
+            if length:
+                lengths[region] = max(lengths[region], ring*bank_sizes[region] + length)
+
+    # 0 moves the whole region, so a region that is not used still moves 1 word
+    lengths = {region: max(length, 1) for region, length in lengths.items()}
+    return lengths["ps_to_pl_data"] | (lengths["pl_to_ps_data"] << 16) | (lengths["instructions"] << 32)
 
 
 class compiler:
-    def __init__(self):
+    def __init__(self, nodes, instruction_memory_depth=256, use_blocks=True, use_waits=True, scoreboard_depth=16, data_memory_depth=1024):
+        """
+        nodes: ring order of the rtl nodes, use Controller.rings[ring] (or a node count if the nodes are not named)
+        node 0 is always the controller data memory bank of the ring and does not need to be included
+        each ring runs its own program, so use one compiler per ring
+
+        instruction_memory_depth: size of the instruction memory of the ring in 64 bit words (Controller.RING_INSTRUCTION_MEMORY_SIZE)
+
+        use_blocks: merge runs of consecutive copies into COPY_BLOCK instructions
+
+        use_waits: replace runs of NOPs with WAIT_CYCLES instructions
+
+        scoreboard_depth: must match shift_dma_controller.scoreboard_depth, 0 if the ring has no scoreboard
+
+        data_memory_depth: size of each half of the ring's controller data memory in 32 bit words (Controller.RING_DATA_MEMORY_SIZE)
+        controller addresses below it are sent to the PS, addresses from it up to twice it are received from the PS
+        """
+
+        if isinstance(nodes, int):
+            nodes = [f"node_{i+1}" for i in range(nodes)]
+
+        if len(nodes) >= 256:
+            raise ValueError("Too many nodes, max is 255")
+
+        self.node_addresses = {"controller": 0}
+        for node_address, node_name in enumerate(nodes, start=1):
+            self.node_addresses[node_name] = node_address
+
+        self.node_count = len(nodes)
+        self.loop_cycles = 3*(self.node_count+1) + 1    # cycles for a copy to pass around the whole ring
+        self.instruction_memory_depth = instruction_memory_depth
+        self.use_blocks = use_blocks
+        self.use_waits = use_waits
+        self.scoreboard_depth = scoreboard_depth
+        self.data_memory_depth = data_memory_depth
+
         self.high_level_instructions = []
         self.output = []
 
+        self.predicted_cycles = 0
+        self.nop_count = 0
+        self.schedule = []
+        self.transfer_lengths = {}
+
     def copy(self, src_node, src_addr, dest_node, dest_addr):
-        self.high_level_instructions.append([src_node, dest_node, "copy"])
-def compile():
-    output = []
-    return output
\ No newline at end of file
+        """
+        Add a copy to the program, nodes can be given by name or by node address
+
+        copies behave as if they are executed in the order they are added
+        """
+
+        src_node = self.__node_address(src_node)
+        dest_node = self.__node_address(dest_node)
+
+        if src_addr not in range(0x10000) or dest_addr not in range(0x10000):
+            raise ValueError("Invalid address, must be 16 bit")
+
+        self.high_level_instructions.append([src_node, dest_node, src_addr, dest_addr, "copy"])
+
+    def copy_block(self, src_node, src_addr, dest_node, dest_addr, length):
+        """
+        Add a copy of length consecutive words to the program
+
+        each word is scheduled like a single copy, words that end up issued back to back are merged into COPY_BLOCK instructions
+        """
+
+        if length < 1:
+            raise ValueError("Block length must be at least 1")
+
+        for offset in range(length):
+            self.copy(src_node, src_addr + offset, dest_node, dest_addr + offset)
+
+    def multicast(self, src_node, src_addr, dest_nodes, dest_addr):
+        """
+        Add a copy of one word to the same address on several nodes, the source is only read once
+
+        dest_nodes: list of nodes by name or by node address, only nodes 0-15 can be multicast destinations
+        """
+
+        src_node = self.__node_address(src_node)
+        dest_nodes = sorted(set([self.__node_address(node) for node in dest_nodes]))
+
+        if len(dest_nodes) == 0:
+            raise ValueError("Multicast needs at least one destination")
+        if len(dest_nodes) == 1:
+            self.copy(src_node, src_addr, dest_nodes[0], dest_addr)
+            return
+        if dest_nodes[-1] >= MULTICAST_NODES:
+            raise ValueError(f"Node {dest_nodes[-1]} can not be a multicast destination, only nodes 0-{MULTICAST_NODES-1} can")
+
+        if src_addr not in range(0x10000) or dest_addr not in range(0x10000):
+            raise ValueError("Invalid address, must be 16 bit")
+
+        self.high_level_instructions.append([src_node, tuple(dest_nodes), src_addr, dest_addr, "multicast"])
+
+    def wait_cycles(self, cycles):
+        """
+        Add a fixed delay to the program, copies added after the wait are not issued until it is over
+        """
+
+        if cycles not in range(MAX_WAIT_CYCLES+1):
+            raise ValueError("Invalid wait, must be 32 bit")
+
+        self.high_level_instructions.append([None, None, None, None, "wait_cycles", cycles])
+
+    def wait_event(self, events, timeout=0):
+        """
+        Add a wait for any of the events in the mask (see timer_event and node_done_event)
+
+        timeout: give up waiting after this many cycles, 0 waits forever (the dma cycle will not finish if the event never happens)
+
+        copies added before the wait are finished before it starts, so predicted_cycles is the minimum when the program has event waits
+        """
+
+        if events not in range(1, 0x10000):
+            raise ValueError("Invalid event mask, must be 16 bit and not 0")
+        if timeout not in range(MAX_WAIT_CYCLES+1):
+            raise ValueError("Invalid timeout, must be 32 bit")
+
+        self.high_level_instructions.append([None, None, None, None, "wait_event", events, timeout])
+
+    def timer_event(self, timer):
+        """
+        Get the event mask for a Global_Timers timer pulse
+        """
+
+        if timer not in range(8):
+            raise ValueError("Invalid timer, must be 0-7")
+        return 1 << timer
+
+    def node_done_event(self, node):
+        """
+        Get the event mask for the done flag of a node, only nodes 1-8 of a ring have done events
+        """
+
+        node = self.__node_address(node)
+        if node not in range(1, 9):
+            raise ValueError(f"Node {node} does not have a done event, only nodes 1-8 do")
+        return 1 << (node + 7)
+
+    def compile(self) -> list:
+        """
+        Generate the instruction words for the program
+
+        returns a list of 64 bit instructions ending with END, the predicted cycle count is stored in predicted_cycles
+        and the 64 bit words of each axi region the program uses are stored in transfer_lengths
+
+        predicted_cycles is the number of sync_100 cycles busy is high for one run, the same value perf_busy_cycles counts:
+        busy rises on the clock edge that samples start and the count includes that cycle, the copies still draining from the ring
+        after busy goes low are not included
+        """
+
+        transfers = self.high_level_instructions
+
+        # find which earlier copies each copy has to wait for
+        dependencies = []
+        for index, transfer in enumerate(transfers):
+            deps = []
+            for prev_index in range(index):
+                if transfer[4] not in COPY_KINDS or transfers[prev_index][4] not in COPY_KINDS:
+                    continue
+                read, writes = self.__locations(transfer)
+                prev_read, prev_writes = self.__locations(transfers[prev_index])
+
+                if read in prev_writes:
+                    deps.append((prev_index, "read_after_write", read))
+                for write in writes:
+                    if write in prev_writes:
+                        deps.append((prev_index, "write_after_write", write))
+                    if write == prev_read:
+                        deps.append((prev_index, "write_after_read", write))
+            dependencies.append(deps)
+
+        # waits split the program into sections, copies are only reordered inside a section
+        waits = [index for index, transfer in enumerate(transfers) if transfer[4] not in COPY_KINDS]
+
+        scheduled = {}  # transfer index: (issue cycle, read cycle, {destination: write cycle})
+        blocked_cycles = set()  # cycles where a wrapping copy passes back through the controller
+        scoreboard = []     # last cycle each scoreboard entry is in use
+
+        # the controller fetches the first instruction twice when it starts, a NOP makes that harmless
+        self.output = [create_instruction(0, 0, 0, 0, Instruction.NOP)]
+        self.schedule = []
+        cycle = 2
+        section_start = 0
+
+        for section_end in waits + [len(transfers)]:
+            cycle = self.__schedule_section(list(range(section_start, section_end)), dependencies, scheduled, blocked_cycles, scoreboard, cycle)
+            section_start = section_end + 1
+
+            if section_end == len(transfers):
+                break
+
+            if transfers[section_end][4] == "wait_cycles":
+                cycles = transfers[section_end][5]
+                self.output.append(cycles | (Instruction.WAIT_CYCLES << 48))
+                cycle += max(cycles, 1)
+
+            else:
+                # the event can take any amount of time, so finish everything in the ring first to keep the timing of later copies valid
+                last_write = max([max(s[2].values()) for s in scheduled.values()], default=-1)
+                while cycle <= last_write:
+                    self.output.append(create_instruction(0, 0, 0, 0, Instruction.NOP))
+                    cycle += 1
+
+                events, timeout = transfers[section_end][5:7]
+                self.output.append(events | (timeout << 16) | (Instruction.WAIT_EVENT << 48))
+                cycle += 1
+
+        # wait for all writes to land before ending, otherwise the axi transfer may miss data
+        last_write = max([max(s[2].values()) for s in scheduled.values()], default=-1)
+        while cycle <= last_write:
+            self.output.append(create_instruction(0, 0, 0, 0, Instruction.NOP))
+            cycle += 1
+
+        self.output.append(create_instruction(0, 0, 0, 0, Instruction.END))
+
+        self.predicted_cycles = cycle
+        self.nop_count = sum([((instruction >> 48) & 0xF) == Instruction.NOP for instruction in self.output])
+
+        if self.use_blocks:
+            self.output = self.__merge_blocks(self.output)
+        if self.use_waits:
+            self.output = self.__merge_waits(self.output)
+
+        if len(self.output) > self.instruction_memory_depth:
+            raise ValueError(f"Program does not fit in instruction memory ({len(self.output)} > {self.instruction_memory_depth})")
+
+        self.transfer_lengths = self.__transfer_lengths()
+
+        return self.output
+
+    def __schedule_section(self, pending, dependencies, scheduled, blocked_cycles, scoreboard, cycle):
+        """
+        INTERNAL\n
+        Issue the copies of one section of the program as early as their hazards allow
+
+        returns the cycle after the last instruction of the section
+        """
+
+        transfers = self.high_level_instructions
+
+        while pending:
+            # copies stall in hardware while the ring is blocked, so they can be placed early
+            issue_cycle = cycle
+            while issue_cycle in blocked_cycles:
+                issue_cycle += 1
+
+            scoreboard_full = self.scoreboard_depth and sum([end >= issue_cycle for end in scoreboard]) >= self.scoreboard_depth
+
+            read_cycle = write_cycles = None
+            choice = None
+            for index in pending:
+                if scoreboard_full and self.__wraps(transfers[index]):
+                    continue
+                read_cycle, write_cycles = self.__access_cycles(transfers[index], issue_cycle)
+                if self.__ready(dependencies[index], scheduled, read_cycle, write_cycles):
+                    choice = index
+                    break
+
+            if choice is None:
+                # nothing can be issued yet, wait for the hazard to clear
+                self.output.append(create_instruction(0, 0, 0, 0, Instruction.NOP))
+                cycle += 1
+                continue
+
+            src_node, dest_node, src_addr, dest_addr, kind = transfers[choice]
+            if kind == "multicast":
+                mask = sum([1 << node for node in dest_node])
+                self.output.append(create_instruction(src_node, mask & 0xFF, src_addr, dest_addr, Instruction.COPY_MULTICAST, mask >> 8))
+            else:
+                self.output.append(create_instruction(src_node, dest_node, src_addr, dest_addr, Instruction.COPY))
+
+            if self.__wraps(transfers[choice]):   # copy wraps around and occupies the slot for a second pass
+                blocked_cycles.add(issue_cycle + self.loop_cycles)
+                # the scoreboard entry is freed after the last write, multicast entries count down one pass
+                scoreboard.append(issue_cycle + (self.loop_cycles if kind == "multicast" else 3*dest_node + self.loop_cycles))
+
+            scheduled[choice] = (issue_cycle, read_cycle, write_cycles)
+            self.schedule.append([choice, issue_cycle, read_cycle, max(write_cycles.values())])
+            pending.remove(choice)
+            cycle = issue_cycle + 1
+
+        return cycle
+
+    def __merge_blocks(self, program):
+        """
+        INTERNAL\n
+        Replace runs of adjacent copies between consecutive addresses with COPY_BLOCK instructions
+
+        the controller issues a block one word per opening, so the timing is the same as the individual copies
+        """
+
+        merged = []
+        block = None    # [src_node, dest_node, src_addr, dest_addr, length]
+
+        for instruction in program + [None]:
+            if instruction is not None and ((instruction >> 48) & 0xF) == Instruction.COPY:
+                src_node = instruction & 0xFF
+                dest_node = (instruction >> 8) & 0xFF
+                src_addr = (instruction >> 16) & 0xFFFF
+                dest_addr = (instruction >> 32) & 0xFFFF
+
+                if block is not None and block[4] < MAX_BLOCK_LENGTH and (src_node, dest_node, src_addr, dest_addr) == (block[0], block[1], block[2] + block[4], block[3] + block[4]):
+                    block[4] += 1
+                    continue
+
+                if block is not None:
+                    merged.append(self.__block_instruction(block))
+                block = [src_node, dest_node, src_addr, dest_addr, 1]
+                continue
+
+            if block is not None:
+                merged.append(self.__block_instruction(block))
+                block = None
+            if instruction is not None:
+                merged.append(instruction)
+
+        return merged
+
+    def __merge_waits(self, program):
+        """
+        INTERNAL\n
+        Replace runs of NOPs and WAIT_CYCLES with a single WAIT_CYCLES
+
+        the first instruction is executed twice when the controller starts, so it is left alone
+        """
+
+        merged = program[:1]
+        run = []    # cycles of each instruction in the current run
+
+        for instruction in program[1:] + [None]:
+            if instruction is not None:
+                opcode = (instruction >> 48) & 0xF
+                if opcode == Instruction.NOP:
+                    run.append(1)
+                    continue
+                if opcode == Instruction.WAIT_CYCLES:
+                    run.append(max(instruction & 0xFFFFFFFF, 1))
+                    continue
+
+            if len(run) == 1 and run[0] == 1:
+                merged.append(create_instruction(0, 0, 0, 0, Instruction.NOP))
+            elif run:
+                merged.append(min(sum(run), MAX_WAIT_CYCLES) | (Instruction.WAIT_CYCLES << 48))
+                if sum(run) > MAX_WAIT_CYCLES:
+                    raise ValueError("Wait is too long")
+            run = []
+
+            if instruction is not None:
+                merged.append(instruction)
+
+        return merged
+
+    def __block_instruction(self, block):
+        """
+        INTERNAL\n
+        Encode a merged block, single words stay as plain copies
+        """
+
+        src_node, dest_node, src_addr, dest_addr, length = block
+        if length == 1:
+            return create_instruction(src_node, dest_node, src_addr, dest_addr, Instruction.COPY)
+        return create_instruction(src_node, dest_node, src_addr, dest_addr, Instruction.COPY_BLOCK, length)
+
+    def __node_address(self, node):
+        """
+        INTERNAL\n
+        Convert a node name or address to a node address
+        """
+
+        if isinstance(node, str):
+            if node not in self.node_addresses:
+                raise ValueError(f"Unknown node '{node}'")
+            return self.node_addresses[node]
+
+        if node not in range(self.node_count+1):    # copies to missing nodes never complete and lock up the dma
+            raise ValueError(f"Invalid node address {node}, ring only has {self.node_count} nodes")
+        return node
+
+    def __locations(self, transfer):
+        """
+        INTERNAL\n
+        Get the (node, address) a copy reads and the list of (node, address) it writes
+        """
+
+        src_node, dest_node, src_addr, dest_addr, kind = transfer[:5]
+        dest_nodes = dest_node if kind == "multicast" else (dest_node,)
+
+        return (src_node, src_addr), [(node, dest_addr) for node in dest_nodes]
+
+    def __transfer_lengths(self):
+        """
+        INTERNAL\n
+        Get how many 64 bit words from the start of the ring's bank of each axi region the program uses
+        """
+
+        ps_to_pl_data = pl_to_ps_data = 0
+        for transfer in self.high_level_instructions:
+            if transfer[4] not in COPY_KINDS:
+                continue
+            read, writes = self.__locations(transfer)
+
+            for node, address in [read] + writes:
+                if node == 0 and address >= 2*self.data_memory_depth:
+                    raise ValueError(f"Invalid controller address {address}, the controller data memory only has {2*self.data_memory_depth} words")
+
+            if read[0] == 0 and read[1] >= self.data_memory_depth:
+                ps_to_pl_data = max(ps_to_pl_data, (read[1] - self.data_memory_depth) // 2 + 1)
+            for node, address in writes:
+                if node == 0 and address < self.data_memory_depth:
+                    pl_to_ps_data = max(pl_to_ps_data, address // 2 + 1)
+
+        return {"ps_to_pl_data": ps_to_pl_data, "pl_to_ps_data": pl_to_ps_data, "instructions": len(self.output)}
+
+    def __wraps(self, transfer):
+        """
+        INTERNAL\n
+        Check if a copy writes on its second pass around the ring
+        """
+
+        read, writes = self.__locations(transfer)
+        return min([write[0] for write in writes]) <= read[0]
+
+    def __access_cycles(self, transfer, issue_cycle):
+        """
+        INTERNAL\n
+        Get the cycle that a copy will read its source at and the cycle each of its destinations is written at
+        """
+
+        read, writes = self.__locations(transfer)
+        src_node = read[0]
+
+        read_cycle = issue_cycle + 1 + 3*src_node
+        write_cycles = {}
+        for write in writes:
+            write_cycles[write] = issue_cycle + 1 + 3*write[0]
+            if write[0] <= src_node:   # write happens on the next pass around the ring
+                write_cycles[write] += self.loop_cycles
+
+        return read_cycle, write_cycles
+
+    def __ready(self, dependencies, scheduled, read_cycle, write_cycles):
+        """
+        INTERNAL\n
+        Check if a copy can be issued with the given read and write cycles
+        """
+
+        for prev_index, hazard, location in dependencies:
+            if prev_index not in scheduled:     # keep program order between copies that touch the same location
+                return False
+
+            _, prev_read_cycle, prev_write_cycles = scheduled[prev_index]
+
+            if hazard == "read_after_write" and read_cycle <= prev_write_cycles[location]:
+                return False
+            if hazard == "write_after_write" and write_cycles[location] <= prev_write_cycles[location]:
+                return False
+            if hazard == "write_after_read" and write_cycles[location] <= prev_read_cycle:
+                return False
+
+        return True
+
+
+if __name__ == "__main__":
+
+    node_count = 4
+
+    # same copies as the shift_dma.py test bench, which uses 2 NOP blocks of node_count*2+3 padding
+    c = compiler(node_count)
+    c.copy(0, 1, 2, 1)  # forward copy
+    c.copy(2, 1, 4, 1)  # forward copy
+    c.copy(4, 1, 4, 2)  # self copy
+    c.copy(4, 2, 3, 2)  # reverse copy
+    c.copy(3, 2, 0, 2)  # copy to controller mem
+    c.copy(3, 2, 0, 9)
+    c.copy(0, 2, 3, 10)
+    c.copy(3, 2, 0, 10)
+
+    program = c.compile()
+
+    for index, instruction in enumerate(program):
+        print(f"{index}:\t0x{instruction:016x}")
+
+    print(f"instructions: {len(program)}, NOPs: {c.nop_count}, predicted cycles: {c.predicted_cycles}")
+    print(f"transfer lengths: {c.transfer_lengths}, control word 0x{transfer_lengths_word([c]):016x}")
+
+    # bulk transfer, like a 64 word serial cyclic block
+    c = compiler(node_count)
+    c.copy_block(0, 0x100, 1, 0, 64)
+    c.copy_block(1, 0x40, 0, 0x200, 64)
+    program = c.compile()
+    print(f"block program: {len(program)} instructions ({len(c.high_level_instructions)} copies), predicted cycles: {c.predicted_cycles}")
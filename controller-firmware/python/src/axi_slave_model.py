@@ -0,0 +1,371 @@
+import numpy as np
+from collections import deque
+
+
+"""
+Bus functional model of an AXI3 slave with a memory behind it (the Zynq OCM as the controller sees it)
+
+The memory is a NumPy array, so test data can be loaded and checked in bulk. Backpressure and latency are random
+with a fixed seed, so a run can be repeated exactly. Every handshake is checked against the AXI rules the controller
+relies on, and every burst is recorded so memory update time, latency and bandwidth can be measured in simulation.
+
+The model works with any Amaranth testbench, the bus is any object with the AXI signals as attributes (like Controller).
+Only the signals the bus has are used: ID, WSTRB, AxCACHE, AxUSER and response signals are optional.
+Responses are returned in order and write data interleaving is not supported.
+"""
+
+
+BURST_INCR = 0b01
+
+
+class axi_slave_model:
+
+    def __init__(self, base_address:int, size:int, data_width:int=64, max_outstanding:int=4, max_burst_length:int=16, read_latency=1, write_latency=1, backpressure=None, seed:int=0, strict:bool=True, coherent:bool=False):
+        """
+        base_address/size: bytes of the address space the memory covers, accesses outside of it are errors
+
+        data_width: bus width in bits, 32 or 64
+
+        max_outstanding: bursts the slave accepts in each direction before it holds AWREADY/ARREADY low
+
+        max_burst_length: beats per burst (16 for AXI3)
+
+        read_latency/write_latency: cycles from the address handshake to the first read beat or to the write response (after the last write beat)
+        an int, an inclusive (min, max) tuple for a uniform distribution, or a function of a numpy Generator that returns an int
+
+        backpressure: probability that AWREADY, WREADY, ARREADY, RVALID and BVALID are allowed high in a cycle
+        a float for all of them or a dict with any of these signal names, missing ones are 1.0 (no backpressure)
+
+        strict: raise on the first protocol error instead of only recording it in errors
+
+        coherent: the slave is the Zynq ACP, every burst must be a coherent access (AxCACHE[1] and AxUSER[0] set)
+        """
+
+        if data_width not in (32, 64):
+            raise ValueError("Data width must be 32 or 64")
+        if size % (data_width // 8) != 0 or base_address % (data_width // 8) != 0:
+            raise ValueError("Memory must be aligned to the bus width")
+
+        self.base_address = base_address
+        self.size = size
+        self.data_width = data_width
+        self.bytes_per_beat = data_width // 8
+        self.max_outstanding = max_outstanding
+        self.max_burst_length = max_burst_length
+        self.strict = strict
+        self.coherent = coherent
+
+        self.read_latency = self.__distribution(read_latency)
+        self.write_latency = self.__distribution(write_latency)
+
+        if backpressure is None:
+            backpressure = {}
+        if not isinstance(backpressure, dict):
+            backpressure = {name: backpressure for name in ("AWREADY", "WREADY", "ARREADY", "RVALID", "BVALID")}
+        self.backpressure = {name: backpressure.get(name, 1.0) for name in ("AWREADY", "WREADY", "ARREADY", "RVALID", "BVALID")}
+
+        self.memory = np.zeros(size // self.bytes_per_beat, dtype=np.uint64 if data_width == 64 else np.uint32)
+        self.rng = np.random.default_rng(seed)
+
+        self.reset()
+
+    def reset(self):
+        """
+        Drop every burst in flight and clear the statistics (memory contents are kept)
+        """
+
+        self.cycle = 0
+        self.read_queue = deque()   # accepted read bursts waiting for data: [ready cycle, address, beats left, id, record]
+        self.read_burst = None      # burst that is returning data
+        self.write_queue = deque()  # accepted write addresses: [address, beats, id, record]
+        self.write_beats = deque()  # write beats that are not matched to an address yet: (data, strobe, last)
+        self.response_queue = deque()   # finished write bursts waiting for a response: [ready cycle, id, record]
+        self.previous = None
+        self.errors = []
+        self.clear_statistics()
+
+    def clear_statistics(self):
+        """
+        Forget the recorded bursts, for measuring one memory update at a time
+        """
+
+        self.read_bursts = []   # dicts of address, beats and the cycles of the address handshake, first and last beat
+        self.write_bursts = []  # dicts of address, beats and the cycles of the address handshake, last beat and response
+
+    def write(self, address:int, values):
+        """
+        Write bus words into memory starting at a byte address
+        """
+
+        values = np.atleast_1d(np.asarray(values, dtype=self.memory.dtype))
+        index = self.__index(address, len(values))
+        self.memory[index:index + len(values)] = values
+
+    def read(self, address:int, count:int=1) -> np.ndarray:
+        """
+        Read bus words from memory starting at a byte address (returns a copy)
+        """
+
+        index = self.__index(address, count)
+        return self.memory[index:index + count].copy()
+
+    def testbench(self, bus, domain:str="sync", cycles:int=None):
+        """
+        Returns an async testbench function that runs the slave on the bus, add it with Simulator.add_testbench
+
+        domain: clock domain of the AXI interface
+
+        cycles: stop after this many cycles, None runs forever (add it with background=True so the simulation can end)
+        """
+
+        async def testbench(ctx):
+            self.__drive(ctx, bus, None)
+            while cycles is None or self.cycle < cycles:
+                sample = self.__sample(ctx, bus)
+                self.__check_stable(sample)
+                await ctx.tick(domain)
+                self.cycle += 1
+                self.__handshakes(sample)
+                self.__drive(ctx, bus, sample)
+
+        return testbench
+
+    def report(self, clock_frequency:float=None) -> dict:
+        """
+        Summary of the recorded bursts
+
+        latency is in cycles from the address handshake to the first read beat / write response, including the wait behind earlier bursts
+        bandwidth is in bytes per cycle from the first address handshake to the last beat, and in MB/s if clock_frequency (Hz) is given
+        """
+
+        def summary(bursts, latency_start, latency_end, last):
+            beats = sum(burst["beats"] for burst in bursts)
+            result = {"bursts": len(bursts), "beats": beats, "bytes": beats * self.bytes_per_beat}
+            finished = [burst for burst in bursts if burst[latency_end] is not None and burst[last] is not None]
+            if finished:
+                latency = np.array([burst[latency_end] - burst[latency_start] for burst in finished])
+                span = max(burst[last] for burst in finished) - min(burst["address_cycle"] for burst in bursts) + 1
+                result.update(latency_min=int(latency.min()), latency_mean=float(latency.mean()), latency_max=int(latency.max()), cycles=span, bytes_per_cycle=result["bytes"] / span)
+                if clock_frequency is not None:
+                    result["MB_per_second"] = result["bytes_per_cycle"] * clock_frequency / 1e6
+            return result
+
+        return {
+            "read": summary(self.read_bursts, "address_cycle", "first_cycle", "last_cycle"),
+            "write": summary(self.write_bursts, "address_cycle", "response_cycle", "last_cycle"),
+            "errors": len(self.errors),
+        }
+
+    def __distribution(self, latency):
+        if callable(latency):
+            return latency
+        if isinstance(latency, tuple):
+            return lambda rng: int(rng.integers(latency[0], latency[1], endpoint=True))
+        return lambda rng: latency
+
+    def __index(self, address, count):
+        offset = address - self.base_address
+        if offset % self.bytes_per_beat != 0 or offset < 0 or offset + count * self.bytes_per_beat > self.size:
+            raise IndexError(f"Address 0x{address:08x} ({count} words) is outside of the memory")
+        return offset // self.bytes_per_beat
+
+    def __error(self, message):
+        message = f"cycle {self.cycle}: {message}"
+        if self.strict:
+            raise Exception(f"AXI slave: {message}")
+        self.errors.append(message)
+
+    def __sample(self, ctx, bus):
+        # everything the master drives and the current state of the slave outputs, before the clock edge
+        sample = {}
+        for name in ("AWVALID", "AWADDR", "AWLEN", "AWSIZE", "AWBURST", "AWID", "AWCACHE", "AWUSER", "AWREADY",
+                     "WVALID", "WDATA", "WSTRB", "WLAST", "WREADY",
+                     "BVALID", "BREADY",
+                     "ARVALID", "ARADDR", "ARLEN", "ARSIZE", "ARBURST", "ARID", "ARCACHE", "ARUSER", "ARREADY",
+                     "RVALID", "RLAST", "RREADY"):
+            signal = getattr(bus, name, None)
+            if signal is not None:
+                sample[name] = ctx.get(signal)
+        return sample
+
+    def __check_stable(self, sample):
+        # a master must hold VALID and its payload until the handshake
+        if self.previous is not None:
+            for valid, ready, payload in (("AWVALID", "AWREADY", ("AWADDR", "AWLEN", "AWSIZE", "AWBURST", "AWID", "AWCACHE", "AWUSER")),
+                                          ("WVALID", "WREADY", ("WDATA", "WSTRB", "WLAST")),
+                                          ("ARVALID", "ARREADY", ("ARADDR", "ARLEN", "ARSIZE", "ARBURST", "ARID", "ARCACHE", "ARUSER"))):
+                if self.previous[valid] and not self.previous[ready]:
+                    if not sample[valid]:
+                        self.__error(f"{valid} dropped before the handshake")
+                    for name in payload:
+                        if name in sample and sample[name] != self.previous[name]:
+                            self.__error(f"{name} changed while {valid} was waiting for {ready}")
+        self.previous = sample
+
+    def __check_burst(self, kind, address, beats, size, burst, cache, user):
+        if self.coherent and not ((cache or 0) & 0b10 and (user or 0) & 0b1):
+            self.__error(f"{kind} burst at 0x{address:08x} is not coherent, AxCACHE[1] and AxUSER[0] must be set")
+        if size is not None and 1 << size != self.bytes_per_beat:
+            self.__error(f"{kind} burst at 0x{address:08x} has size {1 << size} bytes, the bus is {self.bytes_per_beat}")
+        if burst is not None and burst != BURST_INCR:
+            self.__error(f"{kind} burst at 0x{address:08x} is not an incrementing burst")
+        if beats > self.max_burst_length:
+            self.__error(f"{kind} burst at 0x{address:08x} has {beats} beats, the maximum is {self.max_burst_length}")
+        if address % 4096 + beats * self.bytes_per_beat > 4096:
+            self.__error(f"{kind} burst at 0x{address:08x} crosses a 4KB boundary")
+        offset = address - self.base_address
+        if offset % self.bytes_per_beat != 0 or offset < 0 or offset + beats * self.bytes_per_beat > self.size:
+            self.__error(f"{kind} burst at 0x{address:08x} ({beats} beats) is outside of the memory")
+            return False
+        return True
+
+    def __handshakes(self, sample):
+        # update the slave state with every handshake that happened on the clock edge
+        if sample["ARVALID"] and sample["ARREADY"]:
+            address, beats = sample["ARADDR"], sample["ARLEN"] + 1
+            record = {"address": address, "beats": beats, "address_cycle": self.cycle, "first_cycle": None, "last_cycle": None}
+            self.read_bursts.append(record)
+            valid = self.__check_burst("read", address, beats, sample.get("ARSIZE"), sample.get("ARBURST"), sample.get("ARCACHE"), sample.get("ARUSER"))
+            self.read_queue.append([self.cycle + self.read_latency(self.rng), address if valid else None, beats, sample.get("ARID", 0), record])
+
+        if sample["RVALID"] and sample["RREADY"]:
+            burst = self.read_burst
+            record = burst[4]
+            if record["first_cycle"] is None:
+                record["first_cycle"] = self.cycle
+            if burst[1] is not None:
+                burst[1] += self.bytes_per_beat
+            burst[2] -= 1
+            if burst[2] == 0:
+                record["last_cycle"] = self.cycle
+                self.read_burst = None
+
+        if sample["AWVALID"] and sample["AWREADY"]:
+            address, beats = sample["AWADDR"], sample["AWLEN"] + 1
+            record = {"address": address, "beats": beats, "address_cycle": self.cycle, "last_cycle": None, "response_cycle": None}
+            self.write_bursts.append(record)
+            valid = self.__check_burst("write", address, beats, sample.get("AWSIZE"), sample.get("AWBURST"), sample.get("AWCACHE"), sample.get("AWUSER"))
+            self.write_queue.append([address if valid else None, beats, sample.get("AWID", 0), record])
+
+        if sample["WVALID"] and sample["WREADY"]:
+            self.write_beats.append((sample["WDATA"], sample.get("WSTRB", (1 << self.bytes_per_beat) - 1), sample["WLAST"]))
+
+        # write data can come before its address, bursts are written once all of their beats are here
+        while self.write_queue and len(self.write_beats) >= self.write_queue[0][1]:
+            address, beats, id, record = self.write_queue.popleft()
+            burst = [self.write_beats.popleft() for _ in range(beats)]
+            if [last for _, _, last in burst] != [0] * (beats - 1) + [1]:
+                self.__error(f"WLAST of the write burst at 0x{record['address']:08x} is not on beat {beats}")
+            if address is not None:
+                for beat, (data, strobe, _) in enumerate(burst):
+                    index = self.__index(address + beat * self.bytes_per_beat, 1)
+                    mask = sum(0xFF << (8 * byte) for byte in range(self.bytes_per_beat) if strobe >> byte & 1)
+                    self.memory[index] = (int(self.memory[index]) & ~mask) | (data & mask)
+            record["last_cycle"] = self.cycle
+            self.response_queue.append([self.cycle + self.write_latency(self.rng), id, record])
+        if len(self.write_beats) > self.max_outstanding * self.max_burst_length:
+            self.__error("write data without a write address")
+            self.write_beats.clear()
+
+        if sample["BVALID"] and sample["BREADY"]:
+            self.response_queue.popleft()[2]["response_cycle"] = self.cycle
+
+    def __drive(self, ctx, bus, sample):
+        # slave outputs for the next clock edge
+        def allowed(name):
+            return self.rng.random() < self.backpressure[name]
+
+        def set(name, value):
+            signal = getattr(bus, name, None)
+            if signal is not None:
+                ctx.set(signal, value)
+
+        if sample is None:
+            for name in ("AWREADY", "WREADY", "BVALID", "ARREADY", "RVALID", "RLAST"):
+                set(name, 0)
+            return
+
+        reads_outstanding = len(self.read_queue) + (self.read_burst is not None)
+        writes_outstanding = len(self.write_queue) + len(self.response_queue)
+        set("ARREADY", int(reads_outstanding < self.max_outstanding and allowed("ARREADY")))
+        set("AWREADY", int(writes_outstanding < self.max_outstanding and allowed("AWREADY")))
+        set("WREADY", int(allowed("WREADY")))
+
+        # RVALID and BVALID stay high until the handshake
+        if self.read_burst is None and self.read_queue and self.read_queue[0][0] <= self.cycle:
+            self.read_burst = self.read_queue.popleft()
+        read_waiting = sample["RVALID"] and not sample["RREADY"]
+        if self.read_burst is not None and (read_waiting or allowed("RVALID")):
+            _, address, beats_left, id, _ = self.read_burst
+            set("RVALID", 1)
+            set("RDATA", 0 if address is None else int(self.memory[self.__index(address, 1)]))
+            set("RLAST", int(beats_left == 1))
+            set("RID", id)
+            set("RRESP", 0b00 if address is not None else 0b10)   # SLVERR outside of the memory
+        else:
+            set("RVALID", 0)
+            set("RLAST", 0)
+
+        response_waiting = sample["BVALID"] and not sample["BREADY"]
+        if self.response_queue and self.response_queue[0][0] <= self.cycle and (response_waiting or allowed("BVALID")):
+            set("BVALID", 1)
+            set("BID", self.response_queue[0][1])
+            set("BRESP", 0b00)
+        else:
+            set("BVALID", 0)
+
+
+
+if __name__ == "__main__":
+
+    # memory update time of the controller for a few slave timings
+    import sys
+    sys.path.insert(0, "controller-firmware/python/generators")
+    from amaranth.sim import Simulator
+    from controller import Controller, nodes
+    from dma_instruction_compiler import compiler
+
+    for name, settings in {
+        "ideal": {},
+        "latency 10": {"read_latency": 10, "write_latency": 10},
+        "latency 5-30, 50% ready": {"read_latency": (5, 30), "write_latency": (5, 30), "backpressure": 0.5},
+        "acp, latency 10": {"read_latency": 10, "write_latency": 10, "coherent": True},
+    }.items():
+
+        dut = Controller(nodes, True, acp=settings.get("coherent", False))
+        ocm = axi_slave_model(dut.OCM_BASE_ADDR, dut.OCM_SIZE, **settings)
+
+        program = compiler(dut.rings[0], instruction_memory_depth=dut.RING_INSTRUCTION_MEMORY_SIZE)
+        program.copy_block(0, dut.RING_DATA_MEMORY_SIZE, 0, 0, 8)   # loop the first PS to PL words back to the PS
+        ocm.write(dut.OCM_BASE_ADDR + dut.PS_TO_PL_DMA_INSTRUCTION_OFFSET, program.compile())
+        ocm.write(dut.OCM_BASE_ADDR + dut.PS_TO_PL_CONTROL_OFFSET, 1 << 24)    # upload the program into bank 0 and run it
+        ocm.write(dut.OCM_BASE_ADDR + dut.PS_TO_PL_CONTROL_OFFSET + dut.CYCLE_PERIOD_OFFSET, 512)
+        ocm.write(dut.OCM_BASE_ADDR + dut.PS_TO_PL_DATA_OFFSET, np.arange(dut.PS_TO_PL_DATA_SIZE // 8) * 0x1_0000_0001 + 0x1_0000_0000)
+
+        updates = []
+
+        async def bench(ctx):
+            # record the sync_100 cycles and the bursts of every memory update
+            for update in range(4):
+                await ctx.tick("sync_100").until(dut.memory_update_running)
+                ocm.clear_statistics()
+                start = ocm.cycle
+                await ctx.tick("sync_100").until(dut.memory_update_done)
+                updates.append((ocm.cycle - start, ocm.report(100e6)))
+
+        sim = Simulator(dut)
+        sim.add_clock(1/200e6, domain="sync_200")
+        sim.add_clock(1/100e6, domain="sync_100")
+        sim.add_clock(1/50e6, domain="sync_50")
+        sim.add_clock(1/25e6, domain="sync_25")
+        sim.add_testbench(ocm.testbench(dut, domain="sync_100"), background=True)
+        sim.add_testbench(bench)
+        sim.run()
+
+        looped = ocm.read(dut.OCM_BASE_ADDR + dut.PL_TO_PS_DATA_OFFSET, 4)
+        expected = ocm.read(dut.OCM_BASE_ADDR + dut.PS_TO_PL_DATA_OFFSET, 4)
+        cycles, last = updates[-1]
+        print(f"{name}: update {cycles} cycles, "
+              f"read {last['read']['bursts']} bursts {last['read']['bytes_per_cycle']:.2f} B/cycle latency {last['read']['latency_mean']:.1f}, "
+              f"write {last['write']['bursts']} bursts {last['write']['bytes_per_cycle']:.2f} B/cycle latency {last['write']['latency_mean']:.1f}, "
+              f"data {'ok' if (looped == expected).all() else 'wrong'}, {len(ocm.errors)} errors")
@@ -1,4 +1,5 @@
 from amaranth import *
+from amaranth.utils import exact_log2
 from amaranth.lib import wiring
 from amaranth.lib.wiring import In, Out
 from shift_dma import shift_dma_controller, shift_dma_node
@@ -8,16 +9,37 @@ from interface_cards.serial_interface import serial_interface_card
 from fanuc_encoder import Fanuc_Encoders
 from global_timer import Global_Timers
 from em_serial_controller import EM_Serial_Controller
+from axi_slave_model import axi_slave_model
+from ocm_layout import ocm_layout
+import numpy as np
 
 
 
 class Controller(wiring.Component):
-    def __init__(self, nodes:dict, sim=False):
+    def __init__(self, nodes:dict, sim=False, ring_count=1, node_rings:dict=None, acp=False, data_size:int=None, instruction_size:int=None):
+        """
+        nodes: rtl modules to connect to the shift dma, in ring order
+
+        ring_count: number of independent shift dma rings (power of 2), copies on different rings run in parallel
+
+        node_rings: ring index for each node name, nodes that are not listed go on ring 0
+
+        data_size: bytes of OCM for the data in each direction (power of 2), by default sized for the registers of the nodes (as much as fits in the OCM)
+
+        instruction_size: bytes of OCM for the dma instructions of all rings (power of 2), by default sized to copy all of the data
+
+        acp: drive AxCACHE/AxUSER for a cache coherent connection to the Zynq ACP port instead of an HP port,
+        the PS then sees the transfers in its caches and does not have to flush or invalidate the OCM every update
+        """
+
         self.sim = sim
         self.nodes = nodes
+        self.acp = acp
 
         interface_name = "AXI_controller_master"
 
+        self.AXI_MAX_OUTSTANDING = 4    # bursts in flight in each direction
+
         # Define the interface parameters
         interface_params = (
             f"XIL_INTERFACENAME {interface_name}, "
@@ -29,7 +51,7 @@ class Controller(wiring.Component):
             f"ID_WIDTH {0}, "
             f"ADDR_WIDTH {32}, "
             "HAS_BURST 1, "
-            "HAS_CACHE 0, "
+            f"HAS_CACHE {int(acp)}, "
             "HAS_LOCK 0, "
             "HAS_PROT 0, "
             "HAS_QOS 0, "
@@ -39,11 +61,21 @@ class Controller(wiring.Component):
             "HAS_RRESP 0, "
             "SUPPORTS_NARROW_BURST 0, "
             "MAX_BURST_LENGTH 16, "
-            "NUM_READ_OUTSTANDING 1, "
-            "NUM_WRITE_OUTSTANDING 1, "
+            f"NUM_READ_OUTSTANDING {self.AXI_MAX_OUTSTANDING}, "
+            f"NUM_WRITE_OUTSTANDING {self.AXI_MAX_OUTSTANDING}, "
+            f"AWUSER_WIDTH {5 if acp else 0}, "
+            f"ARUSER_WIDTH {5 if acp else 0}, "
             "READ_WRITE_MODE READ_WRITE"
         )
 
+        # ACP coherent accesses: write-back read and write allocate (AxCACHE[1] must be set) and AxUSER[0] shared
+        acp_signals = {
+            "AWCACHE": Out(4, init=0b1111),
+            "AWUSER": Out(5, init=0b00001),
+            "ARCACHE": Out(4, init=0b1111),
+            "ARUSER": Out(5, init=0b00001),
+        } if acp else {}
+
         super().__init__({
             # Clock and Reset
             "clk_200M": In(1),
@@ -132,7 +164,7 @@ class Controller(wiring.Component):
             # interrupts
             "pl_ps_interrupts": Out(16),
 
-        })
+        } | acp_signals)
 
         # Assign attributes to the signals
 
@@ -187,6 +219,9 @@ class Controller(wiring.Component):
         self.RVALID.attrs["X_INTERFACE_INFO"] = f"xilinx.com:interface:aximm:1.0 {interface_name} RVALID"
         self.RREADY.attrs["X_INTERFACE_INFO"] = f"xilinx.com:interface:aximm:1.0 {interface_name} RREADY"
         
+        for name in acp_signals:
+            getattr(self, name).attrs["X_INTERFACE_INFO"] = f"xilinx.com:interface:aximm:1.0 {interface_name} {name}"
+
         # Assign interface-level attributes to one of the signals
         self.RREADY.attrs["X_INTERFACE_PARAMETER"] = interface_params
 
@@ -194,29 +229,97 @@ class Controller(wiring.Component):
         self.OCM_BASE_ADDR = 0x000F0000
         self.OCM_SIZE = 0x8000  # 32KB
 
-        # OCM layout, this must match the layout in fpga_interface.h
+        # OCM region sizes, the regions are placed once the size of the PL to PS control block is known (see below)
 
-        self.PS_TO_PL_CONTROL_OFFSET = 0x0000
         self.PS_TO_PL_CONTROL_SIZE = 0x40   # 64 bytes
-        self.PL_TO_PS_CONTROL_OFFSET = 0x800
-        self.PL_TO_PS_CONTROL_SIZE = 0x40   # 64 bytes
-
-        # these sizes must be equal
-        self.PS_TO_PL_DATA_OFFSET = 0x1000
-        self.PS_TO_PL_DATA_SIZE = 0x1000   # 4KB
-        self.PL_TO_PS_DATA_OFFSET = 0x2000
-        self.PL_TO_PS_DATA_SIZE = 0x1000   # 4KB
-
-        self.PS_TO_PL_DMA_INSTRUCTION_OFFSET = 0x3000
-        self.PS_TO_PL_DMA_INSTRUCTION_SIZE = 0x800  # 2KB
-
-        self.LARGEST_MEMORY_REGION = 0x1000 # 4KB
-
-        if(self.sim):   # use smaller memory regions for simulation
-            self.PS_TO_PL_DATA_SIZE = 0x100   # 256 bytes
-            self.PL_TO_PS_DATA_SIZE = 0x100   # 256 bytes
-            self.PS_TO_PL_DMA_INSTRUCTION_SIZE = 0x100  # 256 bytes
-            self.LARGEST_MEMORY_REGION = 0x100   # 256 bytes
+        self.PL_TO_PS_CONTROL_SIZE = 0x40   # 64 bytes, grows with the number of dma rings
+
+        # transfer descriptors, the PS to PL table then the PL to PS table, AXI_DESCRIPTORS 64 bit entries each
+        # bits 0-15 OCM address, 16-31 length and 32-47 data memory address, all in 64 bit words (OCM addresses from OCM_BASE_ADDR)
+        # a table with an empty first entry is not used and the whole data region is transferred
+        self.AXI_DESCRIPTORS = 32
+        self.AXI_DESCRIPTOR_SIZE = 2 * self.AXI_DESCRIPTORS * 8    # 512 bytes
+
+        # each ring gets an equal share of the instruction memory and a bank of the data memory
+        # ring n uses instructions starting at n*RING_INSTRUCTION_MEMORY_SIZE and data starting at n*RING_DATA_MEMORY_SIZE (in each direction)
+        self.DMA_RING_COUNT = ring_count
+        if(ring_count < 1 or ring_count & (ring_count - 1) != 0):
+            raise Exception("DMA ring count must be a power of 2")
+
+        if(node_rings is None):
+            node_rings = {}
+        for node_name, ring in node_rings.items():
+            if(node_name not in self.nodes):
+                raise Exception(f"Node {node_name} is assigned to a ring but is not in the node list")
+            if(ring not in range(self.DMA_RING_COUNT)):
+                raise Exception(f"Node {node_name} is assigned to ring {ring}, but there are only {self.DMA_RING_COUNT} rings")
+
+        self.node_rings = {node_name: node_rings.get(node_name, 0) for node_name in self.nodes}
+        self.rings = [[node_name for node_name in self.nodes if self.node_rings[node_name] == ring] for ring in range(self.DMA_RING_COUNT)]   # node names in ring order, use these for the dma instruction compiler
+
+        # PL to PS control layout (64 bit words): status | cycle sequence number << 32, the phase timestamps of the cycle, then the shift dma performance counters of each ring
+        # status bits 0-3: instruction bank the dma ran from, bit 4: overrun (the cycle timer expired before the cycle finished, so a trigger was missed)
+        # everything in the block describes the last finished cycle, whose dma results are in the PL to PS data of the same transfer, sequence number 0 means no cycle has finished yet
+        # timestamp words: dma start | dma done << 32, axi start | axi done << 32, taken from a free running 32 bit counter on the 100Mhz clock (wraps every ~43s, use differences)
+        # the axi timestamps are of the transfer that ran alongside that dma cycle, which moved the data of the cycle before it
+        # overrun word: bits 0-31 total number of triggers that came while a cycle was still running, whatever the overrun policy did with them
+        # counter words of each ring: busy cycles | stall cycles << 32, copies issued | copies completed << 32, nop cycles | hazard cycles << 32
+        self.CYCLE_TIMESTAMPS_OFFSET = 0x8
+        self.CYCLE_TIMESTAMPS_SIZE = 0x10
+        self.OVERRUN_COUNTER_OFFSET = self.CYCLE_TIMESTAMPS_OFFSET + self.CYCLE_TIMESTAMPS_SIZE
+        self.DMA_PERF_COUNTER_OFFSET = self.OVERRUN_COUNTER_OFFSET + 0x8
+        self.DMA_PERF_COUNTER_SIZE = 0x18   # bytes per ring
+        pl_to_ps_control_used = self.DMA_PERF_COUNTER_OFFSET + self.DMA_PERF_COUNTER_SIZE * self.DMA_RING_COUNT
+        self.PL_TO_PS_CONTROL_SIZE = max(self.PL_TO_PS_CONTROL_SIZE, (pl_to_ps_control_used + 0x3F) & ~0x3F)  # whole 64 byte blocks
+
+        # the data and instruction regions are sized for the nodes, every ring gets the same share so the ring that needs the most sets the size
+        # data: one 32 bit word in each direction for every register of the ring's nodes (all of them synced with the PS), these sizes must be equal
+        # instructions: a COPY for every data word plus the NOPs around the program (the start NOP, END and the padding the software adds for the last copies)
+        # the regions are powers of 2, when the nodes need more than fits in the OCM the data regions are halved until they and the
+        # instructions to copy them fit, so the programs can only sync part of the registers
+        ring_words = [{"r": 0, "w": 0} for ring in range(self.DMA_RING_COUNT)]
+        for node_name, node_object in self.nodes.items():
+            summary = node_object.rm.summary()
+            ring_words[self.node_rings[node_name]]["r"] += summary["read_registers"]
+            ring_words[self.node_rings[node_name]]["w"] += summary["write_registers"]
+        program_padding = 2 + 4 * (len(self.nodes) + 4)
+
+        def power_of_2(size):
+            return 1 << max(size - 1, 0).bit_length()
+
+        def instruction_size_for(data_size):
+            ring_data_words = data_size // 4 // self.DMA_RING_COUNT
+            ring_copies = max(min(words["r"], ring_data_words) + min(words["w"], ring_data_words) for words in ring_words)
+            return power_of_2((ring_copies + program_padding) * 8 * self.DMA_RING_COUNT)
+
+        def fits(data_size, instruction_size):
+            # place the regions in a layout with no size limit to see how much of the OCM they would use
+            layout = ocm_layout(1 << 32)
+            for name, size in (("PS_TO_PL_CONTROL", self.PS_TO_PL_CONTROL_SIZE), ("PL_TO_PS_CONTROL", self.PL_TO_PS_CONTROL_SIZE), ("PS_TO_PL_DATA", data_size),
+                               ("PL_TO_PS_DATA", data_size), ("PS_TO_PL_DMA_INSTRUCTION", instruction_size), ("AXI_DESCRIPTOR", self.AXI_DESCRIPTOR_SIZE)):
+                layout.add(name, size)
+            return layout.used() <= self.OCM_SIZE
+
+        def instruction_size_that_fits(data_size):
+            # the region may be one size smaller than copying all of the data needs, then a program can not sync every word and pad its end
+            if instruction_size is not None:
+                return instruction_size if fits(data_size, instruction_size) else None
+            full_size = instruction_size_for(data_size)
+            return next((size for size in (full_size, full_size // 2) if fits(data_size, size)), None)
+
+        # data_size and instruction_size replace the computed sizes
+        if(data_size is None):
+            data_size = power_of_2(max(max(words["r"], words["w"], 2) for words in ring_words) * 4 * self.DMA_RING_COUNT)
+            while data_size > 8 * self.DMA_RING_COUNT and instruction_size_that_fits(data_size) is None:
+                data_size //= 2
+        if(instruction_size is None):
+            instruction_size = instruction_size_that_fits(data_size) or instruction_size_for(data_size)    # a layout that does not fit raises when it is placed
+        if(data_size < 8 or data_size & (data_size - 1) != 0 or instruction_size < 8 or instruction_size & (instruction_size - 1) != 0):
+            raise Exception("Data and instruction sizes must be powers of 2 of at least one 64 bit word")
+        self.PS_TO_PL_DATA_SIZE = data_size
+        self.PL_TO_PS_DATA_SIZE = data_size
+
+        self.PS_TO_PL_DMA_INSTRUCTION_SIZE = instruction_size
 
         # actual memory sizes may be larger than the above access sizes
         self.INSTRUCTION_MEMORY_SIZE = self.PS_TO_PL_DMA_INSTRUCTION_SIZE // 8  # 64 bit instructions
@@ -227,6 +330,53 @@ class Controller(wiring.Component):
         if(self.DATA_MEMORY_SIZE < self.PS_TO_PL_DATA_SIZE // 4):
             raise Exception("Data memory size is smaller than the data memory access size")
 
+        self.RING_INSTRUCTION_MEMORY_SIZE = self.INSTRUCTION_MEMORY_SIZE // self.DMA_RING_COUNT
+
+        # each ring has this many banks of instruction memory, the dma runs from one while the PS uploads a new program into another
+        # PS to PL control word 0: bits 16-19 bank to run, bits 20-23 bank to upload into, bit 24 upload the instruction region this cycle
+        # the instruction region is only read over axi when the upload bit is set, the bank to run is latched when the dma cycle starts
+        # bit 27: upload the transfer descriptors this cycle, they go into the table bank that is not in use and are used from the next transfer
+        # only the low bits of the bank fields that address INSTRUCTION_BANKS banks are used, the software must not request a bank past the last one
+        self.INSTRUCTION_BANKS = 2
+        if self.INSTRUCTION_BANKS > 16:
+            raise Exception("Too many instruction banks, the bank fields are 4 bits")
+
+        # PS to PL control word 0 bits 25-26: what to do with a trigger that comes while the last cycle is still running (an overrun)
+        self.OVERRUN_SKIP = 0   # drop the trigger, the next cycle starts on the next timer expiry
+        self.OVERRUN_IMMEDIATE = 1  # start the late cycle as soon as the running one finishes, the timer keeps its phase so the cycles after it are on time again
+        self.OVERRUN_STRETCH = 2    # start the late cycle as soon as the running one finishes and restart the timer from there, so the period stretches to the cycle length
+
+        # PS to PL control word 1: how much of each region the axi transfer moves, in 64 bit words from the start of the region
+        # bits 0-15 PS to PL data, bits 16-31 PL to PS data, bits 32-47 dma instructions (all rings, ring 0 first), 0 moves the whole region
+        # the PS to PL lengths are used in the same transfer, the PL to PS data is written back while the control block is read so a new PL to PS length can take one extra transfer to apply
+        # use dma_instruction_compiler.transfer_lengths_word to get the lengths of the compiled programs
+        self.TRANSFER_LENGTHS_OFFSET = 0x8
+
+        # PS to PL control word 2: bits 0-31 update period in sync_100 cycles, bits 32-47 fraction of a cycle (1/65536) added to every period
+        # the fraction is accumulated, so single periods are whole cycles but the average period is exact
+        # a period of 0 stops the updates (must be done before FPGA reconfiguration), word 0 bits 0-15 are unused
+        self.CYCLE_PERIOD_OFFSET = 0x10
+        self.CYCLE_CLOCK_FREQUENCY = 100_000_000
+        self.START_CYCLES = 4   # sync_100 cycles the dma and axi start signals are held at the start of a cycle
+        self.RING_DATA_MEMORY_SIZE = self.DATA_MEMORY_SIZE // self.DMA_RING_COUNT
+
+        # the data memory of each ring is double buffered, the dma runs a cycle on one buffer while axi moves the data of the previous cycle in the other
+        # the buffers swap when a cycle starts, so data from the PS is used by the dma one cycle after it is read and data for the PS is written one cycle after the dma made it
+        # the controller data memory does not keep values between cycles, every cycle uses the other buffer
+        self.DATA_BUFFERS = 2
+        if(self.RING_INSTRUCTION_MEMORY_SIZE < 2 or self.RING_DATA_MEMORY_SIZE < 2):
+            raise Exception("Too many DMA rings for the memory size")
+
+        # OCM layout, the regions are placed in this order from the start of the OCM
+        # exported in the driver settings of controller_config.json and as ocm_layout.h for the controller software
+        self.ocm_layout = ocm_layout(self.OCM_SIZE)
+        self.PS_TO_PL_CONTROL_OFFSET = self.ocm_layout.add("PS_TO_PL_CONTROL", self.PS_TO_PL_CONTROL_SIZE)
+        self.PL_TO_PS_CONTROL_OFFSET = self.ocm_layout.add("PL_TO_PS_CONTROL", self.PL_TO_PS_CONTROL_SIZE)
+        self.PS_TO_PL_DATA_OFFSET = self.ocm_layout.add("PS_TO_PL_DATA", self.PS_TO_PL_DATA_SIZE)
+        self.PL_TO_PS_DATA_OFFSET = self.ocm_layout.add("PL_TO_PS_DATA", self.PL_TO_PS_DATA_SIZE)
+        self.PS_TO_PL_DMA_INSTRUCTION_OFFSET = self.ocm_layout.add("PS_TO_PL_DMA_INSTRUCTION", self.PS_TO_PL_DMA_INSTRUCTION_SIZE)
+        self.AXI_DESCRIPTOR_OFFSET = self.ocm_layout.add("AXI_DESCRIPTOR", self.AXI_DESCRIPTOR_SIZE)
+
         # self.desc.addDriverData("OCM_BASE_ADDR", self.OCM_BASE_ADDR)
         # self.desc.addDriverData("OCM_SIZE", self.OCM_SIZE)
         # self.desc.addDriverData("PS_TO_PL_CONTROL_OFFSET", self.PS_TO_PL_CONTROL_OFFSET)
@@ -245,18 +395,22 @@ class Controller(wiring.Component):
         driver_settings = {
             "OCM_BASE_ADDR": self.OCM_BASE_ADDR,
             "OCM_SIZE": self.OCM_SIZE,
-            "PS_TO_PL_CONTROL_OFFSET": self.PS_TO_PL_CONTROL_OFFSET,
-            "PS_TO_PL_CONTROL_SIZE": self.PS_TO_PL_CONTROL_SIZE,
-            "PL_TO_PS_CONTROL_OFFSET": self.PL_TO_PS_CONTROL_OFFSET,
-            "PL_TO_PS_CONTROL_SIZE": self.PL_TO_PS_CONTROL_SIZE,
-            "PS_TO_PL_DATA_OFFSET": self.PS_TO_PL_DATA_OFFSET,
-            "PS_TO_PL_DATA_SIZE": self.PS_TO_PL_DATA_SIZE,
-            "PL_TO_PS_DATA_OFFSET": self.PL_TO_PS_DATA_OFFSET,
-            "PL_TO_PS_DATA_SIZE": self.PL_TO_PS_DATA_SIZE,
-            "PS_TO_PL_DMA_INSTRUCTION_OFFSET": self.PS_TO_PL_DMA_INSTRUCTION_OFFSET,
-            "PS_TO_PL_DMA_INSTRUCTION_SIZE": self.PS_TO_PL_DMA_INSTRUCTION_SIZE,
+            **self.ocm_layout.driver_settings(),
             "INSTRUCTION_MEMORY_SIZE": self.INSTRUCTION_MEMORY_SIZE,
             "DATA_MEMORY_SIZE": self.DATA_MEMORY_SIZE,
+            "DMA_RING_COUNT": self.DMA_RING_COUNT,
+            "RING_INSTRUCTION_MEMORY_SIZE": self.RING_INSTRUCTION_MEMORY_SIZE,
+            "INSTRUCTION_BANKS": self.INSTRUCTION_BANKS,
+            "TRANSFER_LENGTHS_OFFSET": self.TRANSFER_LENGTHS_OFFSET,
+            "CYCLE_PERIOD_OFFSET": self.CYCLE_PERIOD_OFFSET,
+            "CYCLE_CLOCK_FREQUENCY": self.CYCLE_CLOCK_FREQUENCY,
+            "RING_DATA_MEMORY_SIZE": self.RING_DATA_MEMORY_SIZE,
+            "CYCLE_TIMESTAMPS_OFFSET": self.CYCLE_TIMESTAMPS_OFFSET,
+            "OVERRUN_COUNTER_OFFSET": self.OVERRUN_COUNTER_OFFSET,
+            "DMA_PERF_COUNTER_OFFSET": self.DMA_PERF_COUNTER_OFFSET,
+            "DMA_PERF_COUNTER_SIZE": self.DMA_PERF_COUNTER_SIZE,
+            "AXI_DESCRIPTORS": self.AXI_DESCRIPTORS,
+            "AXI_COHERENT": int(self.acp),
         }
         self.rm = RegisterMapGenerator("controller", ["controller"], driver_settings)
         self.rm.generate()
@@ -274,44 +428,16 @@ class Controller(wiring.Component):
         m.domains.sync_50 = ClockDomain("sync_50", async_reset=True)
         m.domains.sync_25 = ClockDomain("sync_25", async_reset=True)
         
-        # about enough memory to use up an entire update period at 50% utilization (hopefully more than we'll ever need)
-        m.submodules.instruction_memory = self.instruction_memory = Memory(shape=unsigned(64), depth=(self.INSTRUCTION_MEMORY_SIZE), init=[])
-        m.submodules.data_memory_read = self.data_memory_read = Memory(shape=unsigned(32), depth=(self.DATA_MEMORY_SIZE), init=[])
-        m.submodules.data_memory_write = self.data_memory_write = Memory(shape=unsigned(32), depth=(self.DATA_MEMORY_SIZE), init=[])
+        # each dma ring gets its own controller, instruction memory and bank of the data memory (see __init__)
+        # the axi transfers and the PS see the banks as one continuous memory, ring 0 first
 
-        m.submodules.shift_dma = self.shift_dma = shift_dma_controller(instruction_memory_depth=self.INSTRUCTION_MEMORY_SIZE)
-
-        self.instruction_read_port = self.instruction_memory.read_port(domain="sync_100")
-        self.instruction_write_port = self.instruction_memory.write_port(domain="sync_100")
-
-        # data ports for dma use, these also get used for axi transfers when the dma is not active to get 64 bit data
-        self.data_read_read_port_dma = self.data_memory_read.read_port(domain="sync_100")
-        self.data_read_write_port_dma = self.data_memory_read.write_port(domain="sync_100")
-
-        self.data_write_read_port_dma = self.data_memory_write.read_port(domain="sync_100")
-        self.data_write_write_port_dma = self.data_memory_write.write_port(domain="sync_100")
-
-        # axi only data ports
-        self.data_read_port_axi = self.data_memory_read.read_port(domain="sync_100")
-        self.data_write_port_axi = self.data_memory_write.write_port(domain="sync_100")
-
-
-        self.instruction_read_address = Signal(range(self.INSTRUCTION_MEMORY_SIZE))
-        self.instruction_read_data = Signal(64)
         self.instruction_write_address = Signal(range(self.INSTRUCTION_MEMORY_SIZE))
         self.instruction_write_data = Signal(64)
         self.instruction_write_en = Signal()
 
-
-        self.data_read_dma_address = Signal(range(self.DATA_MEMORY_SIZE))
-        self.data_read_dma_read_data = Signal(32)
-        self.data_read_dma_write_data = Signal(32)
-        self.data_read_dma_write_en = Signal()
-
-        self.data_write_dma_address = Signal(range(self.DATA_MEMORY_SIZE))
-        self.data_write_dma_read_data = Signal(32)
-        self.data_write_dma_write_data = Signal(32)
-        self.data_write_dma_write_en = Signal()
+        self.instruction_bank = Signal(range(self.INSTRUCTION_BANKS))  # bank the dma is running from
+        self.instruction_upload_bank = Signal(range(self.INSTRUCTION_BANKS))   # bank the axi instruction stage writes to
+        self.instruction_upload = Signal()  # read the instruction region this cycle
 
 
         self.data_read_axi_address = Signal(range(self.DATA_MEMORY_SIZE))
@@ -324,6 +450,7 @@ class Controller(wiring.Component):
         self.memory_update_done = self.pl_ps_interrupts[1]
         self.dma_cycle_running = self.pl_ps_interrupts[2]
         self.dma_cycle_done = self.pl_ps_interrupts[3]
+        self.feedback_ready = self.pl_ps_interrupts[4]  # PL to PS data and control are in the OCM, the PS to PL memory may still be read, cleared when the next memory update starts
 
         self.axi_transfer_start = Signal()
         self.axi_transfer_busy = Signal()
@@ -351,88 +478,136 @@ class Controller(wiring.Component):
 
 
 
-        m.d.comb += [
-            self.data_read_read_port_dma.addr.eq(self.data_read_dma_address),
-            self.data_read_write_port_dma.addr.eq(self.data_read_dma_address),
-            self.data_read_dma_read_data.eq(self.data_read_read_port_dma.data),
-            self.data_read_write_port_dma.data.eq(self.data_read_dma_write_data),
-            self.data_read_write_port_dma.en.eq(self.data_read_dma_write_en),
-
-            self.data_write_read_port_dma.addr.eq(self.data_write_dma_address),
-            self.data_write_write_port_dma.addr.eq(self.data_write_dma_address),
-            self.data_write_dma_read_data.eq(self.data_write_read_port_dma.data),
-            self.data_write_write_port_dma.data.eq(self.data_write_dma_write_data),
-            self.data_write_write_port_dma.en.eq(self.data_write_dma_write_en),
-
-            self.instruction_read_port.addr.eq(self.instruction_read_address),
-            self.instruction_read_data.eq(self.instruction_read_port.data),
-            self.instruction_write_port.addr.eq(self.instruction_write_address),
-            self.instruction_write_port.data.eq(self.instruction_write_data),
-            self.instruction_write_port.en.eq(self.instruction_write_en),
-
-
-            self.shift_dma.instruction_memory_read_data.eq(self.instruction_read_data),
-            self.instruction_read_address.eq(self.shift_dma.instruction_memory_address),
-        ]
+        ring_data_address_width = exact_log2(self.RING_DATA_MEMORY_SIZE)
+        ring_axi_address_width = ring_data_address_width - 1     # 64 bit words in each bank
+        ring_instruction_address_width = exact_log2(self.RING_INSTRUCTION_MEMORY_SIZE)
 
-        self.dma_memory_half = Signal()
-        self.dma_memory_half_comb = Signal()
+        self.data_read_axi_bank = Signal(range(self.DMA_RING_COUNT))   # memory read data is one cycle behind the address
 
-        with m.If(self.shift_dma.data_memory_address[len(self.data_read_dma_address)]):
-            m.d.sync_100 += self.dma_memory_half.eq(1)
-            m.d.comb += self.dma_memory_half_comb.eq(1)
-        with m.Else():
-            m.d.sync_100 += self.dma_memory_half.eq(0)
+        self.dma_data_buffer = Signal(range(self.DATA_BUFFERS))  # data buffer the dma is using, axi uses the other one
+        m.d.sync_100 += self.data_read_axi_bank.eq(self.data_read_axi_address >> ring_axi_address_width)
+
+        self.shift_dmas = []
+        self.dma_busy = Signal()
+
+        for ring in range(self.DMA_RING_COUNT):
+            # about enough memory to use up an entire update period at 50% utilization (hopefully more than we'll ever need)
+            m.submodules[f"instruction_memory_{ring}"] = instruction_memory = Memory(shape=unsigned(64), depth=(self.RING_INSTRUCTION_MEMORY_SIZE * self.INSTRUCTION_BANKS), init=[])
+
+            m.submodules[f"shift_dma_{ring}"] = shift_dma = shift_dma_controller(instruction_memory_depth=self.RING_INSTRUCTION_MEMORY_SIZE, node_count=len(self.rings[ring]))
+            self.shift_dmas.append(shift_dma)
+
+            instruction_read_port = instruction_memory.read_port(domain="sync_100")
+            instruction_write_port = instruction_memory.write_port(domain="sync_100")
 
-        with m.If(~self.axi_transfer_busy):   # if axi is not transfering data, link the memmory ports to the dma
-            # check if the address is in the read or write memory
             m.d.comb += [
-                self.data_read_dma_address.eq(self.shift_dma.data_memory_address[0:len(self.data_read_dma_address)]),
-                self.data_write_dma_address.eq(self.shift_dma.data_memory_address[0:len(self.data_read_dma_address)]),
-                self.data_read_dma_write_data.eq(self.shift_dma.data_memory_write_data),
-                self.data_write_dma_write_data.eq(self.shift_dma.data_memory_write_data),
-            ]
+                instruction_read_port.addr.eq(Cat(shift_dma.instruction_memory_address[0:ring_instruction_address_width], self.instruction_bank)),
+                shift_dma.instruction_memory_read_data.eq(instruction_read_port.data),
 
-            with m.If(self.dma_memory_half == 0):  # read memory signals must be delayed by one cycle
-                m.d.comb += [
-                    #self.data_read_dma_address.eq(self.shift_dma.data_memory_address[0:len(self.data_read_dma_address)]),
-                    self.shift_dma.data_memory_read_data.eq(self.data_read_dma_read_data),
-                    #self.data_read_dma_write_data.eq(self.shift_dma.data_memory_write_data),
-                ]
+                # upper instruction address bits select the ring
+                instruction_write_port.addr.eq(Cat(self.instruction_write_address[0:ring_instruction_address_width], self.instruction_upload_bank)),
+                instruction_write_port.data.eq(self.instruction_write_data),
+                instruction_write_port.en.eq(self.instruction_write_en & (self.instruction_write_address[ring_instruction_address_width:] == ring)),
+            ]
 
-            with m.Else():  # write memory
-                m.d.comb += [
-                    #self.data_write_dma_address.eq(self.shift_dma.data_memory_address[0:len(self.data_read_dma_address)]),
-                    self.shift_dma.data_memory_read_data.eq(self.data_write_dma_read_data),
-                    #self.data_write_dma_write_data.eq(self.shift_dma.data_memory_write_data),
-                ]
+            dma_memory_half = Signal(name=f"dma_memory_half_{ring}")
+            dma_memory_half_comb = Signal(name=f"dma_memory_half_comb_{ring}")
 
-            with m.If(self.dma_memory_half_comb == 0):  # write memory signals must be switched immediately
-                m.d.comb += [
-                    self.data_read_dma_write_en.eq(self.shift_dma.data_memory_write_enable),
-                    self.data_write_dma_write_en.eq(0),
-                ]
+            with m.If(shift_dma.data_memory_address[ring_data_address_width]):
+                m.d.sync_100 += dma_memory_half.eq(1)
+                m.d.comb += dma_memory_half_comb.eq(1)
             with m.Else():
+                m.d.sync_100 += dma_memory_half.eq(0)
+
+            for buffer in range(self.DATA_BUFFERS):
+                m.submodules[f"data_memory_read_{ring}_{buffer}"] = data_memory_read = Memory(shape=unsigned(32), depth=(self.RING_DATA_MEMORY_SIZE), init=[])
+                m.submodules[f"data_memory_write_{ring}_{buffer}"] = data_memory_write = Memory(shape=unsigned(32), depth=(self.RING_DATA_MEMORY_SIZE), init=[])
+
+                # data ports for dma use, these also get used for axi transfers when the buffer belongs to axi to get 64 bit data
+                data_read_read_port_dma = data_memory_read.read_port(domain="sync_100")
+                data_read_write_port_dma = data_memory_read.write_port(domain="sync_100")
+
+                data_write_read_port_dma = data_memory_write.read_port(domain="sync_100")
+                data_write_write_port_dma = data_memory_write.write_port(domain="sync_100")
+
+                # axi only data ports
+                data_read_port_axi = data_memory_read.read_port(domain="sync_100")
+                data_write_port_axi = data_memory_write.write_port(domain="sync_100")
+
+                data_read_dma_address = Signal(range(self.RING_DATA_MEMORY_SIZE), name=f"data_read_dma_address_{ring}_{buffer}")
+                data_read_dma_read_data = Signal(32, name=f"data_read_dma_read_data_{ring}_{buffer}")
+                data_read_dma_write_data = Signal(32, name=f"data_read_dma_write_data_{ring}_{buffer}")
+                data_read_dma_write_en = Signal(name=f"data_read_dma_write_en_{ring}_{buffer}")
+
+                data_write_dma_address = Signal(range(self.RING_DATA_MEMORY_SIZE), name=f"data_write_dma_address_{ring}_{buffer}")
+                data_write_dma_read_data = Signal(32, name=f"data_write_dma_read_data_{ring}_{buffer}")
+                data_write_dma_write_data = Signal(32, name=f"data_write_dma_write_data_{ring}_{buffer}")
+                data_write_dma_write_en = Signal(name=f"data_write_dma_write_en_{ring}_{buffer}")
+
                 m.d.comb += [
-                    self.data_write_dma_write_en.eq(self.shift_dma.data_memory_write_enable),
-                    self.data_read_dma_write_en.eq(0),
+                    data_read_read_port_dma.addr.eq(data_read_dma_address),
+                    data_read_write_port_dma.addr.eq(data_read_dma_address),
+                    data_read_dma_read_data.eq(data_read_read_port_dma.data),
+                    data_read_write_port_dma.data.eq(data_read_dma_write_data),
+                    data_read_write_port_dma.en.eq(data_read_dma_write_en),
+
+                    data_write_read_port_dma.addr.eq(data_write_dma_address),
+                    data_write_write_port_dma.addr.eq(data_write_dma_address),
+                    data_write_dma_read_data.eq(data_write_read_port_dma.data),
+                    data_write_write_port_dma.data.eq(data_write_dma_write_data),
+                    data_write_write_port_dma.en.eq(data_write_dma_write_en),
                 ]
 
-        with m.Else():   # if axi is transfering data, link the memory ports to the axi interface
-            m.d.comb += [
-                # pack read data into 64 bit data
-                self.data_read_port_axi.addr.eq(self.data_read_axi_address << 1),
-                self.data_read_dma_address.eq(self.data_read_axi_address << 1 | 0b1),
-                self.data_read_axi_data.eq(self.data_read_port_axi.data | (self.data_read_dma_read_data << 32)),
-
-                # unpack 64 bit data into 32 bit data
-                self.data_write_port_axi.addr.eq(self.data_write_axi_address << 1),
-                self.data_write_dma_address.eq(self.data_write_axi_address << 1 | 0b1),
-                self.data_write_port_axi.data.eq(self.data_write_axi_data[0:32]),
-                self.data_write_dma_write_data.eq(self.data_write_axi_data[32:64]),
-                self.data_write_port_axi.en.eq(self.data_write_axi_enable),
-                self.data_write_dma_write_en.eq(self.data_write_axi_enable),
-            ]
+                with m.If(self.dma_data_buffer == buffer):   # link the memory ports of the dma buffer to the dma
+                    # check if the address is in the read or write memory
+                    m.d.comb += [
+                        data_read_dma_address.eq(shift_dma.data_memory_address[0:ring_data_address_width]),
+                        data_write_dma_address.eq(shift_dma.data_memory_address[0:ring_data_address_width]),
+                        data_read_dma_write_data.eq(shift_dma.data_memory_write_data),
+                        data_write_dma_write_data.eq(shift_dma.data_memory_write_data),
+                    ]
+
+                    with m.If(dma_memory_half == 0):  # read memory signals must be delayed by one cycle
+                        m.d.comb += shift_dma.data_memory_read_data.eq(data_read_dma_read_data)
+
+                    with m.Else():  # write memory
+                        m.d.comb += shift_dma.data_memory_read_data.eq(data_write_dma_read_data)
+
+                    with m.If(dma_memory_half_comb == 0):  # write memory signals must be switched immediately
+                        m.d.comb += [
+                            data_read_dma_write_en.eq(shift_dma.data_memory_write_enable),
+                            data_write_dma_write_en.eq(0),
+                        ]
+                    with m.Else():
+                        m.d.comb += [
+                            data_write_dma_write_en.eq(shift_dma.data_memory_write_enable),
+                            data_read_dma_write_en.eq(0),
+                        ]
+
+                with m.Else():   # the other buffer belongs to the axi interface
+                    data_read_axi_bank_address = self.data_read_axi_address[0:ring_axi_address_width]
+                    data_write_axi_bank_address = self.data_write_axi_address[0:ring_axi_address_width]
+                    data_write_axi_bank_enable = self.data_write_axi_enable & ((self.data_write_axi_address >> ring_axi_address_width) == ring)
+
+                    m.d.comb += [
+                        # pack read data into 64 bit data
+                        data_read_port_axi.addr.eq(data_read_axi_bank_address << 1),
+                        data_read_dma_address.eq(data_read_axi_bank_address << 1 | 0b1),
+
+                        # unpack 64 bit data into 32 bit data
+                        data_write_port_axi.addr.eq(data_write_axi_bank_address << 1),
+                        data_write_dma_address.eq(data_write_axi_bank_address << 1 | 0b1),
+                        data_write_port_axi.data.eq(self.data_write_axi_data[0:32]),
+                        data_write_dma_write_data.eq(self.data_write_axi_data[32:64]),
+                        data_write_port_axi.en.eq(data_write_axi_bank_enable),
+                        data_write_dma_write_en.eq(data_write_axi_bank_enable),
+                    ]
+
+                    with m.If(self.data_read_axi_bank == ring):
+                        m.d.comb += self.data_read_axi_data.eq(data_read_port_axi.data | (data_read_dma_read_data << 32))
+
+        self.shift_dma = self.shift_dmas[0]
+        m.d.comb += self.dma_busy.eq(Cat([shift_dma.busy for shift_dma in self.shift_dmas]).any())
 
 
         if(not self.sim):
@@ -456,346 +631,597 @@ class Controller(wiring.Component):
         # TODO: make these control registers be defined by the register address map
         # internal control signals
         # PL to PS
-        self.status = Signal(32)  # status register
+        self.status = Signal(32)  # status register, bits 0-3: instruction bank the dma ran from, bit 4: overrun
+        self.result_instruction_bank = Signal(range(self.INSTRUCTION_BANKS))  # bank of the dma cycle whose data is being transferred
+        m.d.comb += self.status[0:4].eq(self.result_instruction_bank)
+
+        self.cycle_overrun = Signal()   # the cycle timer expired while this cycle was still running
+        self.result_overrun = Signal()
+        self.overrun_count = Signal(32)
+        self.result_overrun_count = Signal(32)
+        m.d.comb += self.status[4].eq(self.result_overrun)
+
+        self.cycle_sequence = Signal(32)    # number of the running cycle
+        self.result_sequence = Signal(32)   # number of the cycle whose data is being transferred
+
+        # phase timestamps: dma start, dma done, axi start, axi done
+        self.timestamp = Signal(32) # free running
+        m.d.sync_100 += self.timestamp.eq(self.timestamp + 1)
+        self.cycle_timestamps = [Signal(32, name=f"cycle_timestamp_{i}") for i in range(4)]
+        self.result_timestamps = [Signal(32, name=f"result_timestamp_{i}") for i in range(4)]
+
+        # axi transfers the data of the previous dma cycle while the next one runs, so the counters of that cycle are kept for the transfer
+        self.perf_counters = [[Signal(64, name=f"perf_counters_{ring}_{word}") for word in range(3)] for ring in range(self.DMA_RING_COUNT)]
 
         # PS to PL
-        self.cycle_timer_config = Signal(16, reset=0xFFFF)   # main timer for triggering FPGA updates, 25Mhz clock, lowest possible update frequency is ~380hz
+        self.cycle_period = Signal(32, init=0x40000)   # main timer for triggering FPGA updates, sync_100 cycles, ~381hz until the PS sets it
+        self.cycle_period_fraction = Signal(16)   # 1/65536 sync_100 cycles added to every period, the remainder carries over to the next one
 
         if(self.sim):
-            self.cycle_timer_config = Signal(16, reset=0x0010)
-        self.cycle_timer = Signal(16)  # current timer value
-        self.dma_instruction_block_select = Signal(4)  # select which block of instructions to use
+            self.cycle_period = Signal(32, init=68)
+        self.cycle_timer = Signal(32)  # sync_100 cycles left in the current period
+        self.cycle_timer_fraction = Signal(16)  # fractional accumulator
+        self.cycle_trigger = Signal()   # pulses once every period
+        self.dma_instruction_block_select = Signal(range(self.INSTRUCTION_BANKS))  # select which bank of instructions to run, takes effect when the next dma cycle starts
+        self.overrun_policy = Signal(2)
+        self.trigger_pending = Signal() # a trigger came while the last cycle was running and the policy starts it late
 
 
         # AXI transfer section, this reads and writes to the OCM
 
         # NOTE: single transfers may not cross a 4KB boundary (usually not an issue as the bursts should always be boundary aligned)
 
+        # the address, data and response channels run independently so several bursts are in flight in each direction,
+        # there are no IDs so the OCM completes bursts in order and beats and responses are matched to bursts by counting them
+
         self.axi_write_busy = Signal()
         self.axi_read_busy = Signal()
         m.d.sync_100 += self.axi_transfer_busy.eq(self.axi_write_busy | self.axi_read_busy)
 
-        self.write_stages = {
-            0: {"offset": self.PL_TO_PS_CONTROL_OFFSET, "burst_size": self.PL_TO_PS_CONTROL_SIZE // 8},
-            1: {"offset": self.PL_TO_PS_DATA_OFFSET, "burst_size": self.PL_TO_PS_DATA_SIZE // 8},
-        }
-        self.write_stage = Signal(range(len(self.write_stages)+2))
-
-        self.read_stages = {
-            0: {"offset": self.PS_TO_PL_CONTROL_OFFSET, "burst_size": self.PS_TO_PL_CONTROL_SIZE // 8},
-            1: {"offset": self.PS_TO_PL_DATA_OFFSET, "burst_size": self.PS_TO_PL_DATA_SIZE // 8},
-            2: {"offset": self.PS_TO_PL_DMA_INSTRUCTION_OFFSET, "burst_size": self.PS_TO_PL_DMA_INSTRUCTION_SIZE // 8},
-        }
-        self.read_stage = Signal(range(len(self.read_stages)+2))
+        # transfer lengths from PS to PL control word 1, only as much of the data and instruction regions as the programs use is moved
+        self.ps_to_pl_data_length = Signal(16)
+        self.pl_to_ps_data_length = Signal(16)
+        self.instruction_length = Signal(16)
+
+        def stage_length(length, region_size):
+            return Mux((length == 0) | (length > region_size // 8), region_size // 8, length)
+
+        # descriptor tables, uploaded into the bank that is not in use and swapped in when the next transfer starts
+        descriptor_index_width = exact_log2(self.AXI_DESCRIPTORS)
+        m.submodules.read_descriptors = read_descriptors = Memory(shape=unsigned(48), depth=self.AXI_DESCRIPTORS * 2, init=[])
+        m.submodules.write_descriptors = write_descriptors = Memory(shape=unsigned(48), depth=self.AXI_DESCRIPTORS * 2, init=[])
+        self.descriptor_bank = Signal()
+        self.descriptor_upload = Signal()   # read the descriptor region this transfer
+        self.read_descriptors_enabled = Signal(2)   # per bank, the first entry of the table is not empty
+        self.write_descriptors_enabled = Signal(2)
+
+        def fixed_segment(offset, length):
+            # a stage that is one contiguous region, a length of 0 skips the stage
+            return lambda index: (offset // 8, Mux(index == 0, length, 0), 0)
+
+        def descriptor_segment(descriptors, enabled, offset, length):
+            # the entries of the descriptor table, or one contiguous region when the table is empty
+            def segment(index):
+                port = descriptors.read_port(domain="comb")
+                m.d.comb += port.addr.eq(Cat(index[0:descriptor_index_width], self.descriptor_bank))
+                enabled_bit = enabled.bit_select(self.descriptor_bank, 1)
+                return (Mux(enabled_bit, port.data[0:16], offset // 8),
+                        Mux(enabled_bit, Mux(index < self.AXI_DESCRIPTORS, port.data[16:32], 0), Mux(index == 0, length, 0)),
+                        Mux(enabled_bit, port.data[32:48], 0))
+            return segment
+
+        def segment_lookup(name, stages, stage, index):
+            # OCM address (64 bit words from the OCM base), length (64 bit words) and memory address of segment number index of a stage
+            ocm_word = Signal(exact_log2(self.OCM_SIZE // 8), name=f"{name}_ocm_word")
+            length = Signal(16, name=f"{name}_length")
+            memory_word = Signal(16, name=f"{name}_memory_word")
+            with m.Switch(stage):
+                for i, segment in enumerate(stages):
+                    with m.Case(i):
+                        segment_ocm_word, segment_length, segment_memory_word = segment(index)
+                        m.d.comb += [
+                            ocm_word.eq(segment_ocm_word),
+                            length.eq(segment_length),
+                            memory_word.eq(segment_memory_word),
+                        ]
+            return ocm_word, length, memory_word
+
+        # control is written last, copies still travelling back to the controller have been counted by then
+        self.write_data_length = Signal(16)     # latched when the transfer starts, the read side can change the lengths during the transfer
+        self.write_stages = [
+            descriptor_segment(write_descriptors, self.write_descriptors_enabled, self.PL_TO_PS_DATA_OFFSET, self.write_data_length),  # data
+            fixed_segment(self.PL_TO_PS_CONTROL_OFFSET, self.PL_TO_PS_CONTROL_SIZE // 8),    # control
+        ]
 
-        self.write_bursts_remaining = Signal(range(self.LARGEST_MEMORY_REGION // 8 + 1))
-        self.read_bursts_remaining = Signal(range(self.LARGEST_MEMORY_REGION // 8 + 1))
-        self.write_current_burst = Signal(4)
-        self.read_current_burst = Signal(4)
+        # instructions and descriptors are only read when they are uploaded
+        self.read_stages = [
+            fixed_segment(self.PS_TO_PL_CONTROL_OFFSET, self.PS_TO_PL_CONTROL_SIZE // 8),  # control
+            descriptor_segment(read_descriptors, self.read_descriptors_enabled, self.PS_TO_PL_DATA_OFFSET, stage_length(self.ps_to_pl_data_length, self.PS_TO_PL_DATA_SIZE)), # data
+            fixed_segment(self.PS_TO_PL_DMA_INSTRUCTION_OFFSET, Mux(self.instruction_upload, stage_length(self.instruction_length, self.PS_TO_PL_DMA_INSTRUCTION_SIZE), 0)),  # dma instructions
+            fixed_segment(self.AXI_DESCRIPTOR_OFFSET, Mux(self.descriptor_upload, self.AXI_DESCRIPTOR_SIZE // 8, 0)),  # descriptors
+        ]
 
         self.write_addr_complete = Signal()
         self.write_data_complete = Signal()
+        self.write_response_complete = Signal()
         m.d.comb += self.write_addr_complete.eq(self.AWVALID & self.AWREADY)
         m.d.comb += self.write_data_complete.eq(self.WVALID & self.WREADY)
+        m.d.comb += self.write_response_complete.eq(self.BVALID & self.BREADY)
 
         self.read_addr_complete = Signal()
+        self.read_data_complete = Signal()
         m.d.comb += self.read_addr_complete.eq(self.ARVALID & self.ARREADY)
+        m.d.comb += self.read_data_complete.eq(self.RVALID & self.RREADY)
+
+        def burst_beats(address, beats_remaining):
+            # bursts end on 16 beat (128 byte) boundaries of the OCM so they never cross a 4KB boundary
+            room = 16 - address[3:7]
+            return Mux(beats_remaining < room, beats_remaining, room)
 
 
         # write
-        self.internal_axi_read_address = Signal(range(self.LARGEST_MEMORY_REGION // 8 + 1))     # 64 bit block address
-        self.internal_axi_read_data = Signal(64)
-        self.internal_axi_read_valid = Signal()
-        self.last_axi_read_data = Signal(64)
-        self.axi_read_data_incremented = Signal()
-        self.timed_axi_read_data = Signal(64)
-
-        with m.If(self.axi_read_data_incremented):
-            m.d.sync_100 += self.axi_read_data_incremented.eq(0)
-            m.d.comb += self.timed_axi_read_data.eq(self.internal_axi_read_data)
-            m.d.sync_100 += self.last_axi_read_data.eq(self.internal_axi_read_data)
-        with m.Else():
-            m.d.comb += self.timed_axi_read_data.eq(self.last_axi_read_data)
+        # the address channel issues bursts while fewer than AXI_MAX_OUTSTANDING are waiting for a response,
+        # the data channel streams the beats of all segments with one cycle between segments and responses are only counted
 
-        with m.Switch(self.write_stage):
-            with m.Case(0): # control
-                with m.Switch(self.internal_axi_read_address):
-                    with m.Case(0):
-                        m.d.comb += self.internal_axi_read_data.eq(self.status)
-                    with m.Default():
-                        m.d.comb += self.internal_axi_read_data.eq(0)
-                m.d.sync_100 += self.internal_axi_read_valid.eq(1)
+        self.write_address_stage = Signal(range(len(self.write_stages) + 1))
+        self.write_address_index = Signal(range(self.AXI_DESCRIPTORS + 1))
+        self.write_address_beats_remaining = Signal(16)
+        self.write_bursts_outstanding = Signal(range(self.AXI_MAX_OUTSTANDING + 1))  # bursts issued that have not had a response yet
+        self.write_burst_issued = Signal()
 
-            with m.Case(1): # data
-                m.d.comb += self.data_read_axi_address.eq(self.internal_axi_read_address)
-                m.d.comb += self.internal_axi_read_data.eq(self.data_read_axi_data)
-                m.d.sync_100 += self.internal_axi_read_valid.eq(1)
-                pass
+        write_address_ocm_word, write_address_length, _ = segment_lookup("write_address", self.write_stages, self.write_address_stage, self.write_address_index)
+
+        with m.If(self.write_burst_issued & ~self.write_response_complete):
+            m.d.sync_100 += self.write_bursts_outstanding.eq(self.write_bursts_outstanding + 1)
+        with m.Elif(~self.write_burst_issued & self.write_response_complete):
+            m.d.sync_100 += self.write_bursts_outstanding.eq(self.write_bursts_outstanding - 1)
+
+        m.d.comb += self.BREADY.eq(self.write_bursts_outstanding != 0)
 
-        
         with m.FSM(init="idle", domain="sync_100"):
             with m.State("idle"):
-                #m.d.sync_100 += self.debug_pins.eq(0b00000000)
-                m.d.sync_100 += self.BREADY.eq(0)
                 m.d.sync_100 += self.AWVALID.eq(0)
-                m.d.sync_100 += self.WVALID.eq(0)
-                m.d.sync_100 += self.WLAST.eq(0)
                 m.d.sync_100 += self.axi_write_busy.eq(0)
-                m.d.sync_100 += self.write_stage.eq(0)
+                m.d.sync_100 += self.write_address_stage.eq(0)
+                m.d.sync_100 += self.write_address_index.eq(0)
                 with m.If(self.axi_transfer_start):
                     m.d.sync_100 += self.axi_write_busy.eq(1)
+                    m.d.sync_100 += self.write_data_length.eq(stage_length(self.pl_to_ps_data_length, self.PL_TO_PS_DATA_SIZE))
                     m.next = "get_write_config"
-            
-            with m.State("get_write_config"):
-                #m.d.sync_100 += self.debug_pins.eq(0b00000001)
-                with m.Switch(self.write_stage):
-                    for i, stage in self.write_stages.items():
-                        with m.Case(i):
-                            m.d.sync_100 += self.AWADDR.eq(int(stage["offset"] + self.OCM_BASE_ADDR))
-                            m.d.sync_100 += self.write_bursts_remaining.eq(stage["burst_size"])
-
-                m.d.sync_100 += self.internal_axi_read_address.eq(0)
-                m.next = "set_write_address"
 
-            with m.State("set_write_address"):
-                #m.d.sync_100 += self.debug_pins.eq(0b00000010)
-                with m.If(self.write_bursts_remaining >= 16):
-                    m.d.sync_100 += self.AWLEN.eq(16-1)  # up to 16 burst length
-                    m.d.sync_100 += self.write_bursts_remaining.eq(self.write_bursts_remaining - 16)
+            with m.State("get_write_config"):
+                with m.If(self.write_address_stage == len(self.write_stages)):
+                    m.next = "write_response_wait"
+                with m.Elif(write_address_length == 0):  # past the last segment of the stage
+                    m.d.sync_100 += self.write_address_stage.eq(self.write_address_stage + 1)
+                    m.d.sync_100 += self.write_address_index.eq(0)
                 with m.Else():
-                    m.d.sync_100 += self.AWLEN.eq(self.write_bursts_remaining-1)
-                    m.d.sync_100 += self.write_bursts_remaining.eq(0)
-                m.d.sync_100 += self.write_current_burst.eq(0)
-                m.d.sync_100 += self.AWVALID.eq(1)
-
-                m.next = "set_write_data"
+                    m.d.sync_100 += self.AWADDR.eq(self.OCM_BASE_ADDR + (write_address_ocm_word << 3))
+                    m.d.sync_100 += self.write_address_beats_remaining.eq(write_address_length)
+                    m.next = "set_write_address"
 
-            with m.State("set_write_data"):
-                #m.d.sync_100 += self.debug_pins.eq(0b00000100)
+            with m.State("set_write_address"):
                 with m.If(self.write_addr_complete):
                     m.d.sync_100 += self.AWVALID.eq(0)
+                    m.d.sync_100 += self.AWADDR.eq(self.AWADDR + ((self.AWLEN + 1) << 3))
 
-                with m.If(self.write_current_burst == self.AWLEN):
-                    m.d.sync_100 += self.WLAST.eq(1)
-                with m.Else():
-                    m.d.sync_100 += self.WLAST.eq(0)
-
-                with m.If(self.internal_axi_read_valid):
-                    #m.d.sync_100 += self.WDATA.eq(self.internal_axi_read_data)
-                    m.d.comb += self.WDATA.eq(self.timed_axi_read_data)
-                    m.d.sync_100 += self.axi_read_data_incremented.eq(1)
-                    m.d.sync_100 += self.WVALID.eq(1)
-                    m.d.sync_100 += self.internal_axi_read_address.eq(self.internal_axi_read_address + 1)
-                    #m.d.sync_100 += self.last_axi_read_data.eq(self.internal_axi_read_data)
-                    m.d.sync_100 += self.write_current_burst.eq(self.write_current_burst + 1)
-                    m.next = "wait_write"
-            
-            with m.State("wait_write"):
-                #m.d.sync_100 += self.debug_pins.eq(0b00001000)
+                with m.If(~self.AWVALID | self.write_addr_complete):
+                    with m.If(self.write_address_beats_remaining == 0):
+                        m.d.sync_100 += self.write_address_index.eq(self.write_address_index + 1)
+                        m.next = "get_write_config"
 
-                with m.If(self.write_addr_complete):
-                    m.d.sync_100 += self.AWVALID.eq(0)
-                with m.If(self.write_data_complete):
-                    m.d.sync_100 += self.WVALID.eq(0)
-                    with m.If(~self.WLAST):
-                        m.d.sync_100 += self.internal_axi_read_address.eq(self.internal_axi_read_address + 1)
-                        m.d.sync_100 += self.axi_read_data_incremented.eq(1)
-                with m.If((~self.AWVALID) & (~self.WVALID) | (self.write_addr_complete & self.write_data_complete) | (~self.AWVALID & self.write_data_complete)):
-                    with m.If(self.WLAST):
-                        m.d.sync_100 += self.BREADY.eq(1)
-                        m.d.comb += self.WDATA.eq(self.timed_axi_read_data)
-                        m.next = "write_response_wait"
-                        
-                    with m.Else():
-                        with m.If(self.write_current_burst == self.AWLEN):
-                            m.d.sync_100 += self.WLAST.eq(1)
-                        with m.Else():
-                            m.d.sync_100 += self.WLAST.eq(0)
-
-                        with m.If(self.internal_axi_read_valid):
-                            #m.d.sync_100 += self.WDATA.eq(self.timed_axi_read_data)
-                            m.d.comb += self.WDATA.eq(self.timed_axi_read_data)
-                            m.d.sync_100 += self.WVALID.eq(1)
-                            m.d.sync_100 += self.internal_axi_read_address.eq(self.internal_axi_read_address + 1)
-                            m.d.sync_100 += self.last_axi_read_data.eq(self.internal_axi_read_data)
-                            m.d.sync_100 += self.write_current_burst.eq(self.write_current_burst + 1)
-                
-                with m.Else():
-                    m.d.comb += self.WDATA.eq(self.timed_axi_read_data)
+                    with m.Elif(self.write_bursts_outstanding != self.AXI_MAX_OUTSTANDING):
+                        beats = burst_beats(Mux(self.write_addr_complete, self.AWADDR + ((self.AWLEN + 1) << 3), self.AWADDR), self.write_address_beats_remaining)
+                        m.d.sync_100 += self.AWLEN.eq(beats - 1)
+                        m.d.sync_100 += self.write_address_beats_remaining.eq(self.write_address_beats_remaining - beats)
+                        m.d.sync_100 += self.AWVALID.eq(1)
+                        m.d.comb += self.write_burst_issued.eq(1)
 
             with m.State("write_response_wait"):
-                #m.d.sync_100 += self.debug_pins.eq(0b00010000)
-                
-                with m.If(self.BVALID):
+                # TODO: do something with the responses
+                with m.If(self.write_bursts_outstanding == 0):  # the last response comes after the last beat
+                    m.next = "idle"
 
-                    # TODO: do something with the response here
+        # write data, the memories have one cycle of read latency so beats are read ahead into a skid register to keep WVALID high while WREADY is
+        self.internal_axi_read_address = Signal(16)     # 64 bit block address of the next beat to read
+        self.internal_axi_read_data = Signal(64)
+        self.control_read_data = Signal(64)     # registered so control words have the same read latency as the data memory
+        self.write_stage = Signal(range(len(self.write_stages) + 1), init=len(self.write_stages))    # stage of the next beat to read, all stages have been read when it is past the last one
+        self.write_index = Signal(range(self.AXI_DESCRIPTORS + 1))
+        self.write_segment_loaded = Signal()
+        self.write_beats_remaining = Signal(16)     # in the loaded segment
+        self.write_ocm_word = Signal(4)     # low bits of the OCM address of the next beat, for finding the ends of the bursts
+
+        write_ocm_word, write_length, write_memory_word = segment_lookup("write", self.write_stages, self.write_stage, self.write_index)
+
+        self.write_beat_read = Signal()     # beat read from memory this cycle, its data is valid on the next cycle
+        self.write_beat_last = Signal()
+        self.write_beat_pending = Signal()  # beat read last cycle
+        self.write_beat_pending_last = Signal()
+        self.write_beat_pending_stage = Signal(range(len(self.write_stages)))
+        self.write_skid_valid = Signal()
+        self.write_skid_data = Signal(64)
+        self.write_skid_last = Signal()
 
-                    with m.If(self.write_bursts_remaining != 0):
-                        m.d.sync_100 += self.AWADDR.eq(self.AWADDR + 16*8)
-                        m.next = "set_write_address"
-                    with m.Elif(self.write_stage != len(self.write_stages)-1):
-                        m.d.sync_100 += self.write_stage.eq(self.write_stage + 1)
-                        m.next = "get_write_config"
-                    with m.Else():
-                        m.next = "idle"
+        with m.Switch(self.write_stage):
+            with m.Case(0): # data
+                m.d.comb += self.data_read_axi_address.eq(self.internal_axi_read_address)
+
+        with m.Switch(self.internal_axi_read_address):  # control
+            with m.Case(0):
+                m.d.sync_100 += self.control_read_data.eq(Cat(self.status, self.result_sequence))
+            for word in range(self.CYCLE_TIMESTAMPS_SIZE // 8):
+                with m.Case(self.CYCLE_TIMESTAMPS_OFFSET // 8 + word):
+                    m.d.sync_100 += self.control_read_data.eq(Cat(self.result_timestamps[2*word], self.result_timestamps[2*word + 1]))
+            with m.Case(self.OVERRUN_COUNTER_OFFSET // 8):
+                m.d.sync_100 += self.control_read_data.eq(self.result_overrun_count)
+            for ring, counters in enumerate(self.perf_counters):
+                counter_word = (self.DMA_PERF_COUNTER_OFFSET + self.DMA_PERF_COUNTER_SIZE * ring) // 8
+                for word, counter in enumerate(counters):
+                    with m.Case(counter_word + word):
+                        m.d.sync_100 += self.control_read_data.eq(counter)
+            with m.Default():
+                m.d.sync_100 += self.control_read_data.eq(0)
+
+        with m.Switch(self.write_beat_pending_stage):
+            with m.Case(0): # data
+                m.d.comb += self.internal_axi_read_data.eq(self.data_read_axi_data)
+            with m.Case(1): # control
+                m.d.comb += self.internal_axi_read_data.eq(self.control_read_data)
+
+        # only read a beat if WDATA and the skid register can hold every beat that is already on its way
+        write_beat_held = self.WVALID & ~self.WREADY
+        m.d.comb += self.write_beat_read.eq(self.write_segment_loaded &
+                                            ~((write_beat_held & self.write_skid_valid) | (write_beat_held & self.write_beat_pending) | (self.write_skid_valid & self.write_beat_pending)))
+        m.d.comb += self.write_beat_last.eq((self.write_ocm_word == 16-1) | (self.write_beats_remaining == 1))  # same bursts as the address channel
+
+        with m.If(self.axi_transfer_start & ~self.axi_write_busy):
+            m.d.sync_100 += self.write_stage.eq(0)
+            m.d.sync_100 += self.write_index.eq(0)
+            m.d.sync_100 += self.write_segment_loaded.eq(0)
+        with m.Elif(~self.write_segment_loaded):
+            with m.If(self.write_stage != len(self.write_stages)):
+                with m.If(write_length == 0):  # past the last segment of the stage
+                    m.d.sync_100 += self.write_stage.eq(self.write_stage + 1)
+                    m.d.sync_100 += self.write_index.eq(0)
+                with m.Else():
+                    m.d.sync_100 += [
+                        self.write_segment_loaded.eq(1),
+                        self.write_beats_remaining.eq(write_length),
+                        self.write_ocm_word.eq(write_ocm_word[0:4]),
+                        self.internal_axi_read_address.eq(write_memory_word),
+                    ]
+        with m.Elif(self.write_beat_read):
+            m.d.sync_100 += [
+                self.write_beats_remaining.eq(self.write_beats_remaining - 1),
+                self.write_ocm_word.eq(self.write_ocm_word + 1),
+                self.internal_axi_read_address.eq(self.internal_axi_read_address + 1),
+            ]
+            with m.If(self.write_beats_remaining == 1):
+                m.d.sync_100 += self.write_segment_loaded.eq(0)
+                m.d.sync_100 += self.write_index.eq(self.write_index + 1)
+
+        m.d.sync_100 += [
+            self.write_beat_pending.eq(self.write_beat_read),
+            self.write_beat_pending_last.eq(self.write_beat_last),
+            self.write_beat_pending_stage.eq(self.write_stage),
+        ]
+
+        with m.If(~self.WVALID | self.WREADY):
+            with m.If(self.write_skid_valid):
+                m.d.sync_100 += [
+                    self.WVALID.eq(1),
+                    self.WDATA.eq(self.write_skid_data),
+                    self.WLAST.eq(self.write_skid_last),
+                    self.write_skid_valid.eq(self.write_beat_pending),
+                    self.write_skid_data.eq(self.internal_axi_read_data),
+                    self.write_skid_last.eq(self.write_beat_pending_last),
+                ]
+            with m.Elif(self.write_beat_pending):
+                m.d.sync_100 += [
+                    self.WVALID.eq(1),
+                    self.WDATA.eq(self.internal_axi_read_data),
+                    self.WLAST.eq(self.write_beat_pending_last),
+                ]
+            with m.Else():
+                m.d.sync_100 += self.WVALID.eq(0)
+                m.d.sync_100 += self.WLAST.eq(0)
+        with m.Elif(self.write_beat_pending):
+            m.d.sync_100 += [
+                self.write_skid_valid.eq(1),
+                self.write_skid_data.eq(self.internal_axi_read_data),
+                self.write_skid_last.eq(self.write_beat_pending_last),
+            ]
 
 
         # read
-        self.internal_axi_write_address = Signal(range(self.LARGEST_MEMORY_REGION // 8 + 1))     # 64 bit block address
+        # the control stage is read first and sets the lengths of the other stages and what is uploaded,
+        # so the next stages are only requested once it has arrived, after that bursts are requested while fewer than AXI_MAX_OUTSTANDING are waiting for data
+
+        self.read_address_stage = Signal(range(len(self.read_stages) + 1))
+        self.read_address_index = Signal(range(self.AXI_DESCRIPTORS + 1))
+        self.read_address_beats_remaining = Signal(16)
+        self.read_bursts_outstanding = Signal(range(self.AXI_MAX_OUTSTANDING + 1))  # bursts requested that have not had their last beat yet
+        self.read_burst_issued = Signal()
+
+        read_address_ocm_word, read_address_length, _ = segment_lookup("read_address", self.read_stages, self.read_address_stage, self.read_address_index)
+
+        read_burst_complete = self.read_data_complete & self.RLAST
+        with m.If(self.read_burst_issued & ~read_burst_complete):
+            m.d.sync_100 += self.read_bursts_outstanding.eq(self.read_bursts_outstanding + 1)
+        with m.Elif(~self.read_burst_issued & read_burst_complete):
+            m.d.sync_100 += self.read_bursts_outstanding.eq(self.read_bursts_outstanding - 1)
+
+        # read data side, declared here as the address side waits for it to finish the control stage
+        self.read_stage = Signal(range(len(self.read_stages) + 1), init=len(self.read_stages))  # stage of the next beat that arrives, all stages are done when it is past the last one
+        self.read_index = Signal(range(self.AXI_DESCRIPTORS + 1))
+        self.read_segment_loaded = Signal()
+        self.read_beats_remaining = Signal(16)  # in the loaded segment
+
+        with m.FSM(init="idle", domain="sync_100"):
+            with m.State("idle"):
+                m.d.sync_100 += self.ARVALID.eq(0)
+                m.d.sync_100 += self.axi_read_busy.eq(0)
+                m.d.sync_100 += self.read_address_stage.eq(0)
+                m.d.sync_100 += self.read_address_index.eq(0)
+
+                with m.If(self.axi_transfer_start):
+                    m.d.sync_100 += self.axi_read_busy.eq(1)
+                    with m.If(self.descriptor_upload):  # the tables uploaded by the last transfer are used from this one
+                        m.d.sync_100 += self.descriptor_bank.eq(~self.descriptor_bank)
+                    m.next = "get_read_config"
+
+            with m.State("get_read_config"):
+                with m.If(self.read_address_stage == len(self.read_stages)):
+                    m.next = "read_data_wait"
+                with m.Elif(read_address_length == 0):  # past the last segment of the stage, or a stage that is not read
+                    m.d.sync_100 += self.read_address_stage.eq(self.read_address_stage + 1)
+                    m.d.sync_100 += self.read_address_index.eq(0)
+                with m.Else():
+                    m.d.sync_100 += self.ARADDR.eq(self.OCM_BASE_ADDR + (read_address_ocm_word << 3))
+                    m.d.sync_100 += self.read_address_beats_remaining.eq(read_address_length)
+                    m.next = "set_read_address"
+
+            with m.State("set_read_address"):
+                with m.If(self.read_addr_complete):
+                    m.d.sync_100 += self.ARVALID.eq(0)
+                    m.d.sync_100 += self.ARADDR.eq(self.ARADDR + ((self.ARLEN + 1) << 3))
+
+                with m.If(~self.ARVALID | self.read_addr_complete):
+                    with m.If(self.read_address_beats_remaining == 0):
+                        with m.If(self.read_address_stage == 0):
+                            m.next = "read_control_wait"
+                        with m.Else():
+                            m.d.sync_100 += self.read_address_index.eq(self.read_address_index + 1)
+                            m.next = "get_read_config"
+
+                    with m.Elif(self.read_bursts_outstanding != self.AXI_MAX_OUTSTANDING):
+                        beats = burst_beats(Mux(self.read_addr_complete, self.ARADDR + ((self.ARLEN + 1) << 3), self.ARADDR), self.read_address_beats_remaining)
+                        m.d.sync_100 += self.ARLEN.eq(beats - 1)
+                        m.d.sync_100 += self.read_address_beats_remaining.eq(self.read_address_beats_remaining - beats)
+                        m.d.sync_100 += self.ARVALID.eq(1)
+                        m.d.comb += self.read_burst_issued.eq(1)
+
+            with m.State("read_control_wait"):
+                with m.If(self.read_stage != 0):
+                    m.d.sync_100 += self.read_address_stage.eq(1)
+                    m.d.sync_100 += self.read_address_index.eq(0)
+                    m.next = "get_read_config"
+
+            with m.State("read_data_wait"):
+                with m.If(self.read_stage == len(self.read_stages)):
+                    m.next = "idle"
+
+        # read data, every beat is written as it arrives, beats are only accepted while a segment is loaded
+        self.internal_axi_write_address = Signal(16)     # 64 bit block address
         self.internal_axi_write_data = Signal(64)
-        self.internal_axi_write_ready = Signal()
         self.internal_axi_write_enable = Signal()
 
+        read_ocm_word, read_length, read_memory_word = segment_lookup("read", self.read_stages, self.read_stage, self.read_index)
+
+        m.d.comb += [
+            self.RREADY.eq((self.read_bursts_outstanding != 0) & self.read_segment_loaded),
+            self.internal_axi_write_data.eq(self.RDATA),
+            self.internal_axi_write_enable.eq(self.read_data_complete),
+        ]
+
+        with m.If(self.axi_transfer_start & ~self.axi_read_busy):
+            m.d.sync_100 += self.read_stage.eq(0)
+            m.d.sync_100 += self.read_index.eq(0)
+            m.d.sync_100 += self.read_segment_loaded.eq(0)
+        with m.Elif(~self.read_segment_loaded):
+            with m.If(self.read_stage != len(self.read_stages)):
+                with m.If(read_length == 0):
+                    m.d.sync_100 += self.read_stage.eq(self.read_stage + 1)
+                    m.d.sync_100 += self.read_index.eq(0)
+                with m.Else():
+                    m.d.sync_100 += [
+                        self.read_segment_loaded.eq(1),
+                        self.read_beats_remaining.eq(read_length),
+                        self.internal_axi_write_address.eq(read_memory_word),
+                    ]
+        with m.Elif(self.read_data_complete):
+            m.d.sync_100 += self.read_beats_remaining.eq(self.read_beats_remaining - 1)
+            m.d.sync_100 += self.internal_axi_write_address.eq(self.internal_axi_write_address + 1)
+            with m.If(self.read_beats_remaining == 1):
+                m.d.sync_100 += self.read_segment_loaded.eq(0)
+                m.d.sync_100 += self.read_index.eq(self.read_index + 1)
+
+        read_descriptor_port = read_descriptors.write_port(domain="sync_100")
+        write_descriptor_port = write_descriptors.write_port(domain="sync_100")
+        upload_bank = ~self.descriptor_bank
+
         with m.Switch(self.read_stage):
             with m.Case(0): # control
                 with m.Switch(self.internal_axi_write_address):
                     with m.Case(0):
                         with m.If(self.internal_axi_write_enable):
-                            m.d.sync_100 += self.cycle_timer_config.eq(self.internal_axi_write_data[0:16])
-                            m.d.sync_100 += self.dma_instruction_block_select.eq(self.internal_axi_write_data[16:20])
+                            m.d.sync_100 += self.dma_instruction_block_select.eq(self.internal_axi_write_data[16:16 + len(self.dma_instruction_block_select)])
+                            m.d.sync_100 += self.instruction_upload_bank.eq(self.internal_axi_write_data[20:20 + len(self.instruction_upload_bank)])
+                            m.d.sync_100 += self.instruction_upload.eq(self.internal_axi_write_data[24])
+                            m.d.sync_100 += self.overrun_policy.eq(self.internal_axi_write_data[25:27])
+                            m.d.sync_100 += self.descriptor_upload.eq(self.internal_axi_write_data[27])
+                    with m.Case(self.CYCLE_PERIOD_OFFSET // 8):
+                        with m.If(self.internal_axi_write_enable):
+                            m.d.sync_100 += self.cycle_period.eq(self.internal_axi_write_data[0:32])
+                            m.d.sync_100 += self.cycle_period_fraction.eq(self.internal_axi_write_data[32:48])
+                    with m.Case(self.TRANSFER_LENGTHS_OFFSET // 8):
+                        with m.If(self.internal_axi_write_enable):
+                            m.d.sync_100 += self.ps_to_pl_data_length.eq(self.internal_axi_write_data[0:16])
+                            m.d.sync_100 += self.pl_to_ps_data_length.eq(self.internal_axi_write_data[16:32])
+                            m.d.sync_100 += self.instruction_length.eq(self.internal_axi_write_data[32:48])
                     with m.Default():
                         pass
-                m.d.sync_100 += self.internal_axi_write_ready.eq(1)
 
             with m.Case(1): # data
                 m.d.comb += self.data_write_axi_address.eq(self.internal_axi_write_address)
                 m.d.comb += self.data_write_axi_data.eq(self.internal_axi_write_data)
                 m.d.comb += self.data_write_axi_enable.eq(self.internal_axi_write_enable)
-                m.d.sync_100 += self.internal_axi_write_ready.eq(1)
 
             with m.Case(2): # dma instructions
-                m.d.comb += self.instruction_write_address.eq(self.internal_axi_write_address | self.dma_instruction_block_select << 12)    # TODO: verify this works
+                m.d.comb += self.instruction_write_address.eq(self.internal_axi_write_address)
                 m.d.comb += self.instruction_write_data.eq(self.internal_axi_write_data)
                 m.d.comb += self.instruction_write_en.eq(self.internal_axi_write_enable)
-                m.d.sync_100 += self.internal_axi_write_ready.eq(1)
-
-        with m.FSM(init="idle", domain="sync_100"):
-            with m.State("idle"):
-                m.d.sync_100 += self.RREADY.eq(0)
-                m.d.sync_100 += self.ARVALID.eq(0)
-                m.d.sync_100 += self.axi_read_busy.eq(0)
-                m.d.sync_100 += self.read_stage.eq(0)
 
-                with m.If(self.axi_transfer_start):
-                    m.d.sync_100 += self.axi_read_busy.eq(1)
-                    m.next = "get_read_config"
-            
-            with m.State("get_read_config"):
-                with m.Switch(self.read_stage):
-                    for i, stage in self.read_stages.items():
-                        with m.Case(i):
-                            m.d.sync_100 += self.ARADDR.eq(int(stage["offset"] + self.OCM_BASE_ADDR))
-                            m.d.sync_100 += self.read_bursts_remaining.eq(stage["burst_size"])
-
-                m.d.sync_100 += self.internal_axi_write_address.eq(0)
-                
-                m.next = "set_read_address"
-
-            with m.State("set_read_address"):
-                with m.If(self.read_bursts_remaining >= 16):
-                    m.d.sync_100 += self.ARLEN.eq(16-1)  # up to 16 burst length
-                    m.d.sync_100 += self.read_bursts_remaining.eq(self.read_bursts_remaining - 16)
-                with m.Else():
-                    m.d.sync_100 += self.ARLEN.eq(self.read_bursts_remaining-1)
-                    m.d.sync_100 += self.read_bursts_remaining.eq(0)
-                m.d.sync_100 += self.read_current_burst.eq(0)
-                m.d.sync_100 += self.ARVALID.eq(1)
-                m.next = "get_read_data_wait"
-
-            with m.State("get_read_data_wait"):
-                with m.If(self.read_addr_complete):
-                    m.d.sync_100 += self.ARVALID.eq(0)
-                with m.If(self.RVALID & self.internal_axi_write_ready):
-                    m.d.sync_100 += self.RREADY.eq(1)
-                    m.d.comb += self.internal_axi_write_data.eq(self.RDATA)
-                    
-                with m.Else():
-                    m.d.sync_100 += self.RREADY.eq(0)
-                    #m.d.comb += self.internal_axi_write_enable.eq(0)
-
-                with m.If(self.RVALID & self.RREADY):
-                    m.d.sync_100 += self.internal_axi_write_address.eq(self.internal_axi_write_address + 1)
-                    m.d.sync_100 += self.read_current_burst.eq(self.read_current_burst + 1)
-                    m.d.comb += self.internal_axi_write_enable.eq(1)
-                    
-
-                    with m.If(self.RLAST):
-                        #m.d.comb += self.internal_axi_write_enable.eq(0)
-                        with m.If(self.read_bursts_remaining != 0):
-                            m.d.sync_100 += self.ARADDR.eq(self.ARADDR + 16*8)
-                            m.next = "set_read_address"
-                        with m.Elif(self.read_stage != len(self.read_stages)-1):
-                            m.d.sync_100 += self.read_stage.eq(self.read_stage + 1)
-                            m.next = "get_read_config"
-                        with m.Else():
-                            m.next = "idle"
-                        
-                with m.Else():
-                    m.d.comb += self.internal_axi_write_enable.eq(0)
+            with m.Case(3): # descriptors, PS to PL table first
+                table_write = self.internal_axi_write_address[descriptor_index_width]
+                m.d.comb += [
+                    read_descriptor_port.addr.eq(Cat(self.internal_axi_write_address[0:descriptor_index_width], upload_bank)),
+                    read_descriptor_port.data.eq(self.internal_axi_write_data[0:48]),
+                    read_descriptor_port.en.eq(self.internal_axi_write_enable & ~table_write),
+                    write_descriptor_port.addr.eq(Cat(self.internal_axi_write_address[0:descriptor_index_width], upload_bank)),
+                    write_descriptor_port.data.eq(self.internal_axi_write_data[0:48]),
+                    write_descriptor_port.en.eq(self.internal_axi_write_enable & table_write),
+                ]
+                with m.If(self.internal_axi_write_enable & (self.internal_axi_write_address[0:descriptor_index_width] == 0)):
+                    with m.If(table_write):
+                        m.d.sync_100 += self.write_descriptors_enabled.bit_select(upload_bank, 1).eq(self.internal_axi_write_data[16:32] != 0)
+                    with m.Else():
+                        m.d.sync_100 += self.read_descriptors_enabled.bit_select(upload_bank, 1).eq(self.internal_axi_write_data[16:32] != 0)
 
-        # main cycle trigger timer
+        # main cycle trigger timer, a period is cycle_period sync_100 cycles plus one whenever the fractional accumulator overflows
+        fraction_sum = Signal(17)
+        m.d.comb += fraction_sum.eq(self.cycle_timer_fraction + self.cycle_period_fraction)
+        m.d.comb += self.cycle_trigger.eq((self.cycle_timer == 0) & (self.cycle_period != 0))
         with m.If(self.cycle_timer == 0):
-            m.d.sync_25 += self.cycle_timer.eq(self.cycle_timer_config)
+            with m.If(self.cycle_period != 0):
+                m.d.sync_100 += self.cycle_timer.eq(self.cycle_period - 1 + fraction_sum[16])
+                m.d.sync_100 += self.cycle_timer_fraction.eq(fraction_sum[0:16])
         with m.Else():
-            m.d.sync_25 += self.cycle_timer.eq(self.cycle_timer - 1)
+            m.d.sync_100 += self.cycle_timer.eq(self.cycle_timer - 1)
 
+        # the dma and the axi hold start for a few cycles, the dma needs them to fetch its first instruction
+        start_cycles = Signal(range(self.START_CYCLES))
 
-        with m.FSM(init="idle", domain="sync_25"):
+
+        # each phase flag is timestamped on the sync_100 edge it rises on
+        phase_flags = Cat(self.dma_cycle_running, self.dma_cycle_done, self.memory_update_running, self.memory_update_done)
+        last_phase_flags = Signal.like(phase_flags)
+        m.d.sync_100 += last_phase_flags.eq(phase_flags)
+        for i, timestamp in enumerate(self.cycle_timestamps):
+            with m.If(phase_flags[i] & ~last_phase_flags[i]):
+                m.d.sync_100 += timestamp.eq(self.timestamp)
+
+        # the dma and the axi transfer run at the same time on different data buffers, so a cycle takes as long as the slower of the two
+        with m.FSM(init="idle", domain="sync_100") as cycle_fsm:
             with m.State("idle"):
                 m.d.sync_100 += self.pl_ps_interrupts[0].eq(0)
-                with m.If(self.cycle_timer == 0):
-                    with m.If(self.cycle_timer_config != 0):    # writing zero to the timer will permanently stop the system (must be done before FPGA reconfiguration)
-                        m.next = "start_dma"
+                with m.If(self.cycle_trigger | self.trigger_pending):
+                    m.d.sync_100 += self.trigger_pending.eq(0)
+                    with m.If(self.trigger_pending & (self.overrun_policy == self.OVERRUN_STRETCH)):
+                        m.d.sync_100 += self.cycle_timer.eq(self.cycle_period - 1)
+                    with m.If(self.cycle_period != 0):    # writing zero to the period will permanently stop the system (must be done before FPGA reconfiguration)
+                        # the last dma cycle becomes the one that axi transfers
+                        m.d.sync_100 += self.dma_data_buffer.eq(self.dma_data_buffer + 1)
+                        m.d.sync_100 += self.result_instruction_bank.eq(self.instruction_bank)
+                        for shift_dma, counters in zip(self.shift_dmas, self.perf_counters):
+                            m.d.sync_100 += [
+                                counters[0].eq(Cat(shift_dma.perf_busy_cycles, shift_dma.perf_stall_cycles)),
+                                counters[1].eq(Cat(shift_dma.perf_copies_issued, shift_dma.perf_copies_completed)),
+                                counters[2].eq(Cat(shift_dma.perf_nop_cycles, shift_dma.perf_hazard_cycles)),
+                            ]
+                        m.d.sync_100 += [result.eq(timestamp) for result, timestamp in zip(self.result_timestamps, self.cycle_timestamps)]
+                        m.d.sync_100 += [
+                            self.result_overrun.eq(self.cycle_overrun),
+                            self.result_overrun_count.eq(self.overrun_count),
+                            self.cycle_overrun.eq(0),
+                            self.result_sequence.eq(self.cycle_sequence),
+                            self.cycle_sequence.eq(self.cycle_sequence + 1),
+                        ]
+                        m.d.sync_100 += self.instruction_bank.eq(self.dma_instruction_block_select)  # program swaps only happen between dma cycles
+                        m.d.sync_100 += start_cycles.eq(0)
+                        m.next = "start_cycle"
+
+            with m.State("start_cycle"):
+                for shift_dma in self.shift_dmas:
+                    m.d.sync_100 += shift_dma.start.eq(1)
+                m.d.sync_100 += self.axi_transfer_start.eq(1)
 
-            
-            with m.State("start_dma"):
-                m.d.sync_100 += self.shift_dma.start.eq(1)
-                
-                m.d.sync_100 += self.memory_update_running.eq(0)
+                m.d.sync_100 += self.memory_update_running.eq(1)
                 m.d.sync_100 += self.memory_update_done.eq(0)
+                m.d.sync_100 += self.feedback_ready.eq(0)
                 m.d.sync_100 += self.dma_cycle_done.eq(0)
                 m.d.sync_100 += self.dma_cycle_running.eq(1)
-                m.next = "run_dma"
-            
-            with m.State("run_dma"):
-                m.d.sync_100 += self.shift_dma.start.eq(0)
-                with m.If(~self.shift_dma.busy):
+                m.d.sync_100 += start_cycles.eq(start_cycles + 1)
+                with m.If(start_cycles == self.START_CYCLES - 1):
+                    m.next = "run_cycle"
+
+            with m.State("run_cycle"):
+                for shift_dma in self.shift_dmas:
+                    m.d.sync_100 += shift_dma.start.eq(0)
+                m.d.sync_100 += self.axi_transfer_start.eq(0)
+
+                with m.If(~self.dma_busy):   # wait for all rings to finish
                     m.d.sync_100 += self.dma_cycle_done.eq(1)
                     m.d.sync_100 += self.dma_cycle_running.eq(0)
-                    m.next = "start_axi_transfer"
 
-            with m.State("start_axi_transfer"):
-                m.d.sync_100 += self.axi_transfer_start.eq(1)
-                m.d.sync_100 += self.memory_update_running.eq(1)
-                m.next = "wait_axi_transfer"
+                # the write side only finishes once every response is back, so the PS can use the feedback while the reads are still running
+                with m.If(~self.axi_write_busy):
+                    m.d.sync_100 += self.feedback_ready.eq(1)
 
-            with m.State("wait_axi_transfer"):
-                m.d.sync_100 += self.axi_transfer_start.eq(0)
                 with m.If(~self.axi_transfer_busy):
                     m.d.sync_100 += self.memory_update_running.eq(0)
                     m.d.sync_100 += self.memory_update_done.eq(1)
-                    m.d.sync_100 += self.pl_ps_interrupts[0].eq(1)
+
+                with m.If(self.dma_cycle_done & self.memory_update_done):
                     m.next = "idle"
 
 
 
+        # a trigger while a cycle is running is an overrun, the policy decides if it still starts a cycle once the running one finishes
+        with m.If(~cycle_fsm.ongoing("idle") & self.cycle_trigger):
+            m.d.sync_100 += [
+                self.cycle_overrun.eq(1),
+                self.overrun_count.eq(self.overrun_count + 1),
+            ]
+            with m.If(self.overrun_policy != self.OVERRUN_SKIP):
+                m.d.sync_100 += self.trigger_pending.eq(1)
+
         # connect rtl nodes
 
         device_map = {}
 
         device_map["controller"] = self.rm.export()
 
-        previous_node_outputs = {
-            "read_address" : self.shift_dma.read_bram_address_output,
-            "write_address" : self.shift_dma.write_bram_address_output,
-            "read_node" : self.shift_dma.read_node_address_output,
-            "write_node" : self.shift_dma.write_node_address_output,
-            "data" : self.shift_dma.data_output,
-            "read_complete" : self.shift_dma.read_complete_output,
-            "write_complete" : self.shift_dma.write_complete_output
-        }
-        node_address = 1
+        ring_outputs = []   # outputs of the last node connected to each ring
+        for shift_dma in self.shift_dmas:
+            ring_outputs.append({
+                "read_address" : shift_dma.read_bram_address_output,
+                "write_address" : shift_dma.write_bram_address_output,
+                "read_node" : shift_dma.read_node_address_output,
+                "write_node" : shift_dma.write_node_address_output,
+                "data" : shift_dma.data_output,
+                "read_complete" : shift_dma.read_complete_output,
+                "write_complete" : shift_dma.write_complete_output,
+                "write_node_mask" : shift_dma.write_node_mask_output
+            })
+        ring_node_addresses = [1] * self.DMA_RING_COUNT   # node addresses start at 1 on every ring
+
         for node_name, node_object in self.nodes.items(): # nodes are rtl modules that are linked together by the shift dma, they must have a shift dma node interface
+            ring = self.node_rings[node_name]
+            previous_node_outputs = ring_outputs[ring]
+            node_address = ring_node_addresses[ring]
+
             # add node to submodule list
 
             try:
@@ -825,6 +1251,7 @@ class Controller(wiring.Component):
                     node_object.data_input.eq(previous_node_outputs["data"]),
                     node_object.read_complete_input.eq(previous_node_outputs["read_complete"]),
                     node_object.write_complete_input.eq(previous_node_outputs["write_complete"]),
+                    node_object.write_node_mask_input.eq(previous_node_outputs["write_node_mask"]),
                 ]
                 previous_node_outputs = {
                     "read_address" : node_object.read_bram_address_output,
@@ -833,7 +1260,8 @@ class Controller(wiring.Component):
                     "write_node" : node_object.write_node_address_output,
                     "data" : node_object.data_output,
                     "read_complete" : node_object.read_complete_output,
-                    "write_complete" : node_object.write_complete_output
+                    "write_complete" : node_object.write_complete_output,
+                    "write_node_mask" : node_object.write_node_mask_output
                 }
             except AttributeError:
                 # node does not have dma interface, attempt to connect using a bram interface
@@ -849,6 +1277,7 @@ class Controller(wiring.Component):
                         shift_dma.data_input.eq(previous_node_outputs["data"]),
                         shift_dma.read_complete_input.eq(previous_node_outputs["read_complete"]),
                         shift_dma.write_complete_input.eq(previous_node_outputs["write_complete"]),
+                        shift_dma.write_node_mask_input.eq(previous_node_outputs["write_node_mask"]),
                     ]
                     m.d.comb += [
                         node_object.bram_address.eq(shift_dma.bram_address),
@@ -863,7 +1292,8 @@ class Controller(wiring.Component):
                         "write_node" : shift_dma.write_node_address_output,
                         "data" : shift_dma.data_output,
                         "read_complete" : shift_dma.read_complete_output,
-                        "write_complete" : shift_dma.write_complete_output
+                        "write_complete" : shift_dma.write_complete_output,
+                        "write_node_mask" : shift_dma.write_node_mask_output
                     }
                 except AttributeError:
                     # node does not have dma interface or bram interface, cannot connect
@@ -876,12 +1306,18 @@ class Controller(wiring.Component):
 
             device_map[f"node_{node_address}_{node_name}"] = {
                 "node_address" : node_address,
+                "ring" : ring,
                 "node" : node_object.rm.export()
             }
 
             # TODO: figure out how to handle card/slot IO (muxes?)
 
-            node_address += 1
+            # the first 8 nodes of each ring can signal WAIT_EVENT instructions (event bits 8-15) when their data is ready
+            if node_address <= 8 and hasattr(node_object, "done"):
+                m.d.comb += self.shift_dmas[ring].events[node_address + 7].eq(node_object.done)
+
+            ring_outputs[ring] = previous_node_outputs
+            ring_node_addresses[ring] += 1
 
 
         # temporary hack to hardcode serial card to slot IO
@@ -899,8 +1335,18 @@ class Controller(wiring.Component):
         ]
 
         timers = m.submodules["global_timers"]
+        for shift_dma in self.shift_dmas:
+            m.d.comb += shift_dma.events[0:8].eq(timers.timer_pulse)    # timer pulses are WAIT_EVENT event bits 0-7
+
+        # the global timers run on sync_25, so the trigger is stretched to one full sync_25 cycle
+        timer_trigger_stretch = Signal(range(4))
+        with m.If(self.cycle_trigger):
+            m.d.sync_100 += timer_trigger_stretch.eq(3)
+        with m.Elif(timer_trigger_stretch != 0):
+            m.d.sync_100 += timer_trigger_stretch.eq(timer_trigger_stretch - 1)
+
         m.d.comb += [
-            timers.trigger.eq(self.cycle_timer == 0),
+            timers.trigger.eq(self.cycle_trigger | (timer_trigger_stretch != 0)),
             encoders.trigger.eq(timers.timer_pulse[0]),
             #self.debug_pins[0].eq(encoders.rx[0]),
             #self.debug_pins[1].eq(encoders.bram_read_data[0]),
@@ -948,16 +1394,18 @@ class Controller(wiring.Component):
 
         #m.d.comb += self.debug_pins.eq(m.submodules.fanuc_encoders.debug)
 
-        # connect last node back to dma controller
-        m.d.sync_100 += [
-            self.shift_dma.read_node_address_input.eq(previous_node_outputs["read_node"]),
-            self.shift_dma.write_node_address_input.eq(previous_node_outputs["write_node"]),
-            self.shift_dma.read_bram_address_input.eq(previous_node_outputs["read_address"]),
-            self.shift_dma.write_bram_address_input.eq(previous_node_outputs["write_address"]),
-            self.shift_dma.data_input.eq(previous_node_outputs["data"]),
-            self.shift_dma.read_complete_input.eq(previous_node_outputs["read_complete"]),
-            self.shift_dma.write_complete_input.eq(previous_node_outputs["write_complete"]),
-        ]
+        # connect last node of each ring back to its dma controller
+        for shift_dma, previous_node_outputs in zip(self.shift_dmas, ring_outputs):
+            m.d.sync_100 += [
+                shift_dma.read_node_address_input.eq(previous_node_outputs["read_node"]),
+                shift_dma.write_node_address_input.eq(previous_node_outputs["write_node"]),
+                shift_dma.read_bram_address_input.eq(previous_node_outputs["read_address"]),
+                shift_dma.write_bram_address_input.eq(previous_node_outputs["write_address"]),
+                shift_dma.data_input.eq(previous_node_outputs["data"]),
+                shift_dma.read_complete_input.eq(previous_node_outputs["read_complete"]),
+                shift_dma.write_complete_input.eq(previous_node_outputs["write_complete"]),
+                shift_dma.write_node_mask_input.eq(previous_node_outputs["write_node_mask"]),
+            ]
 
         import json
         with open("controller_config.json", "w") as file:
@@ -971,6 +1419,7 @@ def create_instruction(source_node, destination_node, source_address, destinatio
     return data
 
 sim = 0
+acp = 0 # export for the ACP port, the block design must connect the controller to S_AXI_ACP instead of S_AXI_HP0
 
 nodes = {
     "serial_card" : serial_interface_card(),
@@ -983,87 +1432,21 @@ nodes = {
 dut = Controller(nodes, sim)
 
 async def controller_test(ctx):
+    # the program copies word 0 of node 2 into the first PL to PS word
+    ocm = axi_slave_model(dut.OCM_BASE_ADDR, dut.OCM_SIZE, read_latency=(1, 10), write_latency=(1, 10), backpressure=0.8)
+    ocm.write(dut.OCM_BASE_ADDR + dut.PS_TO_PL_CONTROL_OFFSET, 1 << 24)   # upload the program into bank 0 and run it, full length transfers
+    ocm.write(dut.OCM_BASE_ADDR + dut.PS_TO_PL_CONTROL_OFFSET + dut.CYCLE_PERIOD_OFFSET, 0x44)
+    ocm.write(dut.OCM_BASE_ADDR + dut.PL_TO_PS_CONTROL_OFFSET, np.full(dut.PL_TO_PS_CONTROL_SIZE // 8, 0x4))
+    ocm.write(dut.OCM_BASE_ADDR + dut.PS_TO_PL_DATA_OFFSET, np.full(dut.PS_TO_PL_DATA_SIZE // 8, 0x5))
+    ocm.write(dut.OCM_BASE_ADDR + dut.PL_TO_PS_DATA_OFFSET, np.full(dut.PL_TO_PS_DATA_SIZE // 8, 0x6))
+    instructions = np.full(dut.PS_TO_PL_DMA_INSTRUCTION_SIZE // 8, create_instruction(0, 0, 0, 0, shift_dma_controller.Instruction.NOP))
+    instructions[0] = create_instruction(2, 0, 0, 0, shift_dma_controller.Instruction.COPY)
+    ocm.write(dut.OCM_BASE_ADDR + dut.PS_TO_PL_DMA_INSTRUCTION_OFFSET, instructions)
 
-    ocm = {}
-    for i in range(dut.PS_TO_PL_CONTROL_SIZE // 8):
-        ocm[f"0x{dut.OCM_BASE_ADDR + dut.PS_TO_PL_CONTROL_OFFSET + i*8:08x}"] = 0x10
-    for i in range(dut.PL_TO_PS_CONTROL_SIZE // 8):
-        ocm[f"0x{dut.OCM_BASE_ADDR + dut.PL_TO_PS_CONTROL_OFFSET + i*8:08x}"] = 0x4
-    for i in range(dut.PS_TO_PL_DATA_SIZE // 8):
-        ocm[f"0x{dut.OCM_BASE_ADDR + dut.PS_TO_PL_DATA_OFFSET + i*8:08x}"] = 0x5
-    for i in range(dut.PL_TO_PS_DATA_SIZE // 8):
-        ocm[f"0x{dut.OCM_BASE_ADDR + dut.PL_TO_PS_DATA_OFFSET + i*8:08x}"] = 0x6
-    for i in range(dut.PS_TO_PL_DMA_INSTRUCTION_SIZE // 8):
-        instruction = create_instruction(2, 0, 0, 0, dut.shift_dma.Instruction.COPY)
-        if(i != 0):
-            instruction = create_instruction(0, 0, 0, 0, dut.shift_dma.Instruction.NOP)
-        ocm[f"0x{dut.OCM_BASE_ADDR + dut.PS_TO_PL_DMA_INSTRUCTION_OFFSET + i*8:08x}"] = instruction
-   
-
-    #ocm["0x000F0000"] = 0x10 # cycle timer config
-    
-
-    RVALID_OFF = 0
-    read_burst_count = 0
-    write_base_addr = 0
-    read_base_addr = 0
-
-    await ctx.tick("sync_200").repeat(2)
-    for i in range(1000):
-        await ctx.tick("sync_200").repeat(2)
-
-        ctx.set(dut.RVALID, not RVALID_OFF)
-
-        for x in range(1):
-            # write axi
-            if(ctx.get(dut.AWVALID)):
-                ctx.set(dut.AWREADY, 1)
-                write_base_addr = ctx.get(dut.AWADDR)
-                break
-            ctx.set(dut.AWREADY, 0)
-            if(ctx.get(dut.WVALID)):
-                #await ctx.tick("sync_200").repeat(2)
-                ctx.set(dut.WREADY, 1)
-                if(f"0x{write_base_addr:08x}" not in ocm):
-                    raise Exception(f"Write address 0x{write_base_addr:08x} not in OCM")
-                ocm[f"0x{write_base_addr:08x}"] = ctx.get(dut.WDATA)
-                write_base_addr += 8
-                break
-            ctx.set(dut.WREADY, 0)
-            if(ctx.get(dut.BREADY) & ctx.get(dut.WLAST)):
-                ctx.set(dut.BVALID, 1)
-                break
-            ctx.set(dut.BVALID, 0)
-
-        for x in range(1):
-            # read axi
-            if(ctx.get(dut.ARVALID)):
-                ctx.set(dut.ARREADY, 1)
-                ctx.set(dut.RVALID, 1)
-                read_burst_count = ctx.get(dut.ARLEN)-1
-                read_base_addr = ctx.get(dut.ARADDR)
-                if(f"0x{read_base_addr:08x}" not in ocm):
-                    raise Exception(f"Read address 0x{read_base_addr:08x} not in OCM")
-                ctx.set(dut.RDATA, ocm[f"0x{read_base_addr:08x}"])
-                ctx.set(dut.RLAST, 0)
-                RVALID_OFF = 0
-                break
-            ctx.set(dut.ARREADY, 0)
-            
-            if(ctx.get(dut.RREADY) and ctx.get(dut.RVALID) and read_burst_count != 0):
-                #RVALID_OFF = 1
-                read_burst_count -= 1
-                read_base_addr += 8
-                if(f"0x{read_base_addr:08x}" not in ocm):
-                    raise Exception(f"Read address 0x{read_base_addr:08x} not in OCM")
-                ctx.set(dut.RDATA, ocm[f"0x{read_base_addr:08x}"])
-                break
-            if(read_burst_count == 0):
-                RVALID_OFF = 1
-                ctx.set(dut.RLAST, 1)
-                break
+    await ocm.testbench(dut, domain="sync_100", cycles=1000)(ctx)
 
-    return
+    print(ocm.report(100e6))
+    print(f"first PL to PS word 0x{int(ocm.read(dut.OCM_BASE_ADDR + dut.PL_TO_PS_DATA_OFFSET)[0]):016x}")
 
 
 
@@ -1084,8 +1467,19 @@ if __name__ == "__main__":
             sim.run()
 
     if (not sim):  # export
-        top = Controller(nodes, sim)
+        top = Controller(nodes, sim, acp=acp)
 
         from amaranth.back import verilog
         with open("controller-firmware/Vivado/autogen_sources/controller.v", "w") as f:
             f.write(verilog.convert(top, name="Controller"))
+        with open("controller-software/core/controller/inc/ocm_layout.h", "w") as f:
+            f.write(top.ocm_layout.cpp_header({"OCM_BASE_ADDR": top.OCM_BASE_ADDR, "OCM_SIZE": top.OCM_SIZE, "INSTRUCTION_BANKS": top.INSTRUCTION_BANKS}))
+
+        # one register header per module type, nodes of the same type must share a map or the header would be wrong for one of them
+        map_hashes = {}
+        for node_object in top.nodes.values():
+            rm = node_object.rm
+            if map_hashes.setdefault(rm.name, rm.map["map_hash"]) != rm.map["map_hash"]:
+                raise Exception(f"Nodes of module {rm.name} have different register maps, they can not share a register header")
+            with open(f"controller-software/core/controller/fpga_module_drivers/inc/{rm.name}_registers.h", "w") as f:
+                f.write(rm.cpp_header())
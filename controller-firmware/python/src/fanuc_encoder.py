@@ -4,6 +4,7 @@ from amaranth.lib.wiring import Component, In, Out
 from amaranth.lib.cdc import FFSynchronizer
 
 from registers2 import *
+from register_decoder import Register_Decoder
 
 from sandbox.fanuc_encoder_sim import rs422_sim
 
@@ -26,6 +27,7 @@ class Fanuc_Encoders(Component):
             "rx" : In(self.number_of_encoders),
 
             "trigger": In(1),
+            "done": Out(1),     # encoder data is ready, used as a shift dma event
 
             "bram_address": In(16),
             "bram_write_data": In(32),
@@ -74,20 +76,39 @@ class Fanuc_Encoders(Component):
         m.d.comb += [
             receiver.rx.eq(self.synced_rx[0]),
             receiver.trigger.eq(request_pulse.trigger),
+            self.done.eq(receiver.done),
             self.debug.eq(self.bram_address),
         ]
 
-        with m.Switch(self.bram_address[0:4]):
-            with m.Case(0):
-                m.d.sync_100 += self.bram_read_data.eq(receiver.multiturn_count)
-            with m.Case(1):
-                m.d.sync_100 += self.bram_read_data.eq(receiver.singleturn_count << 16)
-            with m.Case(2):
-                m.d.sync_100 += self.bram_read_data.eq(receiver.commutation_count << 6)
-            with m.Case(3):
-                m.d.sync_100 += self.bram_read_data.eq(receiver.battery_fail | (receiver.unindexed << 1) | (receiver.no_response << 2) | (receiver.crc_fail << 3) | (receiver.done << 4))
-            with m.Default():
-                m.d.sync_100 += self.bram_read_data.eq(0)
+        # memory interface, generated from the register map so every encoder is at the address the map says
+        m.submodules.registers = registers = Register_Decoder(self.rm)
+        m.d.comb += [
+            registers.bram_address.eq(self.bram_address),
+            registers.bram_write_data.eq(self.bram_write_data),
+            registers.bram_write_enable.eq(self.bram_write_enable),
+            self.bram_read_data.eq(registers.bram_read_data),
+        ]
+
+        # only the first encoder has a receiver so far, its values are written every cycle
+        encoder_index = registers.instance_index("encoder_status", encoder=0)
+        m.d.comb += [
+            registers.encoder_multiturn_count_index.eq(encoder_index),
+            registers.encoder_multiturn_count.eq(receiver.multiturn_count),
+            registers.encoder_multiturn_count_write_enable.eq(1),
+            registers.encoder_singleturn_count_index.eq(encoder_index),
+            registers.encoder_singleturn_count.eq(receiver.singleturn_count << 16),
+            registers.encoder_singleturn_count_write_enable.eq(1),
+            registers.encoder_commutation_count_index.eq(encoder_index),
+            registers.encoder_commutation_count.eq(receiver.commutation_count << 6),
+            registers.encoder_commutation_count_write_enable.eq(1),
+            registers.encoder_status_index.eq(encoder_index),
+            registers.encoder_status_battery_fail.eq(receiver.battery_fail),
+            registers.encoder_status_unindexed.eq(receiver.unindexed),
+            registers.encoder_status_no_response.eq(receiver.no_response),
+            registers.encoder_status_crc_fail.eq(receiver.crc_fail),
+            registers.encoder_status_done.eq(receiver.done),
+            registers.encoder_status_write_enable.eq(1),
+        ]
 
 
         # with m.Switch(self.bram_address[4:8]):  # up to 32 encoders, with up to 16 data addresses each
@@ -333,6 +354,12 @@ async def bench(ctx):
             ctx.set(dut.rx[0], test_encoder.get_tx_level())
             test_encoder.tick()
             await ctx.tick("sync_100")
+
+    # read the first encoder back over the bram port, like the shift dma does
+    for name in ["multiturn_count", "singleturn_count", "commutation_count", "status"]:
+        ctx.set(dut.bram_address, dut.rm.encoder.offset + getattr(dut.rm.encoder, name).address_offset)
+        await ctx.tick("sync_100")
+        print(f"encoder 0 {name}: 0x{ctx.get(dut.bram_read_data):08x}")
     
 
 
@@ -6,6 +6,7 @@ from amaranth.lib import wiring
 from amaranth.lib.wiring import In, Out
 from shift_dma import shift_dma_node
 from registers2 import *
+from register_decoder import Register_Decoder
 from i2c import i2c
 
 
@@ -43,10 +44,10 @@ class serial_interface_card(wiring.Component):
             "quadrature_B": Out(7),
             "quadrature_Z": Out(6),
             
-            "bram_address": Out(16),
-            "bram_write_data": Out(32),
-            "bram_read_data": In(32),
-            "bram_write_enable": Out(1)
+            "bram_address": In(16),
+            "bram_write_data": In(32),
+            "bram_read_data": Out(32),
+            "bram_write_enable": In(1)
         })
 
         """
@@ -180,34 +181,32 @@ class serial_interface_card(wiring.Component):
         m.d.comb += self.slotOutEnable[pins.PIN_11N].eq(self.i2c.sda_out_enable)
 
 
-        # memory interface
-        with m.Switch(self.bram_address):   # TODO: make this switch able to be generated from the address map automatically
-            with m.Case(self.rm.port_mode_enable.address_offset):
-                m.d.sync_100 += self.bram_read_data.eq(0)
-                with m.If(self.bram_write_enable):
-                    m.d.sync_100 += self.rs485_mode_enable.eq(self.bram_write_data[:10])
-                    m.d.sync_100 += self.rs422_mode_enable.eq(self.bram_write_data[10:20])
-                    m.d.sync_100 += self.quadrature_mode_enable.eq(self.bram_write_data[20:27])
-            with m.Case(self.rm.i2c_config.address_offset):
-                m.d.sync_100 += self.bram_read_data.eq(0)
-                with m.If(self.bram_write_enable):
-                    m.d.sync_100 += self.i2c.read.eq(self.bram_write_data[0])
-                    m.d.sync_100 += self.i2c.device_address.eq(self.bram_write_data[1:8])
-                    m.d.sync_100 += self.i2c.register_address.eq(self.bram_write_data[8:16])
-                    m.d.sync_100 += self.i2c.byte_count.eq(self.bram_write_data[16:19])
-                    m.d.sync_100 += self.i2c.start.eq(self.bram_write_data[19])
-
-            with m.Case(self.rm.i2c_data_tx.address_offset):
-                m.d.sync_100 += self.bram_read_data.eq(0)
-                with m.If(self.bram_write_enable):
-                    m.d.sync_100 += self.i2c.data_in.eq(self.bram_write_data)
-
-            with m.Case(self.rm.i2c_data_rx.address_offset):
-                m.d.sync_100 += self.bram_read_data.eq(self.i2c.data_out)
-
-            with m.Case(self.rm.i2c_status.address_offset):
-                m.d.sync_100 += self.bram_read_data.eq(Cat(self.i2c.busy, self.i2c.error))
-
+        # memory interface, generated from the register map
+        m.submodules.registers = registers = Register_Decoder(self.rm)
+        m.d.comb += [
+            registers.bram_address.eq(self.bram_address),
+            registers.bram_write_data.eq(self.bram_write_data),
+            registers.bram_write_enable.eq(self.bram_write_enable),
+            self.bram_read_data.eq(registers.bram_read_data),
+
+            self.rs485_mode_enable.eq(registers.port_mode_enable_rs485_mode_enable),
+            self.rs422_mode_enable.eq(registers.port_mode_enable_rs422_mode_enable),
+            self.quadrature_mode_enable.eq(registers.port_mode_enable_quadrature_mode_enable),
+
+            self.i2c.read.eq(registers.i2c_config_read),
+            self.i2c.device_address.eq(registers.i2c_config_device_address),
+            self.i2c.register_address.eq(registers.i2c_config_register_address),
+            self.i2c.byte_count.eq(registers.i2c_config_byte_count),
+            self.i2c.data_in.eq(registers.i2c_data_tx),
+
+            registers.i2c_data_rx.eq(self.i2c.data_out),
+            registers.i2c_status_busy.eq(self.i2c.busy),
+            registers.i2c_status_error.eq(self.i2c.error),
+        ]
+
+        # start is held until the slower i2c domain sees it and reports busy
+        with m.If(registers.i2c_config_written):
+            m.d.sync_100 += self.i2c.start.eq(registers.i2c_config_start)
         with m.If(self.i2c.busy):   # reset start once a transaction is started
             m.d.sync_100 += self.i2c.start.eq(0)
 
@@ -0,0 +1,99 @@
+"""
+Layout of the OCM regions shared by the PS and the controller
+
+The controller places its regions with this and exports the result twice, as driver settings in controller_config.json
+and as a C++ header, so the firmware and the software are always built from the same layout.
+"""
+
+
+class ocm_layout:
+
+    def __init__(self, size:int, alignment:int=0x80):
+        """
+        size: bytes of OCM the regions may use
+
+        alignment: default alignment of every region in bytes, 0x80 is one 16 beat AXI burst so bursts that start
+        at the start of a region never cross a 4KB boundary
+        """
+
+        if alignment & (alignment - 1) != 0:
+            raise ValueError("OCM region alignment must be a power of 2")
+
+        self.size = size
+        self.alignment = alignment
+        self.regions = {}   # name: (offset, size) in bytes, in the order they were added
+
+    def add(self, name:str, size:int, alignment:int=None) -> int:
+        """
+        Place a region after the last one and return its offset
+
+        name: upper case name of the region, exported as <name>_OFFSET and <name>_SIZE
+        """
+
+        if name in self.regions:
+            raise Exception(f"OCM region {name} is already placed")
+        if size <= 0 or size % 8 != 0:
+            raise Exception(f"OCM region {name} must be a whole number of 64 bit words")
+
+        if alignment is None:
+            alignment = self.alignment
+        offset = (self.used() + alignment - 1) & ~(alignment - 1)
+        if offset + size > self.size:
+            raise Exception(f"OCM region {name} (0x{size:x} bytes) does not fit, 0x{self.used():x} of 0x{self.size:x} bytes are already used")
+
+        self.regions[name] = (offset, size)
+        return offset
+
+    def offset(self, name:str) -> int:
+        return self.regions[name][0]
+
+    def region_size(self, name:str) -> int:
+        return self.regions[name][1]
+
+    def used(self) -> int:
+        """
+        Bytes from the start of the OCM to the end of the last region
+        """
+
+        return max((offset + size for offset, size in self.regions.values()), default=0)
+
+    def driver_settings(self) -> dict:
+        settings = {}
+        for name, (offset, size) in self.regions.items():
+            settings[f"{name}_OFFSET"] = offset
+            settings[f"{name}_SIZE"] = size
+        return settings
+
+    def cpp_header(self, constants:dict=None) -> str:
+        """
+        C++ header with the layout as constexpr values in namespace ocm_layout
+
+        constants: extra name: value pairs to put in the header (like the OCM base address)
+        """
+
+        lines = [
+            "// generated by controller-firmware/python/src/ocm_layout.py, do not edit",
+            "// must match the driver settings of the controller_config.json of the loaded bitstream",
+            "",
+            "#pragma once",
+            "",
+            "#include <stdint.h>",
+            "",
+            "namespace ocm_layout {",
+            "",
+        ]
+        for name, value in (constants or {}).items():
+            lines.append(f"constexpr uint32_t {name} = 0x{value:x};")
+        if constants:
+            lines.append("")
+        for name, value in self.driver_settings().items():
+            lines.append(f"constexpr uint32_t {name} = 0x{value:x};")
+        lines += [
+            "",
+            "}",
+            "",
+        ]
+        return "\n".join(lines)
+
+    def __str__(self):
+        return "\n".join(f"{name}: 0x{offset:04x} - 0x{offset + size:04x} (0x{size:x} bytes)" for name, (offset, size) in self.regions.items())
@@ -0,0 +1,329 @@
+from amaranth import *
+from amaranth.lib.memory import Memory
+from amaranth.lib.wiring import Component, In, Out
+from amaranth.sim import Simulator
+from amaranth.utils import exact_log2
+
+from registers2 import *
+
+"""
+Address decoder and register file generated from a register map
+
+Sits on the bram port of a node (same ports and the same one cycle read latency as a block ram) and gives the logic of
+the block a plain signal for every register in the map, so the decode always matches the exported map.
+
+Registers with a single instance are flip-flops:
+    rw="w" (written over the bus): Out <name> holds the value, Out <name>_written pulses for one cycle after a write
+    rw="r" (read over the bus): In <name>
+
+Banks and registers inside groups are one block ram each, one port for the bus and one for the logic:
+    rw="w": In <name>_index, Out <name> is the value at that index one cycle later, Out <name>_written and <name>_written_index
+    rw="r": In <name>_index, In <name>, In <name>_write_enable
+
+Registers with sub-registers have a port per sub-register (<name>_<sub_register>) instead of <name>.
+Registers inside groups are prefixed by the group names, like encoder_status_done for the done bit of the status register in group encoder.
+
+The index of an instance is Cat(bank index, innermost group index, ..., outermost group index), each part only as wide as its count needs,
+instance_index() calculates it.
+"""
+
+
+class _Decoded_Register:
+    """
+    INTERNAL\n
+    A register of the map and where it is, flattened out of its groups.
+    """
+
+    def __init__(self, name: str, map: dict, groups: list):
+        """
+        name: port name, the register name prefixed by the names of its groups
+        map: generated map of the register
+        groups: (name, address_offset, alignment, count) of each group around the register, outermost first
+        """
+
+        self.name = name
+        self.map = map
+        self.groups = groups
+        self.rw = map["rw"]
+        self.bank_size = map["bank_size"]
+
+        # (port name, starting bit, width) of each value the logic sees
+        if map["sub_registers"]:
+            self.fields = [(f"{name}_{sub_name}", sub_map["starting_bit"], sub_map["width"]) for sub_name, sub_map in map["sub_registers"].items()]
+        else:
+            self.fields = [(name, 0, map["width"])]
+        self.width = max(start + width for _, start, width in self.fields)
+
+        # the bank index is the lowest part of the instance index, then the group indices from the innermost group out
+        self.index_widths = [(self.bank_size - 1).bit_length()] + [(count - 1).bit_length() for _, _, _, count in reversed(groups)]
+        self.index_width = sum(self.index_widths)
+
+        # the ports of a register only depend on where it is declared, a group of one is still a block ram
+        self.in_memory = self.bank_size > 1 or len(groups) > 0
+        if not self.in_memory:
+            self.address = sum(offset for _, offset, _, _ in groups) + map["address_offset"]
+
+    def ports(self) -> dict:
+        if self.rw == "w":
+            ports = {port: Out(width) for port, _, width in self.fields}
+            ports[f"{self.name}_written"] = Out(1)
+            if self.in_memory:
+                ports[f"{self.name}_index"] = In(self.index_width)
+                ports[f"{self.name}_written_index"] = Out(self.index_width)
+        else:
+            ports = {port: In(width) for port, _, width in self.fields}
+            if self.in_memory:
+                ports[f"{self.name}_index"] = In(self.index_width)
+                ports[f"{self.name}_write_enable"] = In(1)
+        return ports
+
+    def decode(self, address):
+        """
+        Returns the match and the instance index of a bus address
+        """
+
+        match = Const(1)
+        group_indices = []
+        relative = address
+        for _, offset, alignment, count in self.groups:
+            # groups always start on a multiple of their own alignment, so the instance is just the upper address bits
+            shift = exact_log2(alignment)
+            first = offset >> shift
+            instance = relative[shift:]
+            match &= (instance >= first) & (instance < first + count)
+            if first != 0:
+                instance = instance - first
+            group_indices.append(instance[:(count - 1).bit_length()])
+            relative = relative[:shift]
+
+        register_offset = self.map["address_offset"]
+        match &= (relative >= register_offset) & (relative < register_offset + self.bank_size)
+        bank_index = relative if register_offset == 0 else (relative - register_offset)
+
+        return match, Cat(bank_index[:self.index_widths[0]], *reversed(group_indices))
+
+
+class Register_Decoder(Component):
+    # read and write a generated register map over a node bram port
+
+    def __init__(self, rm: RegisterMapGenerator, domain: str="sync_100"):
+        """
+        rm: generated register map of the block
+
+        domain: clock domain of the bram port
+        """
+
+        if not rm.generated:
+            raise ValueError("Register map must be generated before building its decoder")
+
+        self.rm = rm
+        self.domain = domain
+
+        self.registers = {}
+        self.__collect(rm.map["base_group"], [], [])
+
+        signature = {
+            "bram_address": In(16),
+            "bram_write_data": In(32),
+            "bram_read_data": Out(32),
+            "bram_write_enable": In(1),
+        }
+        for register in self.registers.values():
+            for port, member in register.ports().items():
+                if port in signature:
+                    raise ValueError(f"Register decoder port '{port}' of module '{rm.name}' is used twice, rename a register or group")
+                signature[port] = member
+
+        super().__init__(signature)
+
+    def __collect(self, group: dict, groups: list, prefix: list):
+        for name, register in group["registers"].items():
+            self.registers["_".join(prefix + [name])] = _Decoded_Register("_".join(prefix + [name]), register, groups)
+        for name, sub_group in group["groups"].items():
+            self.__collect(sub_group, groups + [(name, sub_group["address_offset"], sub_group["alignment"], sub_group["count"])], prefix + [name])
+
+    def instance_index(self, name: str, bank: int=0, **group_indices) -> int:
+        """
+        Index of one instance of a banked or grouped register, for its _index port
+
+        name: port name of the register, like encoder_status
+        bank: index in the bank
+        group_indices: index of each group the register is in by group name, missing groups are 0
+        """
+
+        register = self.registers[name]
+        index = bank
+        shift = register.index_widths[0]
+        for (group, _, _, _), width in zip(reversed(register.groups), register.index_widths[1:]):
+            index |= group_indices.get(group, 0) << shift
+            shift += width
+        return index
+
+    def elaborate(self, platform):
+        m = Module()
+
+        sync = m.d[self.domain]
+
+        # reads are split over the one cycle a read may take, the flip-flops are muxed by address into a register
+        # and every block ram reads at its decoded index, then the output only picks between a few registered sources
+        flip_flop_read_data = Signal(32)
+        read_data = flip_flop_read_data
+
+        flip_flops = [register for register in self.registers.values() if not register.in_memory]
+        for register in flip_flops:
+            if register.rw == "w":
+                sync += getattr(self, f"{register.name}_written").eq(0)
+        sync += flip_flop_read_data.eq(0)
+
+        with m.Switch(self.bram_address):
+            for register in flip_flops:
+                with m.Case(register.address):
+                    if register.rw == "w":
+                        with m.If(self.bram_write_enable):
+                            for port, start, width in register.fields:
+                                sync += getattr(self, port).eq(self.bram_write_data[start:start+width])
+                            sync += getattr(self, f"{register.name}_written").eq(1)
+                    else:
+                        for port, start, width in register.fields:
+                            sync += flip_flop_read_data[start:start+width].eq(getattr(self, port))
+
+        for register in self.registers.values():
+            if not register.in_memory:
+                continue
+
+            m.submodules[f"{register.name}_memory"] = memory = Memory(shape=unsigned(register.width), depth=1 << register.index_width, init=[])
+            match, index = register.decode(self.bram_address)
+
+            if register.rw == "w":
+                bus_port = memory.write_port(domain=self.domain)
+                logic_port = memory.read_port(domain=self.domain)
+
+                m.d.comb += [
+                    bus_port.addr.eq(index),
+                    bus_port.data.eq(self.bram_write_data[:register.width]),
+                    bus_port.en.eq(match & self.bram_write_enable),
+                    logic_port.addr.eq(getattr(self, f"{register.name}_index")),
+                ]
+                sync += [
+                    getattr(self, f"{register.name}_written").eq(match & self.bram_write_enable),
+                    getattr(self, f"{register.name}_written_index").eq(index),
+                ]
+                for port, start, width in register.fields:
+                    m.d.comb += getattr(self, port).eq(logic_port.data[start:start+width])
+
+            else:
+                logic_port = memory.write_port(domain=self.domain)
+                bus_port = memory.read_port(domain=self.domain)
+
+                m.d.comb += [
+                    logic_port.addr.eq(getattr(self, f"{register.name}_index")),
+                    logic_port.en.eq(getattr(self, f"{register.name}_write_enable")),
+                    bus_port.addr.eq(index),
+                ]
+                for port, start, width in register.fields:
+                    m.d.comb += logic_port.data[start:start+width].eq(getattr(self, port))
+
+                selected = Signal(name=f"{register.name}_selected")
+                sync += selected.eq(match)
+                read_data = read_data | Mux(selected, bus_port.data, 0)
+
+        m.d.comb += self.bram_read_data.eq(read_data)
+
+        return m
+
+
+
+if __name__ == "__main__":
+
+    rm = RegisterMapGenerator("decoder_test", ["decoder_test"])
+    rm.add(Register("control", rw="w", desc="Control bits", sub_registers=[
+        Register("enable", type="bool"),
+        Register("mode", width=3, start_address=4),
+    ]))
+    rm.add(Register("status", rw="r", desc="Status"))
+    rm.add(Register("setpoint", rw="w", width=16, bank_size=4, desc="Banked write register"))
+    channel = Group("channel", 3, desc="Group of registers for each channel")
+    channel.add(Register("position", rw="r", desc="Position"))
+    channel.add(Register("flags", rw="r", sub_registers=[
+        Register("ready", type="bool"),
+        Register("fault", type="bool"),
+    ]))
+    rm.add(channel)
+    rm.generate(use_cache=False)
+
+    dut = Register_Decoder(rm)
+
+    async def bus_write(ctx, address, data):
+        ctx.set(dut.bram_address, address)
+        ctx.set(dut.bram_write_data, data)
+        ctx.set(dut.bram_write_enable, 1)
+        await ctx.tick("sync_100")
+        ctx.set(dut.bram_write_enable, 0)
+
+    async def bus_read(ctx, address):
+        ctx.set(dut.bram_address, address)
+        await ctx.tick("sync_100")
+        return ctx.get(dut.bram_read_data)     # one cycle after the address, like a block ram
+
+    async def bench(ctx):
+        errors = 0
+
+        # flip-flop register with fields
+        await bus_write(ctx, rm.control.address_offset, (5 << 4) | 1)
+        if ctx.get(dut.control_enable) != 1 or ctx.get(dut.control_mode) != 5 or ctx.get(dut.control_written) != 1:
+            print("control write failed")
+            errors += 1
+        await ctx.tick("sync_100")
+        if ctx.get(dut.control_written) != 0:
+            print("control written did not clear")
+            errors += 1
+
+        # flip-flop read
+        ctx.set(dut.status, 0x12345678)
+        if await bus_read(ctx, rm.status.address_offset) != 0x12345678:
+            print("status read failed")
+            errors += 1
+
+        # bank in block ram
+        for i in range(4):
+            await bus_write(ctx, rm.setpoint.address_offset + i, 100 + i)
+        for i in range(4):
+            ctx.set(dut.setpoint_index, dut.instance_index("setpoint", bank=i))
+            await ctx.tick("sync_100")
+            if ctx.get(dut.setpoint) != 100 + i:
+                print(f"setpoint {i} read {ctx.get(dut.setpoint)}")
+                errors += 1
+
+        # group in block ram, written by the logic and read over the bus
+        for i in range(3):
+            ctx.set(dut.channel_position_index, dut.instance_index("channel_position", channel=i))
+            ctx.set(dut.channel_position, 1000 * (i + 1))
+            ctx.set(dut.channel_position_write_enable, 1)
+            ctx.set(dut.channel_flags_index, dut.instance_index("channel_flags", channel=i))
+            ctx.set(dut.channel_flags_ready, 1)
+            ctx.set(dut.channel_flags_fault, i & 1)
+            ctx.set(dut.channel_flags_write_enable, 1)
+            await ctx.tick("sync_100")
+        ctx.set(dut.channel_position_write_enable, 0)
+        ctx.set(dut.channel_flags_write_enable, 0)
+
+        for i in range(3):
+            base = rm.channel.offset + i * rm.channel.alignment
+            position = await bus_read(ctx, base + rm.channel.position.address_offset)
+            flags = await bus_read(ctx, base + rm.channel.flags.address_offset)
+            if position != 1000 * (i + 1) or flags != (1 << rm.channel.flags.ready.starting_bit) | ((i & 1) << rm.channel.flags.fault.starting_bit):
+                print(f"channel {i} read position {position} flags {flags}")
+                errors += 1
+
+        # unmapped and write only addresses read as 0
+        if await bus_read(ctx, 0xFFFF) != 0 or await bus_read(ctx, rm.control.address_offset) != 0:
+            print("unmapped read not 0")
+            errors += 1
+
+        print(f"register decoder test done, {errors} errors")
+
+    sim = Simulator(dut)
+    sim.add_clock(1/100e6, domain="sync_100")
+    sim.add_testbench(bench)
+    with sim.write_vcd("register_decoder_test.vcd"):
+        sim.run()
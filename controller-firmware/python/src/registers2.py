@@ -1,6 +1,13 @@
 from enum import IntEnum, auto
 from typing import Union
-import traceback
+import bisect
+import functools
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import sys
 
 """
 Things to support:
@@ -103,15 +110,140 @@ class bcolors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+
+class _ColorFormatter(logging.Formatter):
+    """
+    INTERNAL\n
+    Color each line by its level, the way the generator has always printed.
+    """
+
+    COLORS = {
+        logging.DEBUG: bcolors.OKCYAN,
+        logging.INFO: bcolors.OKGREEN,
+        logging.WARNING: bcolors.WARNING,
+        logging.ERROR: bcolors.FAIL,
+        logging.CRITICAL: bcolors.FAIL,
+    }
+
+    def format(self, record):
+        return f"{self.COLORS.get(record.levelno, '')}{super().format(record)}{bcolors.ENDC}"
+
+
+# placement details are DEBUG, per module progress and the summary are INFO, only warnings and errors are shown by default
+# use set_log_level() (or the standard logging API on the 'registers2' logger) to see more
+logger = logging.getLogger("registers2")
+logger.setLevel(logging.WARNING)
+logger.propagate = False
+
+# records are only formatted if they pass the level, and written to the terminal in batches
+# a warning flushes the buffer right away so it shows up next to what caused it
+_stream_handler = logging.StreamHandler(sys.stdout)
+_stream_handler.setFormatter(_ColorFormatter("Register gen: %(message)s"))
+_log_buffer = logging.handlers.MemoryHandler(1024, flushLevel=logging.WARNING, target=_stream_handler)
+logger.addHandler(_log_buffer)
+
+
+class _WarningCollector(logging.Handler):
+    """
+    INTERNAL\n
+    Keep the warnings of a generation, they are stored with the cached map and shown again every time it is loaded.
+    """
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.warnings = []
+
+    def emit(self, record):
+        self.warnings.append([record.levelno, record.getMessage()])
+
+
+def set_log_level(level):
+    """
+    Set which register generator messages are shown.
+    Args:
+        level (int or str): A logging level, like logging.INFO or "DEBUG".
+    """
+
+    logger.setLevel(level)
+
+
+def _caller() -> str:
+    """
+    INTERNAL\n
+    File and line of the code that accessed an attribute, two frames up from the __getattr__ that calls this.
+    """
+
+    frame = sys._getframe(2)
+    return f"{frame.f_code.co_filename}:{frame.f_lineno}"
+
+class _IntervalSet:
+    """
+    INTERNAL\n
+    A set of integers (addresses) stored as sorted, disjoint [start, end) intervals, touching intervals are merged.
+    Checking a range is a binary search, so placing many items does not get slower as the group fills up.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.count = 0  # number of integers in the set
+
+    def available(self, start, length):
+        """
+        INTERNAL\n
+        Check if none of the integers from start to start + length - 1 are in the set.
+        """
+
+        # only the first interval that ends after start can overlap, the ones after it start even later
+        i = bisect.bisect_right(self.ends, start)
+        return i == len(self.starts) or self.starts[i] >= start + length
+
+    def add(self, start, length):
+        """
+        INTERNAL\n
+        Add the integers from start to start + length - 1 to the set.
+        """
+
+        end = start + length
+        i = bisect.bisect_left(self.ends, start)    # first interval that ends at or after start
+        j = bisect.bisect_right(self.starts, end)   # first interval that starts after end
+        if i < j:   # merge overlapping and touching intervals
+            self.count -= sum(self.ends[k] - self.starts[k] for k in range(i, j))
+            start = min(start, self.starts[i])
+            end = max(end, self.ends[j-1])
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+        self.count += end - start
+
+    def first_fit(self, length, alignment, last_start):
+        """
+        INTERNAL\n
+        Find the lowest multiple of alignment, up to last_start, where length integers are available.
+        Returns:
+            int: The start of the range, or None if there is no space.
+        """
+
+        start = 0
+        while start <= last_start:
+            i = bisect.bisect_right(self.ends, start)
+            if i == len(self.starts) or self.starts[i] >= start + length:
+                return start
+            start = -(-self.ends[i] // alignment) * alignment   # skip past the interval in the way
+        return None
+
+    def max(self):
+        return self.ends[-1] - 1
+
+
 class Register:
-    def __init__(self, name: str, rw: str="", type: str="unsigned", width: int=32, start_address: int=None, desc:str="", bank_size:int=1, sub_registers:list=[]):
+    def __init__(self, name: str, rw: str="", type: str="unsigned", width: int=None, start_address: int=None, desc:str="", bank_size:int=1, sub_registers:list=[]):
         """
         Initialize a Register object.
         Args:
             name (str): The name of the register.
             rw (str): Read/Write access type, either 'r' for read or 'w' for write.
             type (str, optional): The data type of the register. Must be one of "unsigned", "signed", or "bool". Defaults to "unsigned".
-            width (int, optional): The bit width of the register. Must be between 1 and 32. Defaults to 32.
+            width (int, optional): The bit width of the register. Must be between 1 and 32. Defaults to 1 for bool and 32 for the other types.
             start_address (int, optional): The starting address of the register. Must be between 0 and 0xFFFF.
             desc (str, optional): A description of the register.
             bank_size (int, optional): The size of the register bank. Must be between 1 and 65536. Defaults to 1.
@@ -123,6 +255,8 @@ class Register:
         if type not in ["unsigned", "signed", "bool"]:
             raise ValueError("Invalid type")
         
+        if width is None:
+            width = 1 if type == "bool" else 32
         if width not in range(1, 33):
             raise ValueError("Invalid width")
         
@@ -155,10 +289,10 @@ class Register:
             self.sub_registers[sub_register.name] = sub_register
 
 
-        self.used_bits = []
+        self.used_bits = 0  # bitmask
         self.unassigned_regs = []
 
-        self.used_addresses = []
+        self.used_addresses = range(0)
 
         self.is_sub_register = False
 
@@ -185,7 +319,7 @@ class Register:
         self.map["sub_registers"][sub_register.name] = sub_register.map
         self.__use_bits(starting_bit, sub_register.width)
 
-        print(f"{bcolors.OKGREEN}Register gen: Register '{sub_register.name}' has been placed at bits {starting_bit}:{starting_bit+sub_register.width-1} in Register '{self.name}'{bcolors.ENDC}")
+        logger.debug("Register '%s' has been placed at bits %d:%d in Register '%s'", sub_register.name, starting_bit, starting_bit+sub_register.width-1, self.name)
 
     def generate(self):
         """
@@ -194,11 +328,11 @@ class Register:
         """
 
         if self.type == "bool" and self.width != 1:
-            print(f"{bcolors.WARNING}Register gen: Register '{self.name}' is a bool type, width will be set to 1{bcolors.ENDC}")
+            logger.warning("Register '%s' is a bool type, width will be set to 1", self.name)
             self.width = 1
 
         self.generated = False
-        self.used_bits = []
+        self.used_bits = 0
         self.unassigned_regs = []
 
         # these values are not dependent on the sub-registers, so they can be set here
@@ -231,7 +365,7 @@ class Register:
         for sub_register in self.sub_registers.values():
 
             if sub_register.type == "bool" and sub_register.width != 1:
-                print(f"{bcolors.WARNING}Register gen: Register '{sub_register.name}' is a bool type, width will be set to 1{bcolors.ENDC}")
+                logger.warning("Register '%s' is a bool type, width will be set to 1", sub_register.name)
                 sub_register.width = 1
 
             sub_register.is_sub_register = True
@@ -262,8 +396,8 @@ class Register:
             
 
         # make sure parent width is large enough to hold all sub-registers
-        if self.width < max(self.used_bits) + 1:
-            print(f"{bcolors.WARNING}Register gen: Parent register '{self.name}' width {self.width} is too small to hold all sub-registers, width will be increased to {max(self.used_bits) + 1}{bcolors.ENDC}")
+        if self.width < self.used_bits.bit_length():
+            logger.warning("Parent register '%s' width %d is too small to hold all sub-registers, width will be increased to %d", self.name, self.width, self.used_bits.bit_length())
 
         self.generated = True
 
@@ -275,16 +409,11 @@ class Register:
         Args:
             starting_bit (int): The starting bit of the range.
             width (int): The width of the range.
-            used_bits (list): A list of used bits.
         Returns:
             bool: True if the range is available, False otherwise.
         """
 
-        for i in range(starting_bit, starting_bit + width):
-            if i in self.used_bits:
-                return False
-        
-        return True
+        return (self.used_bits >> starting_bit) & ((1 << width) - 1) == 0
     
     def __use_bits(self, starting_bit, width):
         """
@@ -292,11 +421,50 @@ class Register:
         Mark a range of bits as used.
         Args:
             starting_bit (int): The starting bit of the range.
-            width (int): The width of the range. 
-             used_bits (list): A list of used bits.
+            width (int): The width of the range.
+        """
+
+        self.used_bits |= ((1 << width) - 1) << starting_bit
+
+    def definition(self) -> dict:
+        """
+        INTERNAL\n
+        Everything the generated map of the register depends on, used as the cache key.
         """
 
-        self.used_bits.extend(range(starting_bit, starting_bit + width))
+        return {
+            "register": self.name,
+            "rw": self.rw,
+            "type": self.type,
+            "width": self.width,
+            "start_address": self.start_address,
+            "desc": self.desc,
+            "bank_size": self.bank_size,
+            "sub_registers": [sub_register.definition() for sub_register in self.sub_registers.values()],
+        }
+
+    def load_map(self, map: dict, rw: str=None):
+        """
+        INTERNAL\n
+        Take a previously generated map instead of generating one, leaving the register in the same state as generate() would.
+        Args:
+            map (dict): The generated map of this register.
+            rw (str, optional): rw of the parent register, for sub-registers.
+        """
+
+        self.map = map
+        self.width = map["width"]
+        if rw is not None:
+            self.rw = rw
+            self.is_sub_register = True
+
+        self.used_bits = 0
+        for name, sub_register in self.sub_registers.items():
+            sub_register.load_map(map["sub_registers"][name], self.rw)
+            self.used_bits |= ((1 << sub_register.width) - 1) << sub_register.map["starting_bit"]
+
+        self.used_addresses = range(map["address_offset"], map["address_offset"] + self.bank_size)
+        self.generated = True
 
     def post_assign_address_offset(self, address_offset):
         """
@@ -324,12 +492,12 @@ class Register:
             if not self.is_sub_register:
                 return self.map["address_offset"]
             else:
-                print(f"{bcolors.WARNING}Register gen: Register '{self.name}' is a sub-register, its address_offset will always be zero, use starting_bit if you want the bit offset\nTraceback:{traceback.walk_stack()[-2]}{bcolors.ENDC}")
+                logger.warning("Register '%s' is a sub-register, its address_offset will always be zero, use starting_bit if you want the bit offset (%s)", self.name, _caller())
                 return 0
         
         if name == "starting_bit":
             if not self.is_sub_register:
-                print(f"{bcolors.WARNING}Register gen: Register '{self.name}' is not a sub-register, its starting_bit will always be zero\nTraceback: {traceback.format_stack()[-2]}{bcolors.ENDC}")
+                logger.warning("Register '%s' is not a sub-register, its starting_bit will always be zero (%s)", self.name, _caller())
                 return 0
             else:
                 return self.map["starting_bit"]
@@ -343,7 +511,7 @@ class Register:
         if name in self.sub_registers:
             return self.sub_registers[name]
             
-        raise AttributeError(f"Register gen: '{self.name}' map has no item '{name}', did you reference it from the correct containing object?\nTraceback: {traceback.format_stack()[-2]}")
+        raise AttributeError(f"Register gen: '{self.name}' map has no item '{name}', did you reference it from the correct containing object?")
 
     def __repr__(self) -> str:
         return f"Register(Name: {self.name}, rw: {self.rw}, type: {self.type}, width: {self.width}, address_offset: {self.start_address}, desc: {self.desc}, bank_size: {self.bank_size}, sub_registers: {self.sub_registers})"
@@ -388,7 +556,8 @@ class Group:
         self.map = {}
 
         self.unassigned_items = []
-        self.used_addresses = []
+        self.used_addresses = range(0)   # addresses the whole group takes up once generated
+        self.allocated = _IntervalSet() # addresses used by the items in one instance of the group
 
         self.generated = False
 
@@ -448,6 +617,9 @@ class Group:
         self.map["groups"] = {}
         self.map["registers"] = {}
 
+        self.unassigned_items = []
+        self.allocated = _IntervalSet()
+
         # place items
         for name, item in self.contents.items():
 
@@ -462,7 +634,7 @@ class Group:
             
             if isinstance(item, Register):
                 self.map["registers"][name] = item.map
-                print(f"{bcolors.OKGREEN}Register gen: Register '{item.name}' has been placed at offset 0x{item.map['address_offset']:X} in group '{self.name}'{bcolors.ENDC}")
+                logger.debug("Register '%s' has been placed at offset 0x%X in group '%s'", item.name, item.map['address_offset'], self.name)
             else:
                 if item.start_address % self.alignment != 0:
                     raise ValueError(f"Invalid group address '{item}', start_address must be aligned to the group's alignment ({item.alignment})")
@@ -473,49 +645,44 @@ class Group:
             self.__use_addresses(item.used_addresses)
 
 
-        # auto-assign base addresses for items
-        success = False
+        # auto-assign base addresses for items, at the lowest free address that is a multiple of the item alignment
         for item in self.unassigned_items:
             if isinstance(item, Register):
                 alignment = 1
             else:
                 alignment = item.alignment
 
-            for starting_address in range(0, 0xFFFF - len(item.used_addresses) + 1, alignment):
-                if self.__addresses_available(item.used_addresses, starting_address):
-                    item.post_assign_address_offset(starting_address)
-                    if isinstance(item, Register):
-                        self.map["registers"][item.name] = item.map
-                        print(f"{bcolors.OKGREEN}Register gen: Register '{item.name}' has been placed at offset 0x{item.map['address_offset']:X} in group '{self.name}'{bcolors.ENDC}")
-                    else:
-                        self.map["groups"][item.name] = item.map
-
-                    self.__use_addresses(item.used_addresses)
-                    
-                    success = True
-                    break
-
-            if not success:
+            starting_address = self.allocated.first_fit(len(item.used_addresses), alignment, 0xFFFF - len(item.used_addresses))
+            if starting_address is None:
                 raise ValueError(f"Unable to auto-assign base address for item: {item}")
-            
 
-        if self.alignment is not None and len(self.used_addresses) > self.alignment:
-            raise ValueError(f"Group '{self}' alignment is too small to hold requested items ({self.alignment} < {len(self.used_addresses)})")
+            item.post_assign_address_offset(starting_address)
+            if isinstance(item, Register):
+                self.map["registers"][item.name] = item.map
+                logger.debug("Register '%s' has been placed at offset 0x%X in group '%s'", item.name, item.map['address_offset'], self.name)
+            else:
+                self.map["groups"][item.name] = item.map
+
+            self.__use_addresses(item.used_addresses)
+
+
+        if self.alignment is not None and self.allocated.count > self.alignment:
+            raise ValueError(f"Group '{self}' alignment is too small to hold requested items ({self.alignment} < {self.allocated.count})")
         
         if self.alignment is None:
             # find a power of 2 alignment that is large enough to hold the item
             self.alignment = 1
 
-            while self.alignment < max(len(self.used_addresses), max(self.used_addresses)+1):                                                                                               
+            while self.alignment < max(self.allocated.count, self.allocated.max()+1):
                 self.alignment *= 2
-            print(f"{bcolors.OKGREEN}Register gen: Group '{self.name}' alignment has been automatically set to 0x{self.alignment:X}{bcolors.ENDC}")
+            logger.debug("Group '%s' alignment has been automatically set to 0x%X", self.name, self.alignment)
             self.map["alignment"] = self.alignment
             
         # groups use up their entire address space, regardless of what is inside
         if self.start_address is None:
-            self.used_addresses = list(range(0, self.alignment*self.count))
+            self.used_addresses = range(0, self.alignment*self.count)
         else:
-            self.used_addresses = list(range(self.start_address, self.start_address + self.alignment*self.count))
+            self.used_addresses = range(self.start_address, self.start_address + self.alignment*self.count)
 
 
         self.generated = True
@@ -525,32 +692,63 @@ class Group:
         INTERNAL
         Mark a range of addresses as used.
         Args:
-            addresses (list): A list of addresses to mark as used.
+            addresses (range): The consecutive addresses to mark as used.
         """
 
-        self.used_addresses.extend(addresses)
+        self.allocated.add(addresses[0], len(addresses))
 
     def __addresses_available(self, addresses, offset=0):
         """
         INTERNAL
-        Check if all addresses in a list are available.
+        Check if all addresses in a range are available.
         Args:
-            addresses (list): A list of addresses to check.
+            addresses (range): The consecutive addresses to check.
+            offset (int, optional): Added to every address.
         Returns:
             bool: True if the range is available, False otherwise.
         """
 
-        for address in addresses:
-            if address+offset in self.used_addresses:
-                return False
-        
-        return True
+        return self.allocated.available(addresses[0] + offset, len(addresses))
     
+    def definition(self) -> dict:
+        """
+        INTERNAL\n
+        Everything the generated map of the group depends on, used as the cache key.
+        """
+
+        return {
+            "group": self.name,
+            "count": self.count,
+            "start_address": self.start_address,
+            "desc": self.desc,
+            "alignment": self.alignment,
+            "contents": [item.definition() for item in self.contents.values()],
+        }
+
+    def load_map(self, map: dict):
+        """
+        INTERNAL\n
+        Take a previously generated map instead of generating one, leaving the group in the same state as generate() would.
+        Args:
+            map (dict): The generated map of this group.
+        """
+
+        self.map = map
+        self.alignment = map["alignment"]
+
+        for name, item in self.contents.items():
+            if isinstance(item, Register):
+                item.load_map(map["registers"][name])
+            else:
+                item.load_map(map["groups"][name])
+
+        self.used_addresses = range(map["address_offset"], map["address_offset"] + self.alignment*self.count)
+        self.generated = True
+
     def post_assign_address_offset(self, address_offset):
 
         self.map["address_offset"] = address_offset
-        for i in range(len(self.used_addresses)):
-            self.used_addresses[i] = i + address_offset
+        self.used_addresses = range(address_offset, address_offset + len(self.used_addresses))
 
     def __getattr__(self, name):
 
@@ -567,7 +765,7 @@ class Group:
         if name in self.contents:
             return self.contents[name]
             
-        raise AttributeError(f"Register gen: '{self.name}' map has no item '{name}', did you reference it from the correct containing object?\nTraceback: {traceback.format_stack()[-2]}")
+        raise AttributeError(f"Register gen: '{self.name}' map has no item '{name}', did you reference it from the correct containing object?")
     
     def __repr__(self) -> str:
         return f"Group(Name: {self.name}, count: {self.count}, address_offset: {self.start_address}, desc: {self.desc}, alignment: {self.alignment}, contents: {self.contents})"
@@ -576,6 +774,122 @@ class Group:
 
 
 
+# generated maps are cached here by the hash of their definition, next to the bytecode of this module
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__", "register_maps")
+
+@functools.cache
+def _generator_hash() -> bytes:
+    with open(__file__, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+_CPP_KEYWORDS = {
+    "alignas", "alignof", "and", "asm", "auto", "bool", "break", "case", "catch", "char", "class", "const", "constexpr", "continue",
+    "default", "delete", "do", "double", "else", "enum", "explicit", "export", "extern", "false", "float", "for", "friend", "goto",
+    "if", "inline", "int", "long", "mutable", "namespace", "new", "not", "operator", "or", "private", "protected", "public",
+    "register", "return", "short", "signed", "sizeof", "static", "struct", "switch", "template", "this", "throw", "true", "try",
+    "typedef", "typename", "union", "unsigned", "using", "virtual", "void", "volatile", "while", "xor",
+}
+
+_CPP_TYPES = {"unsigned": "uint32_t", "signed": "int32_t", "bool": "bool"}
+
+
+def _cpp_name(name: str) -> str:
+    """
+    INTERNAL\n
+    Name as a C++ identifier, keywords get a trailing underscore.
+    """
+
+    return f"{name}_" if name in _CPP_KEYWORDS else name
+
+
+def _cpp_bits(lines: list, map: dict, indent: str):
+    """
+    INTERNAL\n
+    Position of a register or sub-register in its 32 bit word, with get()/set() for its value.
+    """
+
+    shift = map["starting_bit"]
+    width = map["width"]
+    cpp_type = _CPP_TYPES[map["type"]]
+    lines.append(f"{indent}static constexpr uint32_t SHIFT = {shift};")
+    lines.append(f"{indent}static constexpr uint32_t WIDTH = {width};")
+    lines.append(f"{indent}static constexpr uint32_t MASK = 0x{(((1 << width) - 1) << shift) & 0xFFFFFFFF:08x};")
+    if map["type"] == "signed":     # move the sign bit to bit 31, then shift back down to sign extend
+        lines.append(f"{indent}static constexpr int32_t get(uint32_t word) {{ return int32_t(word << {32 - shift - width}) >> {32 - width}; }}")
+    elif map["type"] == "bool":
+        lines.append(f"{indent}static constexpr bool get(uint32_t word) {{ return (word & MASK) != 0; }}")
+    else:
+        lines.append(f"{indent}static constexpr uint32_t get(uint32_t word) {{ return (word & MASK) >> SHIFT; }}")
+    lines.append(f"{indent}static constexpr uint32_t set(uint32_t word, {cpp_type} value) {{ return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }}")
+
+
+def _cpp_member_name(name: str, parent: str) -> str:
+    """
+    INTERNAL\n
+    Name of a struct inside the struct parent, C++ does not allow a member with the name of its class.
+    """
+
+    name = _cpp_name(name)
+    return f"{name}_" if name == parent else name
+
+
+def _cpp_group(lines: list, map: dict, base: int, groups: list, indent: str, parent: str=""):
+    """
+    INTERNAL\n
+    Structs for everything in a group instance that starts at address base.
+    Args:
+        groups (list): (index name, stride) of every group around this one, outermost first.
+        parent (str): C++ name of the struct this is written in, empty for the module namespace.
+    """
+
+    for name, register in map["registers"].items():
+        address = base + register["address_offset"]
+        parameters = [f"uint16_t {index_name} = 0" for index_name, _ in groups] + ["uint16_t bank = 0"]
+        offsets = [f"{index_name} * 0x{stride:x}" for index_name, stride in groups] + ["bank"]
+        cpp_name = _cpp_member_name(name, parent)
+
+        lines.append(f"{indent}// {register['description']} ({'read' if register['rw'] == 'r' else 'write'})" if register["description"] else f"{indent}// ({'read' if register['rw'] == 'r' else 'write'})")
+        lines.append(f"{indent}struct {cpp_name} {{")
+        inner = indent + "    "
+        lines.append(f"{inner}static constexpr char NAME[] = \"{name}\";")
+        lines.append(f"{inner}static constexpr bool READ = {'true' if register['rw'] == 'r' else 'false'};")
+        lines.append(f"{inner}static constexpr uint16_t ADDRESS = 0x{address:x};")
+        lines.append(f"{inner}static constexpr uint32_t BANK_SIZE = {register['bank_size']};")
+        lines.append(f"{inner}static constexpr uint16_t address({', '.join(parameters)}) {{ return ADDRESS + {' + '.join(offsets)}; }}")
+        _cpp_bits(lines, register, inner)
+
+        sub_registers = register["sub_registers"]
+        sub_names = {sub_name: _cpp_member_name(sub_name, cpp_name) for sub_name in sub_registers}
+        for sub_name, sub_register in sub_registers.items():
+            lines.append(f"{inner}struct {sub_names[sub_name]} {{")
+            _cpp_bits(lines, sub_register, inner + "    ")
+            lines.append(f"{inner}}};")
+        if sub_registers:
+            arguments = ", ".join(f"{_CPP_TYPES[sub_register['type']]} {sub_names[sub_name]}" for sub_name, sub_register in sub_registers.items())
+            word = "0"
+            for sub_name in sub_registers:
+                word = f"{sub_names[sub_name]}::set({word}, {sub_names[sub_name]})"
+            lines.append(f"{inner}static constexpr uint32_t pack({arguments}) {{ return {word}; }}")
+
+        lines.append(f"{indent}}};")
+        lines.append("")
+
+    for name, group in map["groups"].items():
+        address = base + group["address_offset"]
+        cpp_name = _cpp_member_name(name, parent)
+        lines.append(f"{indent}// {group['description']}" if group["description"] else f"{indent}// group")
+        lines.append(f"{indent}struct {cpp_name} {{")
+        inner = indent + "    "
+        lines.append(f"{inner}static constexpr uint16_t ADDRESS = 0x{address:x};")
+        lines.append(f"{inner}static constexpr uint16_t STRIDE = 0x{group['alignment']:x};")
+        lines.append(f"{inner}static constexpr uint32_t COUNT = {group['count']};")
+        lines.append("")
+        _cpp_group(lines, group, address, groups + [(f"{cpp_name}_index", group["alignment"])], inner, cpp_name)
+        lines.append(f"{indent}}};")
+        lines.append("")
+
+
 class RegisterMapGenerator:
     def __init__(self, name: str, compatible_drivers: list, driver_settings: dict={}, desc: str=""):
         """
@@ -612,37 +926,214 @@ class RegisterMapGenerator:
         self.base_group.add(item)
 
 
-    def generate(self):
+    def generate(self, use_cache: bool=True):
         """
         Generate the register map
         the module may not be modified after this is called
+        Args:
+            use_cache (bool, optional): Load the map from the cache if this module was generated before with the same registers, groups and settings.
         """
 
-        
-
         if self.generated:
             raise ValueError("Map is already generated")
-        
-        self.map["name"] = self.name
-        print(f"{bcolors.OKBLUE}Register gen: Creating register map for module '{self.name}'{bcolors.ENDC}")
-        
-        if self.compatible_drivers != {}:
-            print(f"{bcolors.OKGREEN}Register gen: Compatible drivers set to {self.compatible_drivers}{bcolors.ENDC}")
-        else:
-            print(f"{bcolors.WARNING}Register gen: No compatible drivers set, controller will not be able to automatically use this module!{bcolors.ENDC}")
-        self.map["compatible_drivers"] = self.compatible_drivers
 
-        for setting, value in self.driver_settings.items():
-            print(f"{bcolors.OKGREEN}Register gen: Driver setting '{setting}' = {value} added to '{self.name}'{bcolors.ENDC}")
-        self.map["driver_settings"] = self.driver_settings
+        cache_file = None
+        if use_cache:
+            cache_file = os.path.join(CACHE_DIRECTORY, f"{self.name}_{self.definition_hash()}.json")
+            if self.__load_cache(cache_file):
+                logger.info("Loaded register map for module '%s' from cache", self.name)
+                self.__log_summary()
+                return
+
+        # warnings are collected even when they are not shown, so a cached map never hides them
+        collector = _WarningCollector()
+        level = logger.level
+        logger.addHandler(collector)
+        logger.setLevel(min(level, logging.WARNING))
+        _log_buffer.setLevel(level)
+        try:
+            self.map["name"] = self.name
+            logger.info("Creating register map for module '%s'", self.name)
+
+            if self.compatible_drivers:
+                logger.debug("Compatible drivers set to %s", self.compatible_drivers)
+            else:
+                logger.warning("No compatible drivers set for module '%s', controller will not be able to automatically use this module!", self.name)
+            self.map["compatible_drivers"] = self.compatible_drivers
+
+            for setting, value in self.driver_settings.items():
+                logger.debug("Driver setting '%s' = %s added to '%s'", setting, value, self.name)
+            self.map["driver_settings"] = self.driver_settings
 
-        self.base_group.generate()
+            self.base_group.generate()
+        finally:
+            logger.removeHandler(collector)
+            logger.setLevel(level)
+            _log_buffer.setLevel(logging.NOTSET)
 
         self.map["base_group"] = self.base_group.map
+        self.map["map_hash"] = self.__map_hash()
 
         self.generated = True
 
-        print(f"{bcolors.OKBLUE}Register gen: Done creating register map for module '{self.name}'{bcolors.ENDC}")
+        if cache_file is not None:
+            self.__save_cache(cache_file, collector.warnings)
+
+        logger.info("Done creating register map for module '%s'", self.name)
+        self.__log_summary()
+
+    def summary(self) -> dict:
+        """
+        Size of the generated register map, with banks and every instance of a group counted.
+        Returns:
+            dict: "registers" (number of 32 bit registers), "read_registers" and "write_registers" (the same split by direction),
+            "address_span" (one past the highest used address) and "fill_ratio" (registers / address_span).
+        """
+
+        if not self.generated:
+            raise ValueError("Map must be generated before summarizing")
+
+        def walk(group, base, instances):
+            # instances of a group only differ in offset, so the last one holds the highest address
+            last_base = base + group["address_offset"] + (group["count"] - 1) * group["alignment"]
+            instances *= group["count"]
+
+            registers = {"r": 0, "w": 0}
+            span = 0
+            for register in group["registers"].values():
+                registers[register["rw"]] += register["bank_size"] * instances
+                span = max(span, last_base + register["address_offset"] + register["bank_size"])
+            for sub_group in group["groups"].values():
+                sub_registers, sub_span = walk(sub_group, last_base, instances)
+                registers["r"] += sub_registers["r"]
+                registers["w"] += sub_registers["w"]
+                span = max(span, sub_span)
+            return registers, span
+
+        directions, span = walk(self.map["base_group"], 0, 1)
+        registers = directions["r"] + directions["w"]
+        return {
+            "registers": registers,
+            "read_registers": directions["r"],
+            "write_registers": directions["w"],
+            "address_span": span,
+            "fill_ratio": registers / span if span else 0.0,
+        }
+
+    def __log_summary(self):
+        """
+        INTERNAL\n
+        Log the summary of the module and write out the buffered messages.
+        """
+
+        if logger.isEnabledFor(logging.INFO):
+            summary = self.summary()
+            logger.info("Module '%s': %d registers in 0x%X addresses, %.0f%% filled", self.name, summary["registers"], summary["address_span"], summary["fill_ratio"] * 100)
+        _log_buffer.flush()
+
+    def definition_hash(self) -> str:
+        """
+        Hash of everything the generated map depends on: the registers and groups, the module parameters and the generator itself.
+        Returns:
+            str: The hash as a hex string.
+        """
+
+        definition = {
+            "name": self.name,
+            "compatible_drivers": self.compatible_drivers,
+            "driver_settings": self.driver_settings,
+            "desc": self.desc,
+            "base_group": self.base_group.definition(),
+        }
+
+        digest = hashlib.sha256(json.dumps(definition, default=repr).encode())
+        digest.update(_generator_hash())   # a change to the generator invalidates every cached map
+        return digest.hexdigest()[:32]
+
+    def __load_cache(self, cache_file) -> bool:
+        """
+        INTERNAL\n
+        Load the generated map from a cache file and show the warnings of its generation again.
+        Returns:
+            bool: True if the map was loaded, False if there is no usable cache file.
+        """
+
+        try:
+            with open(cache_file, 'r') as f:
+                cache = json.load(f)
+            self.base_group.load_map(cache["base_group"])
+            warnings = [(int(level), str(message)) for level, message in cache["warnings"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+        for level, message in warnings:
+            logger.log(level, "%s", message)
+
+        self.map["name"] = self.name
+        self.map["compatible_drivers"] = self.compatible_drivers
+        self.map["driver_settings"] = self.driver_settings
+        self.map["base_group"] = self.base_group.map
+        self.map["map_hash"] = self.__map_hash()
+
+        self.generated = True
+        return True
+
+    def __save_cache(self, cache_file, warnings: list):
+        """
+        INTERNAL\n
+        Save the generated map and the warnings of its generation to a cache file, a failure only costs the speedup.
+        """
+
+        try:
+            os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+            temp_file = f"{cache_file}.{os.getpid()}.tmp"   # write then rename so parallel runs never read a partial file
+            with open(temp_file, 'w') as f:
+                json.dump({"base_group": self.base_group.map, "warnings": warnings}, f)
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            logger.warning("Unable to cache register map for module '%s': %s", self.name, e)
+
+    def __map_hash(self) -> str:
+        """
+        INTERNAL\n
+        Hash of the generated addresses, exported in the map and in the C++ header so the software can check they match.
+        """
+
+        return hashlib.sha256(json.dumps(self.base_group.map, sort_keys=True).encode()).hexdigest()[:16]
+
+    def cpp_header(self) -> str:
+        """
+        C++ header with the register map as compile time constants, in namespace <module name>_registers.\n
+        Every group and register gets a struct of static members, so a register can be passed to Address_Map_Loader::get_register<>() as a type.
+        A group has ADDRESS (of its first instance), STRIDE and COUNT.
+        A register has NAME, READ, ADDRESS, BANK_SIZE, address() for one instance, and SHIFT, WIDTH, MASK (in place) with get()/set() for its bits in a 32 bit word.
+        A register with sub-registers has a struct per sub-register and pack() to build the whole word from all of them.
+        Returns:
+            str: The header.
+        """
+
+        if not self.generated:
+            raise ValueError("Map must be generated before exporting")
+
+        lines = [
+            f"// generated by controller-firmware/python/src/registers2.py from the '{self.name}' register map, do not edit",
+            "// must match the map of the module in the controller_config.json of the loaded bitstream, MAP_HASH is the map_hash there",
+            "",
+            "#pragma once",
+            "",
+            "#include <stdint.h>",
+            "",
+            f"namespace {_cpp_name(self.name)}_registers {{",
+            "",
+            f"constexpr char MAP_HASH[] = \"{self.map['map_hash']}\";",
+            "",
+        ]
+        _cpp_group(lines, self.base_group.map, 0, [], "")
+        lines += [
+            "}",
+            "",
+        ]
+        return "\n".join(lines)
 
     def exportJSON(self, filename):
         """
@@ -654,8 +1145,6 @@ class RegisterMapGenerator:
         if not self.generated:
             raise ValueError("Map must be generated before exporting")
 
-        import json
-
         with open(filename, 'w') as f:
             json.dump(self.map, f, indent=4)
 
@@ -11,6 +11,9 @@ import datetime
 from em_serial_controller import EM_Serial_Controller
 
 
+MULTICAST_NODES = 16    # nodes 0-15 of a ring can be written by COPY_MULTICAST
+
+
 class shift_dma_node(wiring.Component):
     """
     Node to connect a RTL module to the data loop
@@ -66,6 +69,8 @@ class shift_dma_node(wiring.Component):
             "read_complete_output": Out(1),
             "write_complete_input": In(1),
             "write_complete_output": Out(1),
+            "write_node_mask_input": In(MULTICAST_NODES),
+            "write_node_mask_output": Out(MULTICAST_NODES),
             
             "bram_address": Out(16),
             "bram_write_data": Out(32),
@@ -89,8 +94,11 @@ class shift_dma_node(wiring.Component):
         self.buf_data = Signal(32)
         self.buf_read_complete = Signal(1)
         self.buf_write_complete = Signal(1)
+        self.buf_write_node_mask = Signal(MULTICAST_NODES)
 
         self.read_next = Signal(1)
+        self.write_match = Signal(1)
+        self.remaining_write_node_mask = Signal(MULTICAST_NODES)
 
         # these signals are never modified by nodes so they pass right through, shift to buffer, then to output
         m.d.sync_100 += self.buf_write_bram_address.eq(self.write_bram_address_input)
@@ -107,6 +115,16 @@ class shift_dma_node(wiring.Component):
         m.d.sync_100 += self.buf_read_complete.eq(self.read_complete_input)
         #m.d.sync_100 += self.buf_write_complete.eq(self.write_complete_input)
         m.d.sync_100 += self.write_complete_output.eq(self.buf_write_complete)
+        m.d.sync_100 += self.write_node_mask_output.eq(self.buf_write_node_mask)
+
+        # multicast copies carry a mask of destination nodes instead of a single destination node,
+        # each node in the mask writes as the data passes and clears its bit, the copy is complete once the mask is empty
+        multicast_bit = Const((1 << self.address) if self.address < MULTICAST_NODES else 0, MULTICAST_NODES)
+        m.d.comb += self.remaining_write_node_mask.eq(self.write_node_mask_input & ~multicast_bit)
+        with m.If(self.write_node_mask_input == 0):
+            m.d.comb += self.write_match.eq(self.write_node_address_input == self.address)
+        with m.Else():
+            m.d.comb += self.write_match.eq((self.write_node_mask_input & multicast_bit) != 0)
 
 
         # if node matches first stage read address and it has not read yet, set specified bram address
@@ -126,14 +144,16 @@ class shift_dma_node(wiring.Component):
 
 
         # if node matches first stage write address, has read, and has not written yet, set specified bram address, data, and write enable
-        with m.If((self.write_node_address_input == self.address) & (self.read_complete_input) & (self.write_complete_input == 0)):
+        with m.If((self.write_match) & (self.read_complete_input) & (self.write_complete_input == 0)):
             m.d.comb += self.bram_address.eq(self.write_bram_address_input)
             m.d.comb += self.bram_write_data.eq(self.data_input)
             m.d.comb += self.bram_write_enable.eq(1)
-            m.d.sync_100 += self.buf_write_complete.eq(1)
+            m.d.sync_100 += self.buf_write_complete.eq(self.remaining_write_node_mask == 0)
+            m.d.sync_100 += self.buf_write_node_mask.eq(self.remaining_write_node_mask)
         with m.Else():
             m.d.comb += self.bram_write_enable.eq(0)
             m.d.sync_100 += self.buf_write_complete.eq(self.write_complete_input)
+            m.d.sync_100 += self.buf_write_node_mask.eq(self.write_node_mask_input)
 
 
         return m
@@ -147,8 +167,16 @@ class shift_dma_controller(wiring.Component):
 
     # TODO: fix system lockups when a valid source node is given but the destination node is invalid in COPY instructions
 
-    def __init__(self, instruction_memory_depth=4096):
+    def __init__(self, instruction_memory_depth=4096, node_count=None, scoreboard_depth=16):
+        """
+        node_count: number of nodes in the ring (not counting the controller), enables the read after write scoreboard
+
+        scoreboard_depth: number of copies the scoreboard can track, copies stall while it is full
+        """
+
         self.instruction_memory_depth = instruction_memory_depth
+        self.node_count = node_count
+        self.scoreboard_depth = scoreboard_depth if node_count is not None else 0
         super().__init__({
             "read_node_address_input": In(8),
             "read_node_address_output": Out(8),
@@ -164,10 +192,22 @@ class shift_dma_controller(wiring.Component):
             "read_complete_output": Out(1),
             "write_complete_input": In(1),
             "write_complete_output": Out(1),
+            "write_node_mask_input": In(MULTICAST_NODES),
+            "write_node_mask_output": Out(MULTICAST_NODES),
 
             "start": In(1),
             "busy": Out(1),
 
+            "events": In(16),   # WAIT_EVENT sources, bits 0-7: global timer pulses, bits 8-15: done flags of nodes 1-8
+
+            # performance counters, cleared when a program starts
+            "perf_busy_cycles": Out(32),        # cycles the program was running
+            "perf_stall_cycles": Out(32),       # cycles a COPY or COPY_BLOCK waited for an opening in the ring
+            "perf_copies_issued": Out(32),      # words sent into the ring by COPY and COPY_BLOCK
+            "perf_copies_completed": Out(32),   # copies that came back to the controller with their write done
+            "perf_nop_cycles": Out(32),         # cycles spent on NOP and WAIT instructions
+            "perf_hazard_cycles": Out(32),      # cycles a COPY or COPY_BLOCK was held back by the scoreboard
+
             "instruction_memory_address": Out(16),
             "instruction_memory_read_data": In(64),
 
@@ -181,6 +221,10 @@ class shift_dma_controller(wiring.Component):
         END = 0     # end of program
         NOP = 1     # no operation
         COPY = 2    # copy data from source to destination
+        WAIT_CYCLES = 3 # stall for the number of cycles in bits 0-31
+        COPY_BLOCK = 4  # copy a block of consecutive words, length is set in bits 52-63
+        WAIT_EVENT = 5  # stall until an event in the bits 0-15 mask happens, optional timeout (cycles) in bits 16-47
+        COPY_MULTICAST = 6  # copy one word to every node in the destination node mask (bits 8-15 nodes 0-7, bits 52-59 nodes 8-15)
        
     def elaborate(self, platform):
         m = Module()
@@ -192,9 +236,31 @@ class shift_dma_controller(wiring.Component):
         self.source_address = Signal(16)
         self.destination_address = Signal(16)
         self.instruction = Signal(4)
+        self.destination_node_mask = Signal(MULTICAST_NODES)
+        self.multicast = Signal(1)  # current instruction is a COPY_MULTICAST
+        self.block_length = Signal(12)
+        self.block_offset = Signal(12)  # word of the current COPY_BLOCK that is being issued
+        self.block_last_word = Signal(1)    # current COPY_BLOCK issues its last word this cycle
+        self.wait_length = Signal(32)
+        self.event_mask = Signal(16)
+        self.event_timeout = Signal(32)
+        self.wait_count = Signal(32)    # cycles spent on the current WAIT instruction
+        self.wait_done = Signal(1)  # current WAIT instruction finishes this cycle
+        self.instruction_done = Signal(1)   # current instruction finishes this cycle, fetch the next one
+
+        self.events_last = Signal(16)
+        self.event_flags = Signal(16)   # events that happened since the program started and have not been waited on yet
+        self.new_events = Signal(16)
 
         self.opening_available = Signal(1)   # if there is an opening available to add a new instruction to the loop
         
+        self.running = Signal(1)
+        self.copy_issued = Signal(1)
+        self.copy_stalled = Signal(1)
+        self.copy_hazard = Signal(1)
+        self.copy_completed = Signal(1)
+        self.nop_executed = Signal(1)
+
 
         m.submodules.dma_node = self.dma_node = shift_dma_node(0)   # create a dma node which will be used to make the data memory accessible to the dma nodes
         #self.dma_node.sync_200 = self.sync_200
@@ -205,7 +271,9 @@ class shift_dma_controller(wiring.Component):
         # 16-31: source address
         # 32-47: destination address
         # 48-51: instruction
-        # 52-63: not used
+        # 52-63: COPY_BLOCK length (number of words, 0 is treated as 1), not used by other instructions
+        # COPY_MULTICAST replaces the destination node with a node mask, bits 8-15 for nodes 0-7 and bits 52-59 for nodes 8-15
+        # WAIT_CYCLES uses bits 0-31 for the cycle count, WAIT_EVENT uses bits 0-15 for the event mask and 16-47 for the timeout
         #m.submodules.instruction_memory = self.instruction_memory = Memory(shape=unsigned(64), depth=(4096), init=[])   # about enough memory to use up an entire update period at 50% utilization (hopefully more than we'll ever need)
         #self.instruction_memory_read_port = self.instruction_memory.read_port()  # read is used only internally
         #self.instruction_memory_write_port = self.instruction_memory.write_port()   # write is used by the axi controller to configure the dma
@@ -214,7 +282,96 @@ class shift_dma_controller(wiring.Component):
         #self.current_instruction = self.instruction_memory_address
         self.current_instruction = Signal(16)
 
-        with m.If(self.opening_available | (self.instruction != self.Instruction.COPY)):    # this should be true as long the current instruction is not blocked
+        # a COPY_BLOCK stays on the same instruction until its last word is issued
+        m.d.comb += self.block_last_word.eq(self.block_offset + 1 >= self.block_length)
+
+        # events are edge triggered so level signals (like done flags) only count once they change
+        m.d.comb += self.new_events.eq(self.events & ~self.events_last)
+        m.d.sync_100 += self.events_last.eq(self.events)
+        with m.If(self.start & ~self.busy):     # only count events that happen after the program starts
+            m.d.sync_100 += self.event_flags.eq(0)
+        with m.Else():
+            m.d.sync_100 += self.event_flags.eq(self.event_flags | self.new_events)
+
+        with m.If(self.instruction == self.Instruction.WAIT_CYCLES):
+            m.d.comb += self.wait_done.eq(self.wait_count + 1 >= self.wait_length)
+        with m.Else():
+            m.d.comb += self.wait_done.eq((((self.event_flags | self.new_events) & self.event_mask) != 0) | ((self.event_timeout != 0) & (self.wait_count + 1 >= self.event_timeout)))
+
+        # read after write scoreboard
+        # copies reach node n 1+3n cycles after they are issued, and go around the ring again if the destination is not after the source
+        # a later copy always passes a node after an earlier one, so only writes on that second pass can be hazards
+        # every issued copy that writes on the second pass gets an entry that counts down to the cycle its destination is written,
+        # a copy is held back while its source is still waiting for one of those writes
+        # multicast entries keep the mask of their second pass destinations and count down the length of one pass
+        self.hazard = Signal(1)     # current copy word can not be issued yet
+        self.issue_ready = Signal(1)    # current copy word is issued this cycle
+        self.copy_source_address = Signal(16)
+        self.copy_destination_address = Signal(16)
+        m.d.comb += self.copy_source_address.eq(self.source_address + self.block_offset)   # block_offset is 0 for COPY
+        m.d.comb += self.copy_destination_address.eq(self.destination_address + self.block_offset)
+
+        if self.scoreboard_depth:
+            loop_cycles = 3*(self.node_count+1) + 1
+            max_cycles = 3*255 + loop_cycles
+            self.scoreboard_node = Array([Signal(8, name=f"scoreboard_node_{i}") for i in range(self.scoreboard_depth)])
+            self.scoreboard_address = Array([Signal(16, name=f"scoreboard_address_{i}") for i in range(self.scoreboard_depth)])
+            self.scoreboard_cycles = Array([Signal(range(max_cycles+1), name=f"scoreboard_cycles_{i}") for i in range(self.scoreboard_depth)])  # cycles until the write, 0 is a free entry
+            self.scoreboard_mask = Array([Signal(MULTICAST_NODES, name=f"scoreboard_mask_{i}") for i in range(self.scoreboard_depth)])   # 0 for single destination copies
+            self.wrap_node_mask = Signal(MULTICAST_NODES)  # multicast destinations written on the second pass
+            self.needs_entry = Signal(1)   # current copy writes on the second pass
+            self.scoreboard_free = Signal(range(self.scoreboard_depth))
+            self.scoreboard_full = Signal(1)
+            self.write_cycles = Signal(range(max_cycles+1))
+
+            conflicts = []
+            for i in range(self.scoreboard_depth):
+                unicast_conflict = (self.scoreboard_node[i] == self.source_node) & (self.scoreboard_cycles[i] >= 1 + 3*self.source_node)
+                multicast_conflict = (self.scoreboard_mask[i] >> self.source_node)[0] & (self.scoreboard_cycles[i] != 0)
+                conflicts.append((self.scoreboard_address[i] == self.copy_source_address) & Mux(self.scoreboard_mask[i] != 0, multicast_conflict, unicast_conflict))
+            m.d.comb += self.scoreboard_full.eq(Cat([self.scoreboard_cycles[i] != 0 for i in range(self.scoreboard_depth)]).all())
+            m.d.comb += self.hazard.eq(Cat(conflicts).any() | (self.scoreboard_full & self.needs_entry))
+
+            for i in reversed(range(self.scoreboard_depth)):    # lowest free entry
+                with m.If(self.scoreboard_cycles[i] == 0):
+                    m.d.comb += self.scoreboard_free.eq(i)
+
+            for node in range(MULTICAST_NODES):
+                m.d.comb += self.wrap_node_mask[node].eq(self.destination_node_mask[node] & (node <= self.source_node))
+
+            with m.If(self.multicast):
+                m.d.comb += self.needs_entry.eq(self.wrap_node_mask != 0)
+                m.d.comb += self.write_cycles.eq(loop_cycles)
+            with m.Else():
+                m.d.comb += self.needs_entry.eq(self.destination_node <= self.source_node)
+                m.d.comb += self.write_cycles.eq(3*self.destination_node + loop_cycles)
+
+            for i in range(self.scoreboard_depth):
+                with m.If(self.scoreboard_cycles[i] != 0):
+                    m.d.sync_100 += self.scoreboard_cycles[i].eq(self.scoreboard_cycles[i] - 1)
+            with m.If(self.copy_issued & self.needs_entry):
+                m.d.sync_100 += [
+                    self.scoreboard_node[self.scoreboard_free].eq(self.destination_node),
+                    self.scoreboard_mask[self.scoreboard_free].eq(Mux(self.multicast, self.wrap_node_mask, 0)),
+                    self.scoreboard_address[self.scoreboard_free].eq(self.copy_destination_address),
+                    self.scoreboard_cycles[self.scoreboard_free].eq(self.write_cycles),
+                ]
+        else:
+            m.d.comb += self.hazard.eq(0)
+
+        m.d.comb += self.issue_ready.eq(self.opening_available & ~self.hazard)
+
+        with m.Switch(self.instruction):
+            with m.Case(self.Instruction.COPY, self.Instruction.COPY_MULTICAST):
+                m.d.comb += self.instruction_done.eq(self.issue_ready)
+            with m.Case(self.Instruction.COPY_BLOCK):
+                m.d.comb += self.instruction_done.eq(self.issue_ready & self.block_last_word)
+            with m.Case(self.Instruction.WAIT_CYCLES, self.Instruction.WAIT_EVENT):
+                m.d.comb += self.instruction_done.eq(self.wait_done)
+            with m.Default():
+                m.d.comb += self.instruction_done.eq(1)
+
+        with m.If(self.instruction_done):    # this should be true as long the current instruction is not blocked
         #with m.If(self.opening_available):
             m.d.comb += self.instruction_memory_address.eq(self.current_instruction)
         with m.Else():
@@ -239,6 +396,12 @@ class shift_dma_controller(wiring.Component):
         m.d.comb += self.source_address.eq(self.instruction_memory_read_data[16:32])
         m.d.comb += self.destination_address.eq(self.instruction_memory_read_data[32:48])
         m.d.comb += self.instruction.eq(self.instruction_memory_read_data[48:52])
+        m.d.comb += self.block_length.eq(self.instruction_memory_read_data[52:64])
+        m.d.comb += self.destination_node_mask.eq(Cat(self.instruction_memory_read_data[8:16], self.instruction_memory_read_data[52:60]))
+        m.d.comb += self.multicast.eq(self.instruction == self.Instruction.COPY_MULTICAST)
+        m.d.comb += self.wait_length.eq(self.instruction_memory_read_data[0:32])
+        m.d.comb += self.event_mask.eq(self.instruction_memory_read_data[0:16])
+        m.d.comb += self.event_timeout.eq(self.instruction_memory_read_data[16:48])
 
         m.d.comb += self.data_memory_address.eq(self.dma_node.bram_address)
         m.d.comb += self.data_memory_address.eq(self.dma_node.bram_address)
@@ -254,6 +417,7 @@ class shift_dma_controller(wiring.Component):
         m.d.comb += self.data_output.eq(self.dma_node.data_output)
         m.d.comb += self.read_complete_output.eq(self.dma_node.read_complete_output)
         m.d.comb += self.write_complete_output.eq(self.dma_node.write_complete_output)
+        m.d.comb += self.write_node_mask_output.eq(self.dma_node.write_node_mask_output)
 
         with m.If(self.write_complete_input | (~self.read_complete_input)):  # these cases mean that the current instruction has completed or is invalid, so we can safely replace it with a new one
             m.d.comb += self.opening_available.eq(1)
@@ -266,25 +430,113 @@ class shift_dma_controller(wiring.Component):
             m.d.sync_100 += self.dma_node.data_input.eq(self.data_input)
             m.d.sync_100 += self.dma_node.read_complete_input.eq(self.read_complete_input)
             m.d.sync_100 += self.dma_node.write_complete_input.eq(self.write_complete_input)
+            m.d.sync_100 += self.dma_node.write_node_mask_input.eq(self.write_node_mask_input)
         
 
-        with m.If(((self.instruction != self.Instruction.END) & (self.current_instruction != self.instruction_memory_depth-1)) & (self.start | self.busy)):
+        # performance counters
+        # empty packets are all zero with both complete flags set, so any other packet coming back with its write done is a finished copy
+        is_copy = (self.instruction == self.Instruction.COPY) | (self.instruction == self.Instruction.COPY_BLOCK) | self.multicast
+        m.d.comb += [
+            self.running.eq(((self.instruction != self.Instruction.END) & (self.current_instruction != self.instruction_memory_depth-1)) & (self.start | self.busy)),
+            self.copy_issued.eq(self.running & is_copy & self.issue_ready),
+            self.copy_stalled.eq(self.running & is_copy & ~self.opening_available),
+            self.copy_hazard.eq(self.running & is_copy & self.opening_available & self.hazard),
+            self.copy_completed.eq(self.read_complete_input & self.write_complete_input & (Cat(self.read_node_address_input, self.write_node_address_input, self.read_bram_address_input, self.write_bram_address_input) != 0)),
+            self.nop_executed.eq(self.running & ((self.instruction == self.Instruction.NOP) | (self.instruction == self.Instruction.WAIT_CYCLES) | (self.instruction == self.Instruction.WAIT_EVENT))),
+        ]
+
+        counters = [
+            (self.perf_busy_cycles, self.running),
+            (self.perf_stall_cycles, self.copy_stalled),
+            (self.perf_copies_issued, self.copy_issued),
+            (self.perf_copies_completed, self.copy_completed),
+            (self.perf_nop_cycles, self.nop_executed),
+            (self.perf_hazard_cycles, self.copy_hazard),
+        ]
+        for counter, increment in counters:
+            with m.If(self.start & ~self.busy):
+                m.d.sync_100 += counter.eq(increment)
+            with m.Else():
+                m.d.sync_100 += counter.eq(counter + increment)
+
+        with m.If(self.running):
             m.d.sync_100 += self.busy.eq(1)
 
-            with m.If((self.instruction == self.Instruction.COPY)):
-                with m.If(self.opening_available):
+            with m.If((self.instruction == self.Instruction.COPY) | self.multicast):
+                with m.If(self.issue_ready):
                     # feed data into the internal node
                     m.d.sync_100 += self.dma_node.read_node_address_input.eq(self.source_node)
-                    m.d.sync_100 += self.dma_node.write_node_address_input.eq(self.destination_node)
+                    m.d.sync_100 += self.dma_node.write_node_address_input.eq(Mux(self.multicast, 0, self.destination_node))
                     m.d.sync_100 += self.dma_node.read_bram_address_input.eq(self.source_address)
                     m.d.sync_100 += self.dma_node.write_bram_address_input.eq(self.destination_address)
                     m.d.sync_100 += self.dma_node.data_input.eq(0)
                     m.d.sync_100 += self.dma_node.read_complete_input.eq(0)
                     m.d.sync_100 += self.dma_node.write_complete_input.eq(0)
+                    m.d.sync_100 += self.dma_node.write_node_mask_input.eq(Mux(self.multicast, self.destination_node_mask, 0))
                     
                     # increment the current instruction pointer
                     m.d.sync_100 += self.current_instruction.eq(self.current_instruction + 1)
+                with m.Elif(self.opening_available):
+                    # held back by the scoreboard, fill the opening with an empty packet
+                    m.d.sync_100 += self.dma_node.read_node_address_input.eq(0)
+                    m.d.sync_100 += self.dma_node.write_node_address_input.eq(0)
+                    m.d.sync_100 += self.dma_node.read_bram_address_input.eq(0)
+                    m.d.sync_100 += self.dma_node.write_bram_address_input.eq(0)
+                    m.d.sync_100 += self.dma_node.data_input.eq(0)
+                    m.d.sync_100 += self.dma_node.read_complete_input.eq(1)
+                    m.d.sync_100 += self.dma_node.write_complete_input.eq(1)
+                    m.d.sync_100 += self.dma_node.write_node_mask_input.eq(0)
+
+
+            with m.Elif(self.instruction == self.Instruction.COPY_BLOCK):
+                with m.If(self.issue_ready):
+                    # feed the next word of the block into the internal node
+                    m.d.sync_100 += self.dma_node.read_node_address_input.eq(self.source_node)
+                    m.d.sync_100 += self.dma_node.write_node_address_input.eq(self.destination_node)
+                    m.d.sync_100 += self.dma_node.read_bram_address_input.eq(self.copy_source_address)
+                    m.d.sync_100 += self.dma_node.write_bram_address_input.eq(self.copy_destination_address)
+                    m.d.sync_100 += self.dma_node.data_input.eq(0)
+                    m.d.sync_100 += self.dma_node.read_complete_input.eq(0)
+                    m.d.sync_100 += self.dma_node.write_complete_input.eq(0)
+                    m.d.sync_100 += self.dma_node.write_node_mask_input.eq(0)
+
+                    with m.If(self.block_last_word):
+                        # increment the current instruction pointer once the whole block is issued
+                        m.d.sync_100 += self.block_offset.eq(0)
+                        m.d.sync_100 += self.current_instruction.eq(self.current_instruction + 1)
+                    with m.Else():
+                        m.d.sync_100 += self.block_offset.eq(self.block_offset + 1)
+                with m.Elif(self.opening_available):
+                    # held back by the scoreboard, fill the opening with an empty packet
+                    m.d.sync_100 += self.dma_node.read_node_address_input.eq(0)
+                    m.d.sync_100 += self.dma_node.write_node_address_input.eq(0)
+                    m.d.sync_100 += self.dma_node.read_bram_address_input.eq(0)
+                    m.d.sync_100 += self.dma_node.write_bram_address_input.eq(0)
+                    m.d.sync_100 += self.dma_node.data_input.eq(0)
+                    m.d.sync_100 += self.dma_node.read_complete_input.eq(1)
+                    m.d.sync_100 += self.dma_node.write_complete_input.eq(1)
+                    m.d.sync_100 += self.dma_node.write_node_mask_input.eq(0)
+
+            with m.Elif((self.instruction == self.Instruction.WAIT_CYCLES) | (self.instruction == self.Instruction.WAIT_EVENT)):
+                with m.If(self.wait_done):
+                    # increment the current instruction pointer once the wait is over
+                    m.d.sync_100 += self.wait_count.eq(0)
+                    m.d.sync_100 += self.current_instruction.eq(self.current_instruction + 1)
+                    with m.If(self.instruction == self.Instruction.WAIT_EVENT):
+                        m.d.sync_100 += self.event_flags.eq((self.event_flags | self.new_events) & ~self.event_mask)   # events are used up by the wait
+                with m.Else():
+                    m.d.sync_100 += self.wait_count.eq(self.wait_count + 1)
 
+                with m.If(self.opening_available):
+                    # reset the data to all zero with complete flags set, this will end up doing nothing
+                    m.d.sync_100 += self.dma_node.read_node_address_input.eq(0)
+                    m.d.sync_100 += self.dma_node.write_node_address_input.eq(0)
+                    m.d.sync_100 += self.dma_node.read_bram_address_input.eq(0)
+                    m.d.sync_100 += self.dma_node.write_bram_address_input.eq(0)
+                    m.d.sync_100 += self.dma_node.data_input.eq(0)
+                    m.d.sync_100 += self.dma_node.read_complete_input.eq(1)
+                    m.d.sync_100 += self.dma_node.write_complete_input.eq(1)
+                    m.d.sync_100 += self.dma_node.write_node_mask_input.eq(0)
 
             with m.Elif(self.instruction == self.Instruction.NOP): 
                 # increment the current instruction pointer
@@ -298,6 +550,7 @@ class shift_dma_controller(wiring.Component):
                     m.d.sync_100 += self.dma_node.data_input.eq(0)
                     m.d.sync_100 += self.dma_node.read_complete_input.eq(1)
                     m.d.sync_100 += self.dma_node.write_complete_input.eq(1)
+                    m.d.sync_100 += self.dma_node.write_node_mask_input.eq(0)
             
 
             with m.Else(): # this should never occur as it means an unknown instruction, but we will just treat it as a NOP to prevent the system from hanging
@@ -312,9 +565,12 @@ class shift_dma_controller(wiring.Component):
                     m.d.sync_100 += self.dma_node.data_input.eq(0)
                     m.d.sync_100 += self.dma_node.read_complete_input.eq(1)
                     m.d.sync_100 += self.dma_node.write_complete_input.eq(1)
+                    m.d.sync_100 += self.dma_node.write_node_mask_input.eq(0)
 
         with m.Else():
             m.d.sync_100 += self.busy.eq(0)
+            m.d.sync_100 += self.block_offset.eq(0)
+            m.d.sync_100 += self.wait_count.eq(0)
             with m.If(self.start):
                 m.d.sync_100 += self.current_instruction.eq(0)
 
@@ -327,6 +583,7 @@ class shift_dma_controller(wiring.Component):
                 m.d.sync_100 += self.dma_node.data_input.eq(0)
                 m.d.sync_100 += self.dma_node.read_complete_input.eq(1)
                 m.d.sync_100 += self.dma_node.write_complete_input.eq(1)
+                m.d.sync_100 += self.dma_node.write_node_mask_input.eq(0)
 
         return m
     
@@ -353,7 +610,7 @@ class test_bench(wiring.Component):
 
         #m.domains.sync_200 = ClockDomain("sync_200", async_reset=True)
 
-        self.controller = shift_dma_controller()
+        self.controller = shift_dma_controller(node_count=self.node_count)
         self.instruction_memory = Memory(shape=unsigned(64), depth=(4096), init=[])   # about enough memory to use up an entire update period at 50% utilization (hopefully more than we'll ever need)
         self.data_memory = Memory(shape=unsigned(32), depth=(4096), init=[])
 
@@ -400,6 +657,7 @@ class test_bench(wiring.Component):
                 m.d.sync_100 += node.data_input.eq(self.controller.data_output)
                 m.d.sync_100 += node.read_complete_input.eq(self.controller.read_complete_output)
                 m.d.sync_100 += node.write_complete_input.eq(self.controller.write_complete_output)
+                m.d.sync_100 += node.write_node_mask_input.eq(self.controller.write_node_mask_output)
             else:
                 m.d.sync_100 += node.read_node_address_input.eq(m.submodules[f"node_{node_index}"].read_node_address_output)
                 m.d.sync_100 += node.write_node_address_input.eq(m.submodules[f"node_{node_index}"].write_node_address_output)
@@ -408,6 +666,7 @@ class test_bench(wiring.Component):
                 m.d.sync_100 += node.data_input.eq(m.submodules[f"node_{node_index}"].data_output)
                 m.d.sync_100 += node.read_complete_input.eq(m.submodules[f"node_{node_index}"].read_complete_output)
                 m.d.sync_100 += node.write_complete_input.eq(m.submodules[f"node_{node_index}"].write_complete_output)
+                m.d.sync_100 += node.write_node_mask_input.eq(m.submodules[f"node_{node_index}"].write_node_mask_output)
         node = m.submodules[f"node_{self.node_count}"]
         m.d.sync_100 += self.controller.read_node_address_input.eq(node.read_node_address_output)
         m.d.sync_100 += self.controller.write_node_address_input.eq(node.write_node_address_output)
@@ -416,6 +675,7 @@ class test_bench(wiring.Component):
         m.d.sync_100 += self.controller.data_input.eq(node.data_output)
         m.d.sync_100 += self.controller.read_complete_input.eq(node.read_complete_output)
         m.d.sync_100 += self.controller.write_complete_input.eq(node.write_complete_output)
+        m.d.sync_100 += self.controller.write_node_mask_input.eq(node.write_node_mask_output)
 
 
         # testing for serial controller
@@ -708,8 +968,8 @@ def extract_instruction(data, print_output=True):
 
     return source_node, destination_node, source_address, destination_address, instruction
 
-def create_instruction(source_node, destination_node, source_address, destination_address, instruction):
-    data = source_node | (destination_node << 8) | (source_address << 16) | (destination_address << 32) | (instruction << 48)
+def create_instruction(source_node, destination_node, source_address, destination_address, instruction, length=0):
+    data = source_node | (destination_node << 8) | (source_address << 16) | (destination_address << 32) | (instruction << 48) | (length << 52)
     return data
 
 def generate_random_instructions(count):
@@ -0,0 +1,479 @@
+import numpy as np
+from enum import IntEnum
+
+
+"""
+Cycle accurate behavioral model of the shift DMA ring (shift_dma_controller + a chain of shift_dma_node)
+
+Every register stage of the rtl is modeled, so the ring outputs match the hdl simulation on every cycle.
+Many independent rings (a batch) are simulated at once, which makes sweeping program layouts much faster
+than running the Amaranth simulator.
+
+Node 0 is the node inside the controller (data memory), nodes 1..N are the external nodes in ring order.
+"""
+
+
+class Instruction(IntEnum):
+    # must match shift_dma_controller.Instruction
+    END = 0     # end of program
+    NOP = 1     # no operation
+    COPY = 2    # copy data from source to destination
+    WAIT_CYCLES = 3 # stall for the number of cycles in bits 0-31
+    COPY_BLOCK = 4  # copy a block of consecutive words, length is set in bits 52-63
+    WAIT_EVENT = 5  # stall until an event in the bits 0-15 mask happens, optional timeout (cycles) in bits 16-47
+    COPY_MULTICAST = 6  # copy one word to every node in the destination node mask (bits 8-15 nodes 0-7, bits 52-59 nodes 8-15)
+
+
+MULTICAST_NODES = 16    # must match shift_dma.MULTICAST_NODES
+
+# ring signals in the same order as the shift_dma.py test bench records them, followed by the multicast node mask
+FIELDS = ("read_node", "write_node", "read_address", "write_address", "data", "read_complete", "write_complete", "write_node_mask")
+
+# performance counters of the controller, same order as the perf_* ports
+COUNTERS = ("busy_cycles", "stall_cycles", "copies_issued", "copies_completed", "nop_cycles", "hazard_cycles")
+
+
+class shift_dma_model:
+
+    def __init__(self, node_count:int, batch_size:int=1, instruction_memory_depth:int=4096, data_memory_depth:int=4096, node_memory_depth:int=0x2000, scoreboard_depth:int=16):
+        """
+        node_count: number of external nodes in the ring
+
+        batch_size: number of independent rings to simulate at once
+
+        instruction_memory_depth: must match shift_dma_controller.instruction_memory_depth
+
+        data_memory_depth/node_memory_depth: size of the controller data memory and of each node bram (32 bit words, power of 2)
+
+        scoreboard_depth: must match shift_dma_controller.scoreboard_depth, 0 disables the read after write scoreboard
+        """
+
+        for depth in (instruction_memory_depth, data_memory_depth, node_memory_depth):
+            if depth & (depth - 1) != 0:
+                raise ValueError("Memory depths must be a power of 2")
+
+        self.node_count = node_count
+        self.batch_size = batch_size
+        self.instruction_memory_depth = instruction_memory_depth
+        self.scoreboard_depth = scoreboard_depth
+        self.loop_cycles = 3*(node_count+1) + 1
+
+        self.batch = np.arange(batch_size)
+        self.node_addresses = np.arange(node_count+1)
+        self.multicast_bits = np.where(self.node_addresses < MULTICAST_NODES, 1 << np.minimum(self.node_addresses, MULTICAST_NODES-1), 0)
+        self.memory_masks = np.array([data_memory_depth-1] + [node_memory_depth-1]*node_count)
+
+        self.instruction_memory = np.zeros((batch_size, instruction_memory_depth), dtype=np.uint64)
+        self.memory = np.zeros((batch_size, node_count+1, max(data_memory_depth, node_memory_depth)), dtype=np.int64)   # node 0 is the controller data memory
+
+        self.reset()
+
+    def reset(self):
+        """
+        Put every register back to its reset value (memory contents are kept)
+        """
+
+        shape = (self.batch_size, self.node_count+1)
+
+        # tag is not part of the hardware, it follows a copy around the ring so events can be matched to instructions
+        self.input = {field: np.zeros(shape, dtype=np.int64) for field in FIELDS + ("tag",)}
+        self.buffer = {field: np.zeros(shape, dtype=np.int64) for field in FIELDS + ("tag",)}
+        self.output = {field: np.zeros(shape, dtype=np.int64) for field in FIELDS + ("tag",)}
+        self.controller_input = {field: np.zeros(self.batch_size, dtype=np.int64) for field in FIELDS + ("tag",)}
+        for stage in (self.input, self.buffer, self.output):
+            stage["tag"][:] = -1
+        self.controller_input["tag"][:] = -1
+
+        self.read_next = np.zeros(shape, dtype=bool)
+        self.bram_read_data = np.zeros(shape, dtype=np.int64)
+
+        self.current_instruction = np.zeros(self.batch_size, dtype=np.int64)
+        self.instruction_read_data = np.zeros(self.batch_size, dtype=np.uint64)
+        self.instruction_read_address = np.zeros(self.batch_size, dtype=np.int64)   # address that instruction_read_data came from
+        self.block_offset = np.zeros(self.batch_size, dtype=np.int64)
+        self.wait_count = np.zeros(self.batch_size, dtype=np.int64)
+        self.events_last = np.zeros(self.batch_size, dtype=np.int64)
+        self.event_flags = np.zeros(self.batch_size, dtype=np.int64)
+        self.busy = np.zeros(self.batch_size, dtype=np.int64)
+        self.scoreboard_node = np.zeros((self.batch_size, self.scoreboard_depth), dtype=np.int64)
+        self.scoreboard_address = np.zeros((self.batch_size, self.scoreboard_depth), dtype=np.int64)
+        self.scoreboard_cycles = np.zeros((self.batch_size, self.scoreboard_depth), dtype=np.int64)  # cycles until the write, 0 is a free entry
+        self.scoreboard_mask = np.zeros((self.batch_size, self.scoreboard_depth), dtype=np.int64)  # second pass destinations of multicast copies, 0 for single destination copies
+        self.counters = {counter: np.zeros(self.batch_size, dtype=np.int64) for counter in COUNTERS}
+
+        self.cycle = 0
+        self.clear_timing()
+
+    def clear_timing(self):
+        """
+        Clear the recorded instruction timing, -1 means the event has not happened
+        """
+
+        shape = (self.batch_size, self.instruction_memory_depth)
+        self.issue_cycles = np.full(shape, -1, dtype=np.int64)     # first cycle the instruction was executed
+        self.read_cycles = np.full(shape, -1, dtype=np.int64)      # cycle the source node was read (last word for COPY_BLOCK)
+        self.complete_cycles = np.full(shape, -1, dtype=np.int64)  # cycle the destination node was written (last word for COPY_BLOCK, last node for COPY_MULTICAST)
+        self.end_cycles = np.full(self.batch_size, -1, dtype=np.int64)     # cycle busy went low
+
+    def load_program(self, program:list, batch:int=None):
+        """
+        Write a list of 64 bit instructions into instruction memory starting at address 0
+
+        batch: ring to load the program into, all rings if not given
+        """
+
+        if len(program) > self.instruction_memory_depth:
+            raise ValueError("Program is larger than the instruction memory")
+
+        if batch is None:
+            batch = slice(None)
+        self.instruction_memory[batch, :len(program)] = np.array(program, dtype=np.uint64)
+
+    def tick(self, start=0, events=0):
+        """
+        Advance the model by one sync_100 clock cycle
+
+        start: start input of the controller, a single value or one per ring
+
+        events: events input of the controller (timer pulses and node done flags), a single value or one per ring
+        """
+
+        inp = self.input
+        buf = self.buffer
+        out = self.output
+        start = np.broadcast_to(np.asarray(start, dtype=bool), (self.batch_size,))
+        events = np.broadcast_to(np.asarray(events, dtype=np.int64), (self.batch_size,))
+
+        # node logic (all nodes at once)
+        read_match = (inp["read_node"] == self.node_addresses) & (inp["read_complete"] == 0)
+        # multicast copies write every node in their mask and clear its bit, they are complete once the mask is empty
+        destination_match = np.where(inp["write_node_mask"] == 0, inp["write_node"] == self.node_addresses, (inp["write_node_mask"] & self.multicast_bits) != 0)
+        write_match = destination_match & (inp["read_complete"] != 0) & (inp["write_complete"] == 0)
+        remaining_mask = inp["write_node_mask"] & ~self.multicast_bits
+
+        bram_address = np.where(write_match, inp["write_address"], np.where(read_match, inp["read_address"], 0)) & self.memory_masks
+
+        # brams are not transparent, reads see the memory before this cycle's write
+        new_bram_read_data = self.memory[self.batch[:, None], self.node_addresses, bram_address]
+        write_batch, write_node = np.nonzero(write_match)
+        self.memory[write_batch, write_node, bram_address[write_batch, write_node]] = inp["data"][write_batch, write_node]
+
+        read_batch, read_node = np.nonzero(read_match & (inp["tag"] >= 0))
+        self.read_cycles[read_batch, inp["tag"][read_batch, read_node]] = self.cycle
+        tagged = inp["tag"][write_batch, write_node] >= 0
+        self.complete_cycles[write_batch[tagged], inp["tag"][write_batch, write_node][tagged]] = self.cycle
+
+        new_output = {field: buf[field] for field in FIELDS + ("tag",)}
+        new_output["data"] = np.where(self.read_next, self.bram_read_data, buf["data"])
+        new_output["read_complete"] = np.where(self.read_next, 1, buf["read_complete"])
+
+        new_buffer = {field: inp[field] for field in FIELDS + ("tag",)}
+        new_buffer["write_complete"] = np.where(write_match, remaining_mask == 0, inp["write_complete"])
+        new_buffer["write_node_mask"] = np.where(write_match, remaining_mask, inp["write_node_mask"])
+
+        # controller logic
+        ctrl = self.controller_input
+        opening_available = (ctrl["write_complete"] != 0) | (ctrl["read_complete"] == 0)
+
+        instruction_data = self.instruction_read_data
+        instruction = ((instruction_data >> np.uint64(48)) & np.uint64(0xF)).astype(np.int64)
+        is_block = instruction == Instruction.COPY_BLOCK
+        is_multicast = instruction == Instruction.COPY_MULTICAST
+        is_copy = (instruction == Instruction.COPY) | is_block | is_multicast
+        block_length = ((instruction_data >> np.uint64(52)) & np.uint64(0xFFF)).astype(np.int64)
+        block_last_word = self.block_offset + 1 >= block_length
+
+        # events are edge triggered and only count after the program starts
+        new_events = events & ~self.events_last
+        is_wait_event = instruction == Instruction.WAIT_EVENT
+        is_wait = (instruction == Instruction.WAIT_CYCLES) | is_wait_event
+        wait_length = (instruction_data & np.uint64(0xFFFFFFFF)).astype(np.int64)
+        event_mask = (instruction_data & np.uint64(0xFFFF)).astype(np.int64)
+        event_timeout = ((instruction_data >> np.uint64(16)) & np.uint64(0xFFFFFFFF)).astype(np.int64)
+        wait_done = np.where(is_wait_event,
+                             (((self.event_flags | new_events) & event_mask) != 0) | ((event_timeout != 0) & (self.wait_count + 1 >= event_timeout)),
+                             self.wait_count + 1 >= wait_length)
+
+        source_node = (instruction_data & np.uint64(0xFF)).astype(np.int64)
+        destination_node = ((instruction_data >> np.uint64(8)) & np.uint64(0xFF)).astype(np.int64)
+        destination_node_mask = destination_node | (((instruction_data >> np.uint64(52)) & np.uint64(0xFF)).astype(np.int64) << 8)
+        wrap_node_mask = destination_node_mask & ((2 << np.minimum(source_node, MULTICAST_NODES)) - 1)     # multicast destinations written on the second pass
+        word_offset = np.where(is_block, self.block_offset, 0)
+        source_address = (((instruction_data >> np.uint64(16)) & np.uint64(0xFFFF)).astype(np.int64) + word_offset) & 0xFFFF
+        destination_address = (((instruction_data >> np.uint64(32)) & np.uint64(0xFFFF)).astype(np.int64) + word_offset) & 0xFFFF
+
+        # read after write scoreboard, a copy waits while its source has a write that lands after the copy would read it
+        if self.scoreboard_depth:
+            unicast_conflict = (self.scoreboard_node == source_node[:, None]) & (self.scoreboard_cycles >= 1 + 3*source_node[:, None])
+            multicast_conflict = (((self.scoreboard_mask >> np.minimum(source_node, MULTICAST_NODES)[:, None]) & 1) != 0) & (self.scoreboard_cycles != 0)
+            conflict = (self.scoreboard_address == source_address[:, None]) & np.where(self.scoreboard_mask != 0, multicast_conflict, unicast_conflict)
+            needs_entry = np.where(is_multicast, wrap_node_mask != 0, destination_node <= source_node)    # only writes on the second pass can be hazards
+            hazard = conflict.any(axis=1) | ((self.scoreboard_cycles != 0).all(axis=1) & needs_entry)
+        else:
+            hazard = np.zeros(self.batch_size, dtype=bool)
+        issue_ready = opening_available & ~hazard
+
+        # a COPY_BLOCK stays on the same instruction until its last word is issued, WAIT instructions stay until they are done
+        instruction_done = np.where(is_copy, issue_ready & (~is_block | block_last_word), np.where(is_wait, wait_done, True))
+        instruction_address = np.where(instruction_done, self.current_instruction, (self.current_instruction - 1) & 0xFFFF)
+
+        running = (instruction != Instruction.END) & (self.current_instruction != self.instruction_memory_depth-1) & (start | (self.busy != 0))
+        issue = running & is_copy & issue_ready
+        advance = running & instruction_done
+        empty = opening_available & ~issue
+
+        new_current_instruction = np.where(advance, (self.current_instruction + 1) & 0xFFFF, np.where(~running & start, 0, self.current_instruction))
+        new_block_offset = np.where(running & is_block & issue_ready, np.where(block_last_word, 0, self.block_offset + 1), np.where(running, self.block_offset, 0))
+        new_wait_count = np.where(running & is_wait, np.where(wait_done, 0, self.wait_count + 1), np.where(running, self.wait_count, 0))
+        new_event_flags = np.where(running & is_wait_event & wait_done, (self.event_flags | new_events) & ~event_mask,
+                                   np.where(start & (self.busy == 0), 0, self.event_flags | new_events))
+        first_issue = (running & (issue | ~is_copy)) & (self.issue_cycles[self.batch, self.instruction_read_address] < 0)
+        self.issue_cycles[self.batch[first_issue], self.instruction_read_address[first_issue]] = self.cycle
+        finished = ~running & (self.busy != 0)
+        self.end_cycles[finished] = self.cycle
+
+        # empty packets are all zero with both complete flags set, anything else coming back with its write done is a finished copy
+        packet_used = (ctrl["read_node"] | ctrl["write_node"] | ctrl["read_address"] | ctrl["write_address"]) != 0
+        increments = {
+            "busy_cycles": running,
+            "stall_cycles": running & is_copy & ~opening_available,
+            "copies_issued": issue,
+            "copies_completed": (ctrl["read_complete"] != 0) & (ctrl["write_complete"] != 0) & packet_used,
+            "nop_cycles": running & ((instruction == Instruction.NOP) | is_wait),
+            "hazard_cycles": running & is_copy & opening_available & hazard,
+        }
+        clear = start & (self.busy == 0)
+        for counter in COUNTERS:
+            self.counters[counter] = (np.where(clear, 0, self.counters[counter]) + increments[counter]) & 0xFFFFFFFF
+
+        if self.scoreboard_depth:
+            free = np.argmax(self.scoreboard_cycles == 0, axis=1)     # lowest free entry
+            self.scoreboard_cycles = np.maximum(self.scoreboard_cycles - 1, 0)
+            write_cycles = np.where(is_multicast, self.loop_cycles, 3*destination_node + self.loop_cycles)
+            insert = issue & needs_entry
+            issue_batch = self.batch[insert]
+            self.scoreboard_node[issue_batch, free[insert]] = destination_node[insert]
+            self.scoreboard_mask[issue_batch, free[insert]] = np.where(is_multicast, wrap_node_mask, 0)[insert]
+            self.scoreboard_address[issue_batch, free[insert]] = destination_address[insert]
+            self.scoreboard_cycles[issue_batch, free[insert]] = write_cycles[insert]
+
+        node_0_input = {
+            "read_node": source_node,
+            "write_node": np.where(is_multicast, 0, destination_node),
+            "read_address": source_address,
+            "write_address": destination_address,
+            "data": 0,
+            "read_complete": 0,
+            "write_complete": 0,
+            "write_node_mask": np.where(is_multicast, destination_node_mask, 0),
+            "tag": self.instruction_read_address,
+        }
+        empty_packet = {"read_node": 0, "write_node": 0, "read_address": 0, "write_address": 0, "data": 0, "read_complete": 1, "write_complete": 1, "write_node_mask": 0, "tag": -1}
+
+        # shift the ring by one register stage
+        new_input = {}
+        for field in FIELDS + ("tag",):
+            new_input[field] = np.empty_like(inp[field])
+            new_input[field][:, 1:] = out[field][:, :-1]
+            # unfinished copies are recirculated when there is no opening
+            new_input[field][:, 0] = np.where(issue, node_0_input[field], np.where(empty, empty_packet[field], ctrl[field]))
+            self.controller_input[field] = out[field][:, -1].copy()
+
+        self.input = new_input
+        self.buffer = new_buffer
+        self.output = new_output
+        self.read_next = read_match
+        self.bram_read_data = new_bram_read_data
+
+        self.instruction_read_address = instruction_address & (self.instruction_memory_depth-1)
+        self.instruction_read_data = self.instruction_memory[self.batch, self.instruction_read_address]
+        self.current_instruction = new_current_instruction
+        self.block_offset = new_block_offset
+        self.wait_count = new_wait_count
+        self.event_flags = new_event_flags
+        self.events_last = events.copy()
+        self.busy = running.astype(np.int64)
+        self.cycle += 1
+
+    def run(self, max_cycles:int=100000, drain:bool=True, events:dict=None) -> dict:
+        """
+        Start the loaded programs and run until every ring has finished
+
+        drain: keep running until all copies in the ring have written their destination
+
+        events: events input for each cycle after the start, {cycle: event bits}, held for one cycle
+
+        returns the busy cycle count of each ring and the issue/read/complete cycle of each instruction
+        (arrays of [batch, instruction address], relative to the start cycle, -1 if it never happened)
+        """
+
+        # let copies from a previous run (or reset) finish and the instruction fetch settle, like the controller does between cycles
+        self.__run_until(lambda: not self.copies_in_flight().any(), max_cycles)
+        self.tick()
+
+        self.clear_timing()
+        start_cycle = self.cycle
+        if events is None:
+            events = {}
+
+        self.tick(start=1, events=events.get(0, 0))
+        self.__run_until(lambda: not self.busy.any(), max_cycles, lambda: events.get(self.cycle - start_cycle, 0))
+        if drain:
+            self.__run_until(lambda: not self.copies_in_flight().any(), max_cycles)
+
+        def relative(cycles):
+            return np.where(cycles >= 0, cycles - start_cycle, -1)
+
+        return {
+            "cycles": relative(self.end_cycles),
+            "issue": relative(self.issue_cycles),
+            "read": relative(self.read_cycles),
+            "complete": relative(self.complete_cycles),
+            "drain_cycles": self.cycle - start_cycle - relative(self.end_cycles),
+        }
+
+    def copies_in_flight(self) -> np.ndarray:
+        """
+        Check each ring for copies that have not written their destination yet
+        """
+
+        in_flight = self.controller_input["write_complete"] == 0
+        for stage in (self.input, self.buffer, self.output):
+            in_flight |= (stage["write_complete"] == 0).any(axis=1)
+        return in_flight
+
+    def ring_state(self, batch:int=0) -> list:
+        """
+        Ring outputs of the controller followed by each node, flattened in the same order as the shift_dma.py test bench results
+        """
+
+        line = []
+        for node in range(self.node_count+1):
+            for field in FIELDS:
+                line.append(int(self.output[field][batch, node]))
+        return line
+
+    def __run_until(self, condition, max_cycles, events=lambda: 0):
+        """
+        INTERNAL\n
+        Tick until condition() is true
+        """
+
+        for _ in range(max_cycles):
+            if condition():
+                return
+            self.tick(events=events())
+
+        raise TimeoutError("Shift DMA model did not finish, check for copies to invalid destination nodes or WAIT_EVENTs that never happen")
+
+
+
+if __name__ == "__main__":
+    # validate against the hdl test bench in shift_dma.py, every ring output is compared on every cycle
+    import random, time
+    import shift_dma
+    from amaranth.sim import Simulator
+
+    dut = shift_dma.dut
+    node_count = shift_dma.node_count
+    sim = Simulator(dut)    # elaborates dut
+
+    random.seed(0)
+    program = shift_dma.generate_random_instructions(60)
+    for block in range(8):  # blocks use the upper address range so they do not overlap the single copies
+        length = random.randint(1, 8)
+        program.insert(random.randint(1, len(program)), shift_dma.create_instruction(random.randint(0, node_count), random.randint(0, node_count), 1024 + block*16, 1024 + block*16, Instruction.COPY_BLOCK, length))
+    for chain in range(6):   # back to back dependent copies, the scoreboard holds the second one until the first has written its source
+        address = 1536 + chain*4
+        nodes = [random.randint(0, node_count) for node in range(3)]
+        position = random.randint(1, len(program))
+        program[position:position] = [shift_dma.create_instruction(nodes[0], nodes[1], address, address, Instruction.COPY), shift_dma.create_instruction(nodes[1], nodes[2], address, address+1, Instruction.COPY)]
+    for multicast in range(6):  # multicasts followed by a copy that reads one of their destinations
+        address = 1792 + multicast*4
+        source = random.randint(0, node_count)
+        mask = random.randint(1, (1 << (node_count+1)) - 1)
+        reader = random.choice([node for node in range(node_count+1) if mask & (1 << node)])
+        position = random.randint(1, len(program))
+        program[position:position] = [shift_dma.create_instruction(source, mask & 0xFF, address, address+1, Instruction.COPY_MULTICAST, mask >> 8), shift_dma.create_instruction(reader, random.randint(0, node_count), address+1, address+2, Instruction.COPY)]
+    for wait in range(4):
+        program.insert(random.randint(1, len(program)), random.randint(0, 8) | (Instruction.WAIT_CYCLES << 48))
+        program.insert(random.randint(1, len(program)), (1 << random.randint(0, 15)) | (random.choice([0, 20]) << 16) | (Instruction.WAIT_EVENT << 48))
+    program += [shift_dma.create_instruction(0, 0, 0, 0, Instruction.END)]
+    initial_data = {(node, address): random.randint(0, 0xFFFFFFFF) for node in range(node_count+1) for address in range(2048)}
+    run_cycles = 800
+    events = [sum([(random.random() < 0.03) << bit for bit in range(16)]) for cycle in range(run_cycles)]
+
+    model = shift_dma_model(node_count)
+    model.load_program(program)
+    for (node, address), value in initial_data.items():
+        model.memory[0, node, address] = value
+
+    mismatches = []
+
+    async def bench(ctx):
+        for index, instruction in enumerate(program):
+            ctx.set(dut.instruction_memory.data[index], instruction)
+        for (node, address), value in initial_data.items():
+            if node == 0:
+                ctx.set(dut.data_memory.data[address], value)
+            else:
+                ctx.set(dut.node_mem[f"node_test_block_{node}"].memory.data[address], value)
+
+        for cycle in range(run_cycles):
+            start = int(cycle == 2*(node_count+1)*4)
+            ctx.set(dut.start, start)
+            ctx.set(dut.controller.events, events[cycle])
+            model.tick(start, events[cycle])
+            await ctx.tick("sync_100")
+
+            hdl = []
+            for node in [dut.controller] + [dut.nodes[f"node_{i+1}"] for i in range(node_count)]:
+                hdl += [ctx.get(node.read_node_address_output), ctx.get(node.write_node_address_output),
+                        ctx.get(node.read_bram_address_output), ctx.get(node.write_bram_address_output),
+                        ctx.get(node.data_output), ctx.get(node.read_complete_output), ctx.get(node.write_complete_output),
+                        ctx.get(node.write_node_mask_output)]
+            hdl.append(ctx.get(dut.busy))
+            hdl += [ctx.get(getattr(dut.controller, f"perf_{counter}")) for counter in COUNTERS]
+
+            if hdl != model.ring_state() + [int(model.busy[0])] + [int(model.counters[counter][0]) for counter in COUNTERS]:
+                mismatches.append(cycle)
+
+        for (node, address) in initial_data:
+            if node == 0:
+                value = ctx.get(dut.data_memory.data[address])
+            else:
+                value = ctx.get(dut.node_mem[f"node_test_block_{node}"].memory.data[address])
+            if value != model.memory[0, node, address]:
+                mismatches.append((node, address))
+
+    sim.add_clock(1e-8, domain="sync_100")
+    sim.add_testbench(bench)
+    hdl_start = time.perf_counter()
+    sim.run()
+    hdl_time = (time.perf_counter() - hdl_start) / run_cycles
+
+    if mismatches:
+        print(f"FAILED: model does not match hdl, first mismatch at {mismatches[0]}")
+    else:
+        print(f"PASS: model matches hdl for {run_cycles} cycles")
+
+    model = shift_dma_model(node_count)
+    model.load_program(program)
+    result = model.run(events={cycle: 0xFFFF for cycle in range(0, 2000, 10)})
+
+    print(f"program takes {result['cycles'][0]} cycles (+{result['drain_cycles'][0]} to drain)")
+    print(", ".join([f"{counter}: {model.counters[counter][0]}" for counter in COUNTERS]))
+    for index in range(len(program)):
+        print(f"instruction {index}: issue {result['issue'][0, index]}, read {result['read'][0, index]}, complete {result['complete'][0, index]}")
+
+    # timing sweep over many random programs at once
+    batch_size = 2000
+    model = shift_dma_model(node_count, batch_size=batch_size, instruction_memory_depth=256, data_memory_depth=1024, node_memory_depth=1024)
+    for batch in range(batch_size):
+        model.load_program(shift_dma.generate_random_instructions(60) + [shift_dma.create_instruction(0, 0, 0, 0, Instruction.END)], batch)
+    model_start = time.perf_counter()
+    result = model.run()
+    model_time = (time.perf_counter() - model_start) / (model.cycle * batch_size)
+
+    print(f"{batch_size} programs: {result['cycles'].min()} to {result['cycles'].max()} cycles")
+    print(f"model: {model_time*1e6:.3f}us per ring cycle, hdl: {hdl_time*1e6:.1f}us per cycle ({hdl_time/model_time:.0f}x)")
@@ -0,0 +1,235 @@
+// generated by controller-firmware/python/src/registers2.py from the 'em_serial_controller' register map, do not edit
+// must match the map of the module in the controller_config.json of the loaded bitstream, MAP_HASH is the map_hash there
+
+#pragma once
+
+#include <stdint.h>
+
+namespace em_serial_controller_registers {
+
+constexpr char MAP_HASH[] = "163ac2b922259896";
+
+// Global control register (write)
+struct control {
+    static constexpr char NAME[] = "control";
+    static constexpr bool READ = false;
+    static constexpr uint16_t ADDRESS = 0x1000;
+    static constexpr uint32_t BANK_SIZE = 1;
+    static constexpr uint16_t address(uint16_t bank = 0) { return ADDRESS + bank; }
+    static constexpr uint32_t SHIFT = 0;
+    static constexpr uint32_t WIDTH = 32;
+    static constexpr uint32_t MASK = 0xffffffff;
+    static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+    static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    struct start_transfers {
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 1;
+        static constexpr uint32_t MASK = 0x00000001;
+        static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+        static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    static constexpr uint32_t pack(bool start_transfers) { return start_transfers::set(0, start_transfers); }
+};
+
+// Bit length in clock cycles (minimum allowed is equal to 115200 baud) (write)
+struct bit_length {
+    static constexpr char NAME[] = "bit_length";
+    static constexpr bool READ = false;
+    static constexpr uint16_t ADDRESS = 0x1001;
+    static constexpr uint32_t BANK_SIZE = 1;
+    static constexpr uint16_t address(uint16_t bank = 0) { return ADDRESS + bank; }
+    static constexpr uint32_t SHIFT = 0;
+    static constexpr uint32_t WIDTH = 32;
+    static constexpr uint32_t MASK = 0xffffffff;
+    static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+    static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+};
+
+// Status register (read)
+struct status {
+    static constexpr char NAME[] = "status";
+    static constexpr bool READ = true;
+    static constexpr uint16_t ADDRESS = 0x1002;
+    static constexpr uint32_t BANK_SIZE = 1;
+    static constexpr uint16_t address(uint16_t bank = 0) { return ADDRESS + bank; }
+    static constexpr uint32_t SHIFT = 0;
+    static constexpr uint32_t WIDTH = 32;
+    static constexpr uint32_t MASK = 0xffffffff;
+    static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+    static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    struct update_busy {
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 1;
+        static constexpr uint32_t MASK = 0x00000001;
+        static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+        static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    struct update_done {
+        static constexpr uint32_t SHIFT = 1;
+        static constexpr uint32_t WIDTH = 1;
+        static constexpr uint32_t MASK = 0x00000002;
+        static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+        static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    struct update_error {
+        static constexpr uint32_t SHIFT = 2;
+        static constexpr uint32_t WIDTH = 1;
+        static constexpr uint32_t MASK = 0x00000004;
+        static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+        static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    static constexpr uint32_t pack(bool update_busy, bool update_done, bool update_error) { return update_error::set(update_done::set(update_busy::set(0, update_busy), update_done), update_error); }
+};
+
+// Per-device registers
+struct devices {
+    static constexpr uint16_t ADDRESS = 0x0;
+    static constexpr uint16_t STRIDE = 0x100;
+    static constexpr uint32_t COUNT = 16;
+
+    // Device control register (write)
+    struct control {
+        static constexpr char NAME[] = "control";
+        static constexpr bool READ = false;
+        static constexpr uint16_t ADDRESS = 0x0;
+        static constexpr uint32_t BANK_SIZE = 1;
+        static constexpr uint16_t address(uint16_t devices_index = 0, uint16_t bank = 0) { return ADDRESS + devices_index * 0x100 + bank; }
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 32;
+        static constexpr uint32_t MASK = 0xffffffff;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        struct enable {
+            static constexpr uint32_t SHIFT = 0;
+            static constexpr uint32_t WIDTH = 1;
+            static constexpr uint32_t MASK = 0x00000001;
+            static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+            static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        struct enable_cyclic_data {
+            static constexpr uint32_t SHIFT = 1;
+            static constexpr uint32_t WIDTH = 1;
+            static constexpr uint32_t MASK = 0x00000002;
+            static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+            static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        struct rx_cyclic_packet_size {
+            static constexpr uint32_t SHIFT = 2;
+            static constexpr uint32_t WIDTH = 8;
+            static constexpr uint32_t MASK = 0x000003fc;
+            static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+            static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        static constexpr uint32_t pack(bool enable, bool enable_cyclic_data, uint32_t rx_cyclic_packet_size) { return rx_cyclic_packet_size::set(enable_cyclic_data::set(enable::set(0, enable), enable_cyclic_data), rx_cyclic_packet_size); }
+    };
+
+    // Device status register (read)
+    struct status {
+        static constexpr char NAME[] = "status";
+        static constexpr bool READ = true;
+        static constexpr uint16_t ADDRESS = 0x1;
+        static constexpr uint32_t BANK_SIZE = 1;
+        static constexpr uint16_t address(uint16_t devices_index = 0, uint16_t bank = 0) { return ADDRESS + devices_index * 0x100 + bank; }
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 32;
+        static constexpr uint32_t MASK = 0xffffffff;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        struct no_rx_response_fault {
+            static constexpr uint32_t SHIFT = 0;
+            static constexpr uint32_t WIDTH = 1;
+            static constexpr uint32_t MASK = 0x00000001;
+            static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+            static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        struct rx_not_finished_fault {
+            static constexpr uint32_t SHIFT = 1;
+            static constexpr uint32_t WIDTH = 1;
+            static constexpr uint32_t MASK = 0x00000002;
+            static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+            static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        struct invalid_rx_crc_fault {
+            static constexpr uint32_t SHIFT = 2;
+            static constexpr uint32_t WIDTH = 1;
+            static constexpr uint32_t MASK = 0x00000004;
+            static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+            static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        static constexpr uint32_t pack(bool no_rx_response_fault, bool rx_not_finished_fault, bool invalid_rx_crc_fault) { return invalid_rx_crc_fault::set(rx_not_finished_fault::set(no_rx_response_fault::set(0, no_rx_response_fault), rx_not_finished_fault), invalid_rx_crc_fault); }
+    };
+
+    // Cyclic config register (write)
+    struct cyclic_config {
+        static constexpr char NAME[] = "cyclic_config";
+        static constexpr bool READ = false;
+        static constexpr uint16_t ADDRESS = 0x40;
+        static constexpr uint32_t BANK_SIZE = 64;
+        static constexpr uint16_t address(uint16_t devices_index = 0, uint16_t bank = 0) { return ADDRESS + devices_index * 0x100 + bank; }
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 32;
+        static constexpr uint32_t MASK = 0xffffffff;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        struct cyclic_read_data_size {
+            static constexpr uint32_t SHIFT = 0;
+            static constexpr uint32_t WIDTH = 3;
+            static constexpr uint32_t MASK = 0x00000007;
+            static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+            static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        struct cyclic_read_data_starting_byte_index {
+            static constexpr uint32_t SHIFT = 3;
+            static constexpr uint32_t WIDTH = 2;
+            static constexpr uint32_t MASK = 0x00000018;
+            static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+            static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        struct cyclic_write_data_size {
+            static constexpr uint32_t SHIFT = 5;
+            static constexpr uint32_t WIDTH = 3;
+            static constexpr uint32_t MASK = 0x000000e0;
+            static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+            static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        struct cyclic_write_data_starting_byte_index {
+            static constexpr uint32_t SHIFT = 8;
+            static constexpr uint32_t WIDTH = 2;
+            static constexpr uint32_t MASK = 0x00000300;
+            static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+            static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        static constexpr uint32_t pack(uint32_t cyclic_read_data_size, uint32_t cyclic_read_data_starting_byte_index, uint32_t cyclic_write_data_size, uint32_t cyclic_write_data_starting_byte_index) { return cyclic_write_data_starting_byte_index::set(cyclic_write_data_size::set(cyclic_read_data_starting_byte_index::set(cyclic_read_data_size::set(0, cyclic_read_data_size), cyclic_read_data_starting_byte_index), cyclic_write_data_size), cyclic_write_data_starting_byte_index); }
+    };
+
+    // Cyclic read data register (read)
+    struct cyclic_read_data {
+        static constexpr char NAME[] = "cyclic_read_data";
+        static constexpr bool READ = true;
+        static constexpr uint16_t ADDRESS = 0x80;
+        static constexpr uint32_t BANK_SIZE = 64;
+        static constexpr uint16_t address(uint16_t devices_index = 0, uint16_t bank = 0) { return ADDRESS + devices_index * 0x100 + bank; }
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 32;
+        static constexpr uint32_t MASK = 0xffffffff;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+
+    // Cyclic write data register (write)
+    struct cyclic_write_data {
+        static constexpr char NAME[] = "cyclic_write_data";
+        static constexpr bool READ = false;
+        static constexpr uint16_t ADDRESS = 0xc0;
+        static constexpr uint32_t BANK_SIZE = 64;
+        static constexpr uint16_t address(uint16_t devices_index = 0, uint16_t bank = 0) { return ADDRESS + devices_index * 0x100 + bank; }
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 32;
+        static constexpr uint32_t MASK = 0xffffffff;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+
+};
+
+}
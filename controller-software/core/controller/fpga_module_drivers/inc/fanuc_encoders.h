@@ -1,4 +1,5 @@
 #include "fpga_module_driver_factory.h"
+#include "fanuc_encoders_registers.h"
 //#include "register_helper.h"
 
 
@@ -6,7 +7,9 @@
 
 class fanuc_encoders : public base_driver {
 public:    
-    uint32_t load_config(json config, std::string module_name, Node_Core* node_core, fpga_instructions* fpga_instr) override;
+    uint32_t load_config(json* config, std::string module_name, Node_Core* node_core, fpga_instructions* fpga_instr) override;
+
+    uint32_t custom_load_config() override;
 
     uint32_t run() override;
 
@@ -15,11 +18,7 @@ private:
     Register* multiturn_count = nullptr;
     Register* singleturn_count = nullptr;
     Register* commutation_count = nullptr;
-    Register* crc_error = nullptr;
-    Register* no_response = nullptr;
-    Register* unindexed = nullptr;
-    Register* battery_fail = nullptr;
-    Register* done = nullptr;
+    Register* status = nullptr;    // whole register, bits are read with fanuc_encoders_registers
 
     struct encoder_data{
         uint32_t multiturn_count = 0;
@@ -0,0 +1,112 @@
+// generated by controller-firmware/python/src/registers2.py from the 'fanuc_encoders' register map, do not edit
+// must match the map of the module in the controller_config.json of the loaded bitstream, MAP_HASH is the map_hash there
+
+#pragma once
+
+#include <stdint.h>
+
+namespace fanuc_encoders_registers {
+
+constexpr char MAP_HASH[] = "99cc859d69e584e8";
+
+// Group of registers for each encoder
+struct encoder {
+    static constexpr uint16_t ADDRESS = 0x0;
+    static constexpr uint16_t STRIDE = 0x4;
+    static constexpr uint32_t COUNT = 6;
+
+    // Absolute multiturn count (read)
+    struct multiturn_count {
+        static constexpr char NAME[] = "multiturn_count";
+        static constexpr bool READ = true;
+        static constexpr uint16_t ADDRESS = 0x0;
+        static constexpr uint32_t BANK_SIZE = 1;
+        static constexpr uint16_t address(uint16_t encoder_index = 0, uint16_t bank = 0) { return ADDRESS + encoder_index * 0x4 + bank; }
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 32;
+        static constexpr uint32_t MASK = 0xffffffff;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+
+    // Absolute (after index) singleturn count (read)
+    struct singleturn_count {
+        static constexpr char NAME[] = "singleturn_count";
+        static constexpr bool READ = true;
+        static constexpr uint16_t ADDRESS = 0x1;
+        static constexpr uint32_t BANK_SIZE = 1;
+        static constexpr uint16_t address(uint16_t encoder_index = 0, uint16_t bank = 0) { return ADDRESS + encoder_index * 0x4 + bank; }
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 32;
+        static constexpr uint32_t MASK = 0xffffffff;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+
+    // Absolute commutation count (read)
+    struct commutation_count {
+        static constexpr char NAME[] = "commutation_count";
+        static constexpr bool READ = true;
+        static constexpr uint16_t ADDRESS = 0x2;
+        static constexpr uint32_t BANK_SIZE = 1;
+        static constexpr uint16_t address(uint16_t encoder_index = 0, uint16_t bank = 0) { return ADDRESS + encoder_index * 0x4 + bank; }
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 16;
+        static constexpr uint32_t MASK = 0x0000ffff;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+
+    // Encoder status (read)
+    struct status {
+        static constexpr char NAME[] = "status";
+        static constexpr bool READ = true;
+        static constexpr uint16_t ADDRESS = 0x3;
+        static constexpr uint32_t BANK_SIZE = 1;
+        static constexpr uint16_t address(uint16_t encoder_index = 0, uint16_t bank = 0) { return ADDRESS + encoder_index * 0x4 + bank; }
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 32;
+        static constexpr uint32_t MASK = 0xffffffff;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        struct battery_fail {
+            static constexpr uint32_t SHIFT = 0;
+            static constexpr uint32_t WIDTH = 1;
+            static constexpr uint32_t MASK = 0x00000001;
+            static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+            static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        struct unindexed {
+            static constexpr uint32_t SHIFT = 1;
+            static constexpr uint32_t WIDTH = 1;
+            static constexpr uint32_t MASK = 0x00000002;
+            static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+            static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        struct no_response {
+            static constexpr uint32_t SHIFT = 2;
+            static constexpr uint32_t WIDTH = 1;
+            static constexpr uint32_t MASK = 0x00000004;
+            static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+            static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        struct crc_fail {
+            static constexpr uint32_t SHIFT = 3;
+            static constexpr uint32_t WIDTH = 1;
+            static constexpr uint32_t MASK = 0x00000008;
+            static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+            static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        struct done {
+            static constexpr uint32_t SHIFT = 4;
+            static constexpr uint32_t WIDTH = 1;
+            static constexpr uint32_t MASK = 0x00000010;
+            static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+            static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+        };
+        static constexpr uint32_t pack(bool battery_fail, bool unindexed, bool no_response, bool crc_fail, bool done) { return done::set(crc_fail::set(no_response::set(unindexed::set(battery_fail::set(0, battery_fail), unindexed), no_response), crc_fail), done); }
+    };
+
+};
+
+}
@@ -1,4 +1,5 @@
 #include "fpga_module_driver_factory.h"
+#include "global_timers_registers.h"
 //#include "register_helper.h"
 
 
@@ -6,7 +7,9 @@
 
 class global_timers : public base_driver {
 public:    
-    uint32_t load_config(json config, std::string module_name, Node_Core* node_core, fpga_instructions* fpga_instr) override;
+    uint32_t load_config(json* config, std::string module_name, Node_Core* node_core, fpga_instructions* fpga_instr) override;
+
+    uint32_t custom_load_config() override;
 
     uint32_t run() override;
 
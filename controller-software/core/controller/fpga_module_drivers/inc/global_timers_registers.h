@@ -0,0 +1,26 @@
+// generated by controller-firmware/python/src/registers2.py from the 'global_timers' register map, do not edit
+// must match the map of the module in the controller_config.json of the loaded bitstream, MAP_HASH is the map_hash there
+
+#pragma once
+
+#include <stdint.h>
+
+namespace global_timers_registers {
+
+constexpr char MAP_HASH[] = "8ac7c51742720724";
+
+// Value that the timer counts down from before triggering (write)
+struct counter {
+    static constexpr char NAME[] = "counter";
+    static constexpr bool READ = false;
+    static constexpr uint16_t ADDRESS = 0x0;
+    static constexpr uint32_t BANK_SIZE = 8;
+    static constexpr uint16_t address(uint16_t bank = 0) { return ADDRESS + bank; }
+    static constexpr uint32_t SHIFT = 0;
+    static constexpr uint32_t WIDTH = 32;
+    static constexpr uint32_t MASK = 0xffffffff;
+    static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+    static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+};
+
+}
@@ -1,4 +1,5 @@
 #include "fpga_module_driver_factory.h"
+#include "serial_interface_card_registers.h"
 //#include "register_helper.h"
 
 
@@ -19,16 +20,9 @@ private:
 
     // TODO: probably should make a way to free this memory apon destruction (if we allow reconfig without restarting)
     struct registers2{
-        Register* rs485_mode_enable;
-        Register* rs422_mode_enable;
-        Register* quadrature_mode_enable;
-        Register* i2c_config_read_mode;
-        Register* i2c_config_device_address;
-        Register* i2c_config_reg_address;
-        Register* i2c_config_data_length;
-        Register* i2c_config_start;
-        Register* i2c_status_busy;
-        Register* i2c_status_error;
+        Register* port_mode_enable;     // whole registers, written/read as one word with serial_interface_card_registers
+        Register* i2c_config;
+        Register* i2c_status;
         Register* i2c_data_rx;
         Register* i2c_data_tx;
 
@@ -0,0 +1,155 @@
+// generated by controller-firmware/python/src/registers2.py from the 'serial_interface_card' register map, do not edit
+// must match the map of the module in the controller_config.json of the loaded bitstream, MAP_HASH is the map_hash there
+
+#pragma once
+
+#include <stdint.h>
+
+namespace serial_interface_card_registers {
+
+constexpr char MAP_HASH[] = "c8373cacc8a745ec";
+
+// Select which port modes to enable (write)
+struct port_mode_enable {
+    static constexpr char NAME[] = "port_mode_enable";
+    static constexpr bool READ = false;
+    static constexpr uint16_t ADDRESS = 0x0;
+    static constexpr uint32_t BANK_SIZE = 1;
+    static constexpr uint16_t address(uint16_t bank = 0) { return ADDRESS + bank; }
+    static constexpr uint32_t SHIFT = 0;
+    static constexpr uint32_t WIDTH = 32;
+    static constexpr uint32_t MASK = 0xffffffff;
+    static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+    static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    struct rs485_mode_enable {
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 10;
+        static constexpr uint32_t MASK = 0x000003ff;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    struct rs422_mode_enable {
+        static constexpr uint32_t SHIFT = 10;
+        static constexpr uint32_t WIDTH = 10;
+        static constexpr uint32_t MASK = 0x000ffc00;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    struct quadrature_mode_enable {
+        static constexpr uint32_t SHIFT = 20;
+        static constexpr uint32_t WIDTH = 7;
+        static constexpr uint32_t MASK = 0x07f00000;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    static constexpr uint32_t pack(uint32_t rs485_mode_enable, uint32_t rs422_mode_enable, uint32_t quadrature_mode_enable) { return quadrature_mode_enable::set(rs422_mode_enable::set(rs485_mode_enable::set(0, rs485_mode_enable), rs422_mode_enable), quadrature_mode_enable); }
+};
+
+// I2C configuration (write)
+struct i2c_config {
+    static constexpr char NAME[] = "i2c_config";
+    static constexpr bool READ = false;
+    static constexpr uint16_t ADDRESS = 0x1;
+    static constexpr uint32_t BANK_SIZE = 1;
+    static constexpr uint16_t address(uint16_t bank = 0) { return ADDRESS + bank; }
+    static constexpr uint32_t SHIFT = 0;
+    static constexpr uint32_t WIDTH = 32;
+    static constexpr uint32_t MASK = 0xffffffff;
+    static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+    static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    struct read {
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 1;
+        static constexpr uint32_t MASK = 0x00000001;
+        static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+        static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    struct device_address {
+        static constexpr uint32_t SHIFT = 1;
+        static constexpr uint32_t WIDTH = 7;
+        static constexpr uint32_t MASK = 0x000000fe;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    struct register_address {
+        static constexpr uint32_t SHIFT = 8;
+        static constexpr uint32_t WIDTH = 8;
+        static constexpr uint32_t MASK = 0x0000ff00;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    struct byte_count {
+        static constexpr uint32_t SHIFT = 16;
+        static constexpr uint32_t WIDTH = 3;
+        static constexpr uint32_t MASK = 0x00070000;
+        static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+        static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    struct start {
+        static constexpr uint32_t SHIFT = 19;
+        static constexpr uint32_t WIDTH = 1;
+        static constexpr uint32_t MASK = 0x00080000;
+        static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+        static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    static constexpr uint32_t pack(bool read, uint32_t device_address, uint32_t register_address, uint32_t byte_count, bool start) { return start::set(byte_count::set(register_address::set(device_address::set(read::set(0, read), device_address), register_address), byte_count), start); }
+};
+
+// I2C data RX (read)
+struct i2c_data_rx {
+    static constexpr char NAME[] = "i2c_data_rx";
+    static constexpr bool READ = true;
+    static constexpr uint16_t ADDRESS = 0x2;
+    static constexpr uint32_t BANK_SIZE = 1;
+    static constexpr uint16_t address(uint16_t bank = 0) { return ADDRESS + bank; }
+    static constexpr uint32_t SHIFT = 0;
+    static constexpr uint32_t WIDTH = 32;
+    static constexpr uint32_t MASK = 0xffffffff;
+    static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+    static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+};
+
+// I2C data TX (write)
+struct i2c_data_tx {
+    static constexpr char NAME[] = "i2c_data_tx";
+    static constexpr bool READ = false;
+    static constexpr uint16_t ADDRESS = 0x3;
+    static constexpr uint32_t BANK_SIZE = 1;
+    static constexpr uint16_t address(uint16_t bank = 0) { return ADDRESS + bank; }
+    static constexpr uint32_t SHIFT = 0;
+    static constexpr uint32_t WIDTH = 32;
+    static constexpr uint32_t MASK = 0xffffffff;
+    static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+    static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+};
+
+// I2C status (read)
+struct i2c_status {
+    static constexpr char NAME[] = "i2c_status";
+    static constexpr bool READ = true;
+    static constexpr uint16_t ADDRESS = 0x4;
+    static constexpr uint32_t BANK_SIZE = 1;
+    static constexpr uint16_t address(uint16_t bank = 0) { return ADDRESS + bank; }
+    static constexpr uint32_t SHIFT = 0;
+    static constexpr uint32_t WIDTH = 32;
+    static constexpr uint32_t MASK = 0xffffffff;
+    static constexpr uint32_t get(uint32_t word) { return (word & MASK) >> SHIFT; }
+    static constexpr uint32_t set(uint32_t word, uint32_t value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    struct busy {
+        static constexpr uint32_t SHIFT = 0;
+        static constexpr uint32_t WIDTH = 1;
+        static constexpr uint32_t MASK = 0x00000001;
+        static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+        static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    struct error {
+        static constexpr uint32_t SHIFT = 1;
+        static constexpr uint32_t WIDTH = 1;
+        static constexpr uint32_t MASK = 0x00000002;
+        static constexpr bool get(uint32_t word) { return (word & MASK) != 0; }
+        static constexpr uint32_t set(uint32_t word, bool value) { return (word & ~MASK) | ((uint32_t(value) << SHIFT) & MASK); }
+    };
+    static constexpr uint32_t pack(bool busy, bool error) { return error::set(busy::set(0, busy), error); }
+};
+
+}
@@ -0,0 +1,65 @@
+#include "fanuc_encoders.h"
+
+static Driver_Registrar<fanuc_encoders> registrar("fanuc_encoders");
+
+namespace enc_regs = fanuc_encoders_registers;
+using enc = enc_regs::encoder;
+
+uint32_t fanuc_encoders::load_config(json* config, std::string module_name, Node_Core* node_core, fpga_instructions* fpga_instr){
+    this->node_core = node_core;
+    this->fpga_instr = fpga_instr;
+    this->config = config;
+
+    loader.setup(module_name, config, &base_mem);
+
+    node_address = loader.get_node_index();
+
+    if(!loader.check_map_hash(enc_regs::MAP_HASH)){
+        std::cerr << "Failed to load config, fanuc_encoders_registers.h is out of date" << std::endl;
+        return 1;
+    }
+
+    if(custom_load_config() != 0){
+        std::cerr << "Failed to load custom config" << std::endl;
+        return 1;
+    }
+
+    return 0;
+}
+
+uint32_t fanuc_encoders::custom_load_config(){
+
+    // registers are located from fanuc_encoders_registers.h, load_config() has already checked it matches the bitstream
+    multiturn_count = loader.get_register<enc::multiturn_count>(enc::multiturn_count::address(0));
+    loader.sync_with_PS(multiturn_count);
+    singleturn_count = loader.get_register<enc::singleturn_count>(enc::singleturn_count::address(0));
+    loader.sync_with_PS(singleturn_count);
+    commutation_count = loader.get_register<enc::commutation_count>(enc::commutation_count::address(0));
+    loader.sync_with_PS(commutation_count);
+    status = loader.get_register<enc::status>(enc::status::address(0));
+    loader.sync_with_PS(status);
+
+
+    encoder_pos = singleturn_count->get_raw_data_ptr<uint32_t>();
+    encoder_multiturn_count = multiturn_count->get_raw_data_ptr<uint32_t>();
+
+    return 0;
+}
+
+uint32_t fanuc_encoders::run(){
+    
+    if(*microseconds > old_microseconds + 1000000){
+        // std::cout << "Encoder multiturn count: " << multiturn_count->get_value() << std::endl;
+        std::cout << "Encoder single turn count: " << (singleturn_count->get_value()) << std::endl;
+        // std::cout << "Encoder commutation count: " << commutation_count->get_value() << std::endl;
+        // uint32_t status_word = *status->get_raw_data_ptr<uint32_t>();
+        //std::cout << "Encoder CRC error: " << enc::status::crc_fail::get(status_word) << std::endl;
+        //std::cout << "Encoder no response: " << enc::status::no_response::get(status_word) << std::endl;
+        //std::cout << "Encoder unindexed: " << enc::status::unindexed::get(status_word) << std::endl;
+        //std::cout << "Encoder battery fail: " << enc::status::battery_fail::get(status_word) << std::endl;
+        //std::cout << "Encoder done: " << enc::status::done::get(status_word) << std::endl << std::endl;
+        old_microseconds = *microseconds;
+    }
+
+    return 0;
+}
\ No newline at end of file
@@ -0,0 +1,43 @@
+#include "global_timers.h"
+
+static Driver_Registrar<global_timers> registrar("global_timers");
+
+namespace timer_regs = global_timers_registers;
+
+uint32_t global_timers::load_config(json* config, std::string module_name, Node_Core* node_core, fpga_instructions* fpga_instr){
+    this->node_core = node_core;
+    this->fpga_instr = fpga_instr;
+    this->config = config;
+
+    loader.setup(module_name, config, &base_mem);
+
+    node_address = loader.get_node_index();
+
+    if(!loader.check_map_hash(timer_regs::MAP_HASH)){
+        std::cerr << "Failed to load config, global_timers_registers.h is out of date" << std::endl;
+        return 1;
+    }
+
+    if(custom_load_config() != 0){
+        std::cerr << "Failed to load custom config" << std::endl;
+        return 1;
+    }
+
+    return 0;
+}
+
+uint32_t global_timers::custom_load_config(){
+
+    // timer_values.push_back(loader.get_register<timer_regs::counter>(timer_regs::counter::address(0)));
+    // loader.sync_with_PS(timer_values[0]);
+
+    // timer_values[0]->set_value(100);
+
+
+    return 0;
+}
+
+uint32_t global_timers::run(){
+    // do nothing for now
+    return 0;
+}
\ No newline at end of file
@@ -2,6 +2,8 @@
 
 static Driver_Registrar<serial_interface_card> registrar("serial_interface_card");
 
+namespace card_regs = serial_interface_card_registers;
+
 serial_interface_card::serial_interface_card(){
 }
 
@@ -17,6 +19,11 @@ uint32_t serial_interface_card::load_config(json* config, std::string module_nam
 
     node_address = loader.get_node_index();
 
+    if(!loader.check_map_hash(card_regs::MAP_HASH)){
+        std::cerr << "Failed to load config, serial_interface_card_registers.h is out of date" << std::endl;
+        return 1;
+    }
+
     if(custom_load_config() != 0){
         std::cerr << "Failed to load custom config" << std::endl;
         return 1;
@@ -28,8 +35,8 @@ uint32_t serial_interface_card::load_config(json* config, std::string module_nam
 
 uint32_t serial_interface_card::custom_load_config(){
 
-    // load register from config json
-    auto port_mode_enable = loader.get_register("port_mode_enable", 0);
+    // registers are located from serial_interface_card_registers.h, load_config() has already checked it matches the bitstream
+    regs2.port_mode_enable = loader.get_register<card_regs::port_mode_enable>();
 
     // create PS/PL node varaiable to sync with
     /* 
@@ -50,32 +57,22 @@ uint32_t serial_interface_card::custom_load_config(){
 
     */
 
-    //loader.sync_with_PS(port_mode_enable);
-    // auto cpy = loader.sync_with_PS_new(port_mode_enable);
+    //loader.sync_with_PS(regs2.port_mode_enable);
+    // auto cpy = loader.sync_with_PS_new(regs2.port_mode_enable);
     // cpy->set_time_reference(0);
     // cpy->set_execution_window(0, 1000);
     // cpy->set_write_priority();
-    regs2.rs485_mode_enable = port_mode_enable->get_register("rs485_mode_enable");
-    regs2.rs422_mode_enable = port_mode_enable->get_register("rs422_mode_enable");
-    regs2.quadrature_mode_enable = port_mode_enable->get_register("rs422_mode_enable");
-
-    auto i2c_config = loader.get_register("i2c_config", 0);
-    //loader.sync_with_PS(i2c_config);
-    regs2.i2c_config_read_mode = i2c_config->get_register("read");
-    regs2.i2c_config_device_address = i2c_config->get_register("device_address");
-    regs2.i2c_config_reg_address = i2c_config->get_register("register_address");
-    regs2.i2c_config_data_length = i2c_config->get_register("byte_count");
-    regs2.i2c_config_start = i2c_config->get_register("start");
-
-    regs2.i2c_data_tx = loader.get_register("i2c_data_tx", 0);
+
+    regs2.i2c_config = loader.get_register<card_regs::i2c_config>();
+    //loader.sync_with_PS(regs2.i2c_config);
+
+    regs2.i2c_data_tx = loader.get_register<card_regs::i2c_data_tx>();
     //loader.sync_with_PS(regs2.i2c_data_tx);
-    regs2.i2c_data_rx = loader.get_register("i2c_data_rx", 0);
+    regs2.i2c_data_rx = loader.get_register<card_regs::i2c_data_rx>();
     //loader.sync_with_PS(regs2.i2c_data_rx);
 
-    auto i2c_status = loader.get_register("i2c_status", 0);
-    //loader.sync_with_PS(i2c_status);
-    regs2.i2c_status_busy = i2c_status->get_register("busy");
-    regs2.i2c_status_error = i2c_status->get_register("error");
+    regs2.i2c_status = loader.get_register<card_regs::i2c_status>();
+    //loader.sync_with_PS(regs2.i2c_status);
     
 
     // test print instructions
@@ -208,13 +205,16 @@ uint32_t serial_interface_card::run(){
 void serial_interface_card::run_i2c_transfers(){
     // should be called in the run function
 
-    if(regs2.i2c_status_busy->get_value()){ // busy bit set
+    // whole words with compile time masks, this runs every cycle
+    uint32_t status = *regs2.i2c_status->get_raw_data_ptr<uint32_t>();
+
+    if(card_regs::i2c_status::busy::get(status)){ // busy bit set
         // TODO: might want to add a timeout here
         return;
     }
 
 
-    if(regs2.i2c_status_error->get_value()){ // error bit set
+    if(card_regs::i2c_status::error::get(status)){ // error bit set
         i2c_consecutive_error_count++;
     }
     else{
@@ -232,11 +232,7 @@ void serial_interface_card::run_i2c_transfers(){
 
     i2c_transfer transfer = i2c_transfers[last_i2c_transfer];
 
-    regs2.i2c_config_read_mode->set_value(transfer.read);
-    regs2.i2c_config_data_length->set_value(transfer.data_length);
-    regs2.i2c_config_device_address->set_value(transfer.device_address);
-    regs2.i2c_config_reg_address->set_value(transfer.reg_address);
-    regs2.i2c_config_start->set_value(1);
+    *regs2.i2c_config->get_raw_data_ptr<uint32_t>() = card_regs::i2c_config::pack(transfer.read, transfer.device_address, transfer.reg_address, transfer.data_length, true);
 
     
     if(!transfer.read){ // if its a write, copy the data to the tx register
@@ -295,21 +291,22 @@ uint32_t serial_interface_card::configure_port_mode(uint8_t port, port_mode mode
 
     port_modes[port] = mode;
 
-    uint32_t hdl_config = 0;
+    uint32_t rs485_ports = 0;
+    uint32_t rs422_ports = 0;
     for(int i = 0; i < 10; i++){
         if(port_modes[i] == port_mode::RS485){
-            hdl_config |= 0b1 << i;
+            rs485_ports |= 0b1 << i;
         }
         else if(port_modes[i] == port_mode::RS422){
-            hdl_config |= 0b1 << (i+10);
+            rs422_ports |= 0b1 << i;
         }
 
         // else{   // both inputs (not yet implemented)
-        //     hdl_config |= 0b1 << (i+20);
+        //     quadrature_ports |= 0b1 << i;
         // }
     }
 
-    *(regs2.rs485_mode_enable->get_raw_data_ptr<uint32_t>()) = hdl_config;
+    *(regs2.port_mode_enable->get_raw_data_ptr<uint32_t>()) = card_regs::port_mode_enable::pack(rs485_ports, rs422_ports, 0);
 
     return 0;
 }
\ No newline at end of file
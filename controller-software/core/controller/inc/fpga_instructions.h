@@ -11,7 +11,10 @@ enum instruction_type : uint8_t {
     END = 0,
     NOP = 1,
     COPY = 2,
-    WAIT = 3
+    WAIT = 3,   // WAIT_CYCLES, stall for the number of cycles in bits 0-31
+    COPY_BLOCK = 4,
+    WAIT_EVENT = 5,
+    COPY_MULTICAST = 6
 };
 
 static uint64_t create_instruction_END(){
@@ -31,6 +34,25 @@ static uint64_t create_instruction_COPY(uint8_t src_node, uint16_t src_addr, uin
     return  ((uint64_t)src_node << 0) | ((uint64_t)dst_node << 8) | ((uint64_t)src_addr << 16) | ((uint64_t)dst_addr << 32) | ((uint64_t)instruction_type::COPY << 48);
 }
 
+static uint64_t create_instruction_COPY_BLOCK(uint8_t src_node, uint16_t src_addr, uint8_t dst_node, uint16_t dst_addr, uint16_t length){
+    // copies length consecutive words (max 4095), the controller issues one word per cycle
+    // source and destination addresses are incremented for each word
+    return  ((uint64_t)src_node << 0) | ((uint64_t)dst_node << 8) | ((uint64_t)src_addr << 16) | ((uint64_t)dst_addr << 32) | ((uint64_t)instruction_type::COPY_BLOCK << 48) | ((uint64_t)(length & 0xFFF) << 52);
+}
+
+static uint64_t create_instruction_COPY_MULTICAST(uint8_t src_node, uint16_t src_addr, uint16_t dst_addr, uint16_t node_mask){
+    // copies one word to dst_addr of every node in the mask (bit n is node n), only nodes 0-15 of a ring can be multicast destinations
+    // the mask replaces the destination node, nodes 0-7 go in bits 8-15 and nodes 8-15 in bits 52-59
+    return  ((uint64_t)src_node << 0) | ((uint64_t)(node_mask & 0xFF) << 8) | ((uint64_t)src_addr << 16) | ((uint64_t)dst_addr << 32) | ((uint64_t)instruction_type::COPY_MULTICAST << 48) | ((uint64_t)(node_mask >> 8) << 52);
+}
+
+static uint64_t create_instruction_WAIT_EVENT(uint16_t events, uint32_t timeout){
+    // stalls until any event in the mask happens since the start of the dma cycle (events are consumed when the wait ends)
+    // event bits 0-7 are the global timer pulses, bits 8-15 are the done flags of nodes 1-8
+    // timeout is in dma cycles, 0 waits forever
+    return ((uint64_t)events << 0) | ((uint64_t)timeout << 16) | ((uint64_t)instruction_type::WAIT_EVENT << 48);
+}
+
 
 
 class fpga_instructions{
@@ -1,6 +1,7 @@
 #include <stdint.h>
 #include <string>
 #include <poll.h>
+#include <vector>
 
 #pragma once
 
@@ -23,6 +24,48 @@ struct fpga_mem_layout {
     uint32_t PS_to_PL_dma_instructions_size=0;   // size of the memory in 8 bit words
 
     uint32_t data_memory_size=0;    // size of the data memory in 32 bit words
+
+    uint32_t transfer_lengths_offset=0;    // offset of the transfer lengths in the PS to PL control memory
+    uint32_t cycle_period_offset=0;    // offset of the update period in the PS to PL control memory
+    uint32_t cycle_clock_frequency=0;  // clock the update period is counted in (Hz)
+    uint32_t cycle_timestamps_offset=0;    // offset of the phase timestamps in the PL to PS control memory
+    uint32_t overrun_counter_offset=0;    // offset of the overrun counter in the PL to PS control memory
+    uint32_t transfer_descriptors_offset=0;    // offset of the transfer descriptor tables from the OCM base
+    uint32_t transfer_descriptors=0;    // entries in each transfer descriptor table
+    uint32_t axi_coherent=0;    // the FPGA accesses the OCM through the ACP, so the caches never need to be flushed or invalidated
+};
+
+struct fpga_transfer_descriptor {
+    // one contiguous piece of a data region the FPGA transfers, all values in bytes and multiples of 8
+    uint32_t region_offset=0;   // offset in the OCM data region (PS to PL or PL to PS)
+    uint32_t length=0;
+    uint32_t memory_offset=0;   // offset in the FPGA data memory
+};
+
+enum fpga_overrun_policy {
+    // what the FPGA does with a trigger that comes while the last cycle is still running
+    FPGA_OVERRUN_SKIP = 0,  // drop it, the next cycle starts on the next trigger
+    FPGA_OVERRUN_IMMEDIATE = 1, // start the late cycle as soon as the running one finishes, keeping the trigger phase
+    FPGA_OVERRUN_STRETCH = 2,   // start the late cycle as soon as the running one finishes and restart the trigger timer from there
+};
+
+struct fpga_cycle_info {
+    // describes the last finished FPGA cycle, whose results are in the current PL to PS data
+    // timestamps are in 100Mhz clock cycles from a free running 32 bit counter, only differences are meaningful
+
+    uint32_t status=0;  // bits 0-3 instruction bank the DMA ran from, bit 4 overrun
+    uint32_t sequence=0;    // cycle number, increments by one every cycle (0 until the first cycle finished)
+
+    uint32_t dma_start=0;
+    uint32_t dma_done=0;
+    uint32_t axi_start=0;   // the AXI transfer that ran alongside the DMA cycle (moving the data of the cycle before it)
+    uint32_t axi_done=0;
+
+    uint32_t overruns=0;    // total triggers that came while a cycle was still running
+
+    bool overrun() const { return status & (1 << 4); }  // the cycle timer expired before the cycle finished
+    uint32_t dma_cycles() const { return dma_done - dma_start; }
+    uint32_t axi_cycles() const { return axi_done - axi_start; }
 };
 
 
@@ -47,7 +90,22 @@ public:
 
     uint32_t wait_for_update();   // wait for new data from the FPGA to be ready
 
-    uint32_t set_update_frequency(uint32_t frequency);    // frequency at which the FPGA will update in Hz
+    uint32_t wait_for_feedback();   // wait for new data from the FPGA, returns before the FPGA has read the PS to PL memory
+    uint32_t wait_for_update_done();    // wait for the FPGA to finish reading the PS to PL memory, call after wait_for_feedback before writing it
+
+    fpga_cycle_info get_cycle_info();  // status, sequence number and phase timestamps of the cycle in the current update, read after wait_for_update
+
+    uint32_t set_update_frequency(double frequency);    // frequency at which the FPGA will update in Hz
+
+    uint32_t set_instruction_bank(uint32_t run_bank, uint32_t upload_bank, bool upload);  // select which instruction bank runs and which one the next transfer uploads into, banks must be below ocm_layout::INSTRUCTION_BANKS
+
+    uint32_t set_overrun_policy(fpga_overrun_policy policy);   // what to do when a cycle takes longer than the update period
+
+    uint32_t set_transfer_lengths(uint32_t PS_to_PL_data_words, uint32_t PL_to_PS_data_words, uint32_t instruction_words);  // how many 64 bit words of each region the FPGA transfers, 0 transfers the whole region
+
+    uint32_t set_transfer_descriptors(const std::vector<fpga_transfer_descriptor>& PS_to_PL, const std::vector<fpga_transfer_descriptor>& PL_to_PS);  // transfer only these pieces of the data regions, an empty list transfers the region set by set_transfer_lengths
+
+    uint32_t set_descriptor_upload(bool upload);    // upload the transfer descriptors on the next update, set by set_transfer_descriptors
 
     void cache_flush_all(); // writes any changed data from CPU to memory
     void cache_invalidate_all();    // invalidates cached memory from FPGA
@@ -57,13 +115,21 @@ public:
 private:
     fpga_mem_layout mem_layout;
 
-    uint16_t* fpga_main_trigger_counter = nullptr;    // 16 bit counter at 25 Mhz
+    uint32_t* fpga_cycle_period = nullptr;    // whole clock cycles per update, 0 stops the FPGA
+    uint16_t* fpga_cycle_period_fraction = nullptr;    // 1/65536 clock cycles added to every period
+    uint16_t* fpga_instruction_bank_control = nullptr;    // bits 0-3 running bank, bits 4-7 upload bank, bit 8 upload enable, bits 9-10 overrun policy, bit 11 descriptor upload
+    uint64_t* fpga_transfer_descriptors = nullptr;    // PS to PL table then PL to PS table
+    uint16_t* fpga_transfer_lengths = nullptr;    // PS to PL data, PL to PS data and instruction lengths in 64 bit words
+    volatile uint32_t* fpga_status = nullptr;    // status, sequence number
+    volatile uint32_t* fpga_cycle_timestamps = nullptr;    // dma start, dma done, axi start, axi done
+    volatile uint32_t* fpga_overrun_counter = nullptr;
     bool first_cycle = true;
 
     void* ocm_base_pointer;
 
     struct pollfd mem_update_running_fds[1];
     struct pollfd mem_update_done_fds[1];
+    struct pollfd feedback_ready_fds[1];
     
     void cache_flush(void* addr, uint32_t size);
     void cache_invalidate(void* addr, uint32_t size);
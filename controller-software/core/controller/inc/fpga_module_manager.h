@@ -65,7 +65,17 @@ private:
     uint32_t allocated_PL_PS_address = 0;
 
     std::vector<uint64_t> fpga_instructions_old;
-    bool instructions_modified = false;
+
+    // what the last upload sent, the program is uploaded again when the instructions or the allocated memory change
+    std::vector<uint64_t> uploaded_instructions;
+    uint32_t uploaded_PS_PL_address = 0;
+    uint32_t uploaded_PL_PS_address = 0;
+    bool instructions_uploaded = false;
+
+    // the FPGA holds two instruction banks, new instructions are uploaded into the idle one and swapped in on the next update
+    uint32_t instruction_bank = 0;
+    uint32_t instruction_bank_count = 2;
+    bool instruction_upload_pending = false;
 
     fpga_instructions fpga_instr = fpga_instructions();
 
@@ -0,0 +1,27 @@
+// generated by controller-firmware/python/src/ocm_layout.py, do not edit
+// must match the driver settings of the controller_config.json of the loaded bitstream
+
+#pragma once
+
+#include <stdint.h>
+
+namespace ocm_layout {
+
+constexpr uint32_t OCM_BASE_ADDR = 0xf0000;
+constexpr uint32_t OCM_SIZE = 0x8000;
+constexpr uint32_t INSTRUCTION_BANKS = 0x2;
+
+constexpr uint32_t PS_TO_PL_CONTROL_OFFSET = 0x0;
+constexpr uint32_t PS_TO_PL_CONTROL_SIZE = 0x40;
+constexpr uint32_t PL_TO_PS_CONTROL_OFFSET = 0x80;
+constexpr uint32_t PL_TO_PS_CONTROL_SIZE = 0x40;
+constexpr uint32_t PS_TO_PL_DATA_OFFSET = 0x100;
+constexpr uint32_t PS_TO_PL_DATA_SIZE = 0x1000;
+constexpr uint32_t PL_TO_PS_DATA_OFFSET = 0x1100;
+constexpr uint32_t PL_TO_PS_DATA_SIZE = 0x1000;
+constexpr uint32_t PS_TO_PL_DMA_INSTRUCTION_OFFSET = 0x2100;
+constexpr uint32_t PS_TO_PL_DMA_INSTRUCTION_SIZE = 0x4000;
+constexpr uint32_t AXI_DESCRIPTOR_OFFSET = 0x6100;
+constexpr uint32_t AXI_DESCRIPTOR_SIZE = 0x200;
+
+}
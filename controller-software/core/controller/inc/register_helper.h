@@ -82,6 +82,8 @@ class Register {
         PL_data pl_data;
         PS_data ps_data;
 
+        Register(const PL_data& pl_data, std::string full_name);  // register with known location, see Address_Map_Loader::get_register<R>()
+
         bool is_sub_register = false;
 
         std::string full_name;
@@ -164,6 +166,9 @@ class Address_Map_Loader {
         template <typename T = uint32_t>
         Register* get_register(std::string register_name, uint16_t index);    // get a full register, types are only for checking compatibility
 
+        template <typename R>
+        Register* get_register(uint16_t address = R::address());    // get a full register from a generated <module>_registers.h, address is R::address() of the instance
+
         Group* get_group(std::string group_name, uint16_t index);    // get a group of registers
 
         void sync_with_PS(Register* reg);    // sync a register with the PS, only needed for parent registers (not sub-registers), must be called before sub-registers are created
@@ -172,6 +177,8 @@ class Address_Map_Loader {
 
         uint8_t get_node_index();    // get the node index
 
+        bool check_map_hash(const char* map_hash);    // check the map in the config is the one a generated register header was built from
+
         std::vector<uint64_t>* instructions = nullptr;
 
     private:
@@ -188,7 +195,9 @@ class Address_Map_Loader {
 
         uint8_t node_index = 255;
 
-        Group* base_group = nullptr;
+        Group* base_group = nullptr;    // parsed on the first lookup by name
+
+        Group* get_base_group();
 
         //fpga_instructions* fpga_instr = nullptr;
 
@@ -222,6 +231,24 @@ class Dynamic_Register{
 
 };
 
+template <typename R>
+Register* Address_Map_Loader::get_register(uint16_t address){
+    // the location comes from the compile time constants of the header, call check_map_hash() once to make sure they match the loaded bitstream
+    Register::PL_data pl_data;
+    pl_data.name = R::NAME;
+    pl_data.absolute_address = address;
+    pl_data.index = address - R::ADDRESS;    // word offset of this instance, keeps the full names of group/bank instances unique
+    pl_data.bank_size = R::BANK_SIZE;
+    pl_data.width = R::WIDTH;
+    pl_data.starting_bit = R::SHIFT;
+    pl_data.bit_mask = R::MASK >> R::SHIFT;    // mask is not shifted to the correct position, it is just the correct width
+    pl_data.read = R::READ;
+    pl_data.write = !R::READ;
+    pl_data.node_index = node_index;
+
+    return new Register(pl_data, module_name + ":" + std::to_string(module_index) + "." + pl_data.name + ":" + std::to_string(pl_data.index));
+}
+
 template <typename T>
 bool Address_Map_Loader::load_json_value(const json& config, const std::string& value_name, T* dest){
     // helper function for loading values from the config file
@@ -307,7 +307,7 @@ uint32_t fpga_instructions::condense_instructions(){
         uint32_t diff = instruction->dma_execution_cycle - prev_send_cycle;
         if(diff > 2){
             cycle += diff - 1;
-            condensed_instructions.push_back(create_instruction_WAIT(cycle));
+            condensed_instructions.push_back(create_instruction_WAIT(diff - 1));    // wait counts are relative
             index++;
         }
         // else if(diff == 2){
@@ -323,7 +323,8 @@ uint32_t fpga_instructions::condense_instructions(){
     }
 
     // add a final wait to ensure all instructions are completed
-    condensed_instructions.push_back(create_instruction_WAIT(cycle + settings.full_cycles));
+    condensed_instructions.push_back(create_instruction_WAIT(settings.full_cycles));
+    cycle += settings.full_cycles;
     index++;
 
     condensed_instructions.push_back(create_instruction_END());
@@ -1,4 +1,5 @@
 #include "fpga_interface.h"
+#include "ocm_layout.h"
 #include <memory.h>
 #include <sys/stat.h>
 #include <sys/mman.h>
@@ -9,6 +10,7 @@
 #include <iostream>
 #include <chrono>
 #include <thread>
+#include <cmath>
 
 
 //size_t page_size = sysconf(_SC_PAGESIZE);
@@ -57,15 +59,30 @@ uint32_t Fpga_Interface::initialize(const fpga_mem_layout mem_layout, std::strin
         throw std::runtime_error("Failed to open /dev/uio2");
     }
 
+    auto uioFd5 = open("/dev/uio5", O_RDWR);
+    if(uioFd5 < 0) {
+        throw std::runtime_error("Failed to open /dev/uio5");
+    }
+
     mem_update_running_fds[0].fd = uioFd1;
     mem_update_running_fds[0].events = POLLIN;
 
     mem_update_done_fds[0].fd = uioFd2;
     mem_update_done_fds[0].events = POLLIN;
 
+    feedback_ready_fds[0].fd = uioFd5;
+    feedback_ready_fds[0].events = POLLIN;
+
     error_if_nullptr();
 
-    fpga_main_trigger_counter = (uint16_t*)((char*)ocm_base_pointer + mem_layout.PS_to_PL_control_base_addr_offset);
+    fpga_cycle_period = (uint32_t*)((char*)ocm_base_pointer + mem_layout.PS_to_PL_control_base_addr_offset + mem_layout.cycle_period_offset);
+    fpga_cycle_period_fraction = (uint16_t*)((char*)ocm_base_pointer + mem_layout.PS_to_PL_control_base_addr_offset + mem_layout.cycle_period_offset + 4);
+    fpga_instruction_bank_control = (uint16_t*)((char*)ocm_base_pointer + mem_layout.PS_to_PL_control_base_addr_offset + 2);
+    fpga_transfer_lengths = (uint16_t*)((char*)ocm_base_pointer + mem_layout.PS_to_PL_control_base_addr_offset + mem_layout.transfer_lengths_offset);
+    fpga_status = (volatile uint32_t*)((char*)ocm_base_pointer + mem_layout.PL_to_PS_control_base_addr_offset);
+    fpga_cycle_timestamps = (volatile uint32_t*)((char*)ocm_base_pointer + mem_layout.PL_to_PS_control_base_addr_offset + mem_layout.cycle_timestamps_offset);
+    fpga_overrun_counter = (volatile uint32_t*)((char*)ocm_base_pointer + mem_layout.PL_to_PS_control_base_addr_offset + mem_layout.overrun_counter_offset);
+    fpga_transfer_descriptors = (uint64_t*)((char*)ocm_base_pointer + mem_layout.transfer_descriptors_offset);
 
 
 
@@ -78,7 +95,7 @@ uint32_t Fpga_Interface::initialize(const fpga_mem_layout mem_layout, std::strin
         return 2;   // file does not exist
     }
 
-    *fpga_main_trigger_counter = 0; // setting to zero will hault the FPGA
+    *fpga_cycle_period = 0; // setting to zero will hault the FPGA
     cache_flush_all();
     // sleep for a bit to make sure the FPGA has time to stop
     std::this_thread::sleep_for(std::chrono::milliseconds(10));
@@ -88,11 +105,12 @@ uint32_t Fpga_Interface::initialize(const fpga_mem_layout mem_layout, std::strin
     memset((char*)ocm_base_pointer + mem_layout.PS_to_PL_control_base_addr_offset, 0, mem_layout.PS_to_PL_control_size);
     memset((char*)ocm_base_pointer + mem_layout.PS_to_PL_data_base_addr_offset, 0, mem_layout.PS_to_PL_data_size);
     memset((char*)ocm_base_pointer + mem_layout.PS_to_PL_dma_instructions_base_addr_offset, 0, mem_layout.PS_to_PL_dma_instructions_size);
+    memset(fpga_transfer_descriptors, 0, mem_layout.transfer_descriptors * 2 * sizeof(uint64_t));
     
     //memcpy((char*)ocm_base_pointer + PS_to_PL_data_base_addr_offset, new uint32_t(0x1234567), 4);
     //memcpy((char*)ocm_base_pointer + PS_to_PL_dma_instructions_base_addr_offset, new uint64_t(0x0002000004000000), 8);
     
-    *fpga_main_trigger_counter = 0xFFFF; // set back to maximum for lowest update frequency
+    *fpga_cycle_period = 0x40000; // set back to the power on period (~381hz)
 
     cache_flush_all();
 
@@ -105,6 +123,7 @@ uint32_t Fpga_Interface::initialize(const fpga_mem_layout mem_layout, std::strin
     uint32_t val = 1;
     write(mem_update_running_fds[0].fd, &val, sizeof(val));
     write(mem_update_done_fds[0].fd, &val, sizeof(val));
+    write(feedback_ready_fds[0].fd, &val, sizeof(val));
 
     // load bitstream
     int ret = system(("sudo fpgautil -b " + bitstreamPath).c_str());
@@ -117,20 +136,123 @@ uint32_t Fpga_Interface::initialize(const fpga_mem_layout mem_layout, std::strin
     return 0;
 }
 
-uint32_t Fpga_Interface::set_update_frequency(uint32_t frequency) {
+uint32_t Fpga_Interface::set_update_frequency(double frequency) {
     // set the frequency at which the FPGA will update
     // frequency is in Hz
+    // the period is set in 1/65536 clock cycles, single periods are whole cycles but the FPGA carries the fraction so the average is exact
 
     error_if_nullptr();
 
-    if(frequency < 25e6 / 0xffff) {
+    if(frequency < mem_layout.cycle_clock_frequency / (double)0xFFFFFFFF) {
         return 1;   // frequency too low
     }
-    if(frequency > 20e3) {  // capped at 20 kHz
+    if(frequency > 50e3) {  // capped at 50 kHz
         return 2;   // frequency too high
     }
 
-    *fpga_main_trigger_counter = 25e6 / frequency;
+    uint64_t period = std::llround(mem_layout.cycle_clock_frequency * 65536.0 / frequency);
+    *fpga_cycle_period_fraction = period & 0xFFFF;
+    *fpga_cycle_period = period >> 16;
+
+    return 0;
+}
+
+uint32_t Fpga_Interface::set_instruction_bank(uint32_t run_bank, uint32_t upload_bank, bool upload) {
+    // the FPGA only reads the instruction memory while upload is set, and only switches banks between DMA cycles
+    // so a new program should be uploaded into the bank that is not running, then switched to on the next update
+
+    error_if_nullptr();
+
+    if(run_bank >= ocm_layout::INSTRUCTION_BANKS || upload_bank >= ocm_layout::INSTRUCTION_BANKS) {
+        return 1;   // bank out of range, the FPGA only decodes the bits for its banks so it would run/overwrite a different one
+    }
+
+    *fpga_instruction_bank_control = (*fpga_instruction_bank_control & ~0x1FF) | run_bank | (upload_bank << 4) | ((upload ? 1 : 0) << 8);
+
+    return 0;
+}
+
+uint32_t Fpga_Interface::set_overrun_policy(fpga_overrun_policy policy) {
+    // an overrun is always counted, the policy only decides if the late cycle still runs
+    // skipping keeps every cycle on the trigger grid, the other policies keep every cycle but run some of them late
+
+    error_if_nullptr();
+
+    if(policy > FPGA_OVERRUN_STRETCH) {
+        return 1;   // unknown policy
+    }
+
+    *fpga_instruction_bank_control = (*fpga_instruction_bank_control & ~(0x3 << 9)) | (policy << 9);
+
+    return 0;
+}
+
+uint32_t Fpga_Interface::set_transfer_lengths(uint32_t PS_to_PL_data_words, uint32_t PL_to_PS_data_words, uint32_t instruction_words) {
+    // the FPGA only moves the start of each region over AXI, so shorter lengths mean a shorter memory update
+    // the PL to PS length can take one extra update to apply, as that data is written back while the control memory is read
+
+    error_if_nullptr();
+
+    if(PS_to_PL_data_words * 8 > mem_layout.PS_to_PL_data_size || PL_to_PS_data_words * 8 > mem_layout.PL_to_PS_data_size || instruction_words * 8 > mem_layout.PS_to_PL_dma_instructions_size) {
+        return 1;   // length out of range
+    }
+
+    fpga_transfer_lengths[0] = PS_to_PL_data_words;
+    fpga_transfer_lengths[1] = PL_to_PS_data_words;
+    fpga_transfer_lengths[2] = instruction_words;
+
+    return 0;
+}
+
+uint32_t Fpga_Interface::set_transfer_descriptors(const std::vector<fpga_transfer_descriptor>& PS_to_PL, const std::vector<fpga_transfer_descriptor>& PL_to_PS) {
+    // the FPGA reads the tables on the next update and uses them from the update after that
+    // the FPGA keeps using them until new ones are uploaded, so turn the upload off with set_descriptor_upload(false) after the next update
+
+    error_if_nullptr();
+
+    if(PS_to_PL.size() > mem_layout.transfer_descriptors || PL_to_PS.size() > mem_layout.transfer_descriptors) {
+        return 1;   // too many descriptors
+    }
+
+    const std::vector<fpga_transfer_descriptor>* tables[2] = {&PS_to_PL, &PL_to_PS};
+    const uint32_t region_offsets[2] = {mem_layout.PS_to_PL_data_base_addr_offset, mem_layout.PL_to_PS_data_base_addr_offset};
+    const uint32_t region_sizes[2] = {mem_layout.PS_to_PL_data_size, mem_layout.PL_to_PS_data_size};
+
+    for(int table = 0; table < 2; table++) {
+        for(const fpga_transfer_descriptor& descriptor : *tables[table]) {
+            if(descriptor.region_offset % 8 || descriptor.length % 8 || descriptor.memory_offset % 8 || descriptor.length == 0) {
+                return 2;   // not a whole number of 64 bit words
+            }
+            if(descriptor.region_offset + descriptor.length > region_sizes[table] || descriptor.memory_offset + descriptor.length > mem_layout.data_memory_size * 4) {
+                return 3;   // out of range
+            }
+        }
+    }
+
+    for(int table = 0; table < 2; table++) {
+        uint64_t* entries = fpga_transfer_descriptors + table * mem_layout.transfer_descriptors;
+        for(uint32_t i = 0; i < mem_layout.transfer_descriptors; i++) {
+            if(i < tables[table]->size()) {
+                const fpga_transfer_descriptor& descriptor = (*tables[table])[i];
+                entries[i] = (uint64_t)((region_offsets[table] + descriptor.region_offset) / 8)
+                    | (uint64_t)(descriptor.length / 8) << 16
+                    | (uint64_t)(descriptor.memory_offset / 8) << 32;
+            }
+            else {
+                entries[i] = 0; // the first empty entry ends the table
+            }
+        }
+    }
+
+    return set_descriptor_upload(true);
+}
+
+uint32_t Fpga_Interface::set_descriptor_upload(bool upload) {
+    // every upload swaps the table the FPGA uses, uploading the same tables again is harmless but makes the update longer
+
+    error_if_nullptr();
+
+    *fpga_instruction_bank_control = (*fpga_instruction_bank_control & ~(1 << 11)) | ((upload ? 1 : 0) << 11);
 
     return 0;
 }
@@ -195,6 +317,82 @@ uint32_t Fpga_Interface::wait_for_update() {
 
 }
 
+uint32_t Fpga_Interface::wait_for_feedback() {
+    // like wait_for_update, but returns as soon as the PL to PS memory of the update is in the OCM
+    // the FPGA may still be reading the PS to PL memory, so it must not be written until wait_for_update_done returns
+    int ret = 0;
+    uint32_t val = 1;
+    uint32_t count;
+
+    ret = poll(mem_update_running_fds, 1, 0); // check if the update has already started, this is bad and means we missed the interrupt
+    if(ret > 0) {
+        read(mem_update_running_fds[0].fd, &count, sizeof(count)); // clear the interrupt
+        write(mem_update_running_fds[0].fd, &val, sizeof(val)); // clear the interrupt
+        if(first_cycle){
+            first_cycle = false;
+            return 0;   // first cycle, ok to miss the interrupt
+        }
+        std::cout << "FPGA interrupt missed" << std::endl;
+        return 1;   // update already started
+    }
+
+    ret = poll(mem_update_running_fds, 1, 5); // Wait up to 5ms for the update to start
+    if(ret <= 0) {
+        std::cout << "Timeout waiting for FPGA update start" << std::endl;
+        return 2;   // timeout
+    }
+    read(mem_update_running_fds[0].fd, &count, sizeof(count)); // clear the interrupt
+
+    write(feedback_ready_fds[0].fd, &val, sizeof(val)); // the feedback interrupt is low from the start of the update until the data is written
+    ret = poll(feedback_ready_fds, 1, 1); // wait up to 1ms for the data
+    read(feedback_ready_fds[0].fd, &count, sizeof(count)); // clear the interrupt
+
+    if(ret <= 0) {
+        write(mem_update_running_fds[0].fd, &val, sizeof(val)); // clear the start interrupt
+        std::cout << "Timeout waiting for FPGA feedback" << std::endl;
+        return 3;   // timeout
+    }
+
+    first_cycle = false;
+    return 0;
+}
+
+uint32_t Fpga_Interface::wait_for_update_done() {
+    // finishes the update started by wait_for_feedback, after this the PS to PL memory can be written again
+    int ret = 0;
+    uint32_t val = 1;
+    uint32_t count;
+
+    write(mem_update_done_fds[0].fd, &val, sizeof(val)); // clear the done interrupt
+    ret = poll(mem_update_done_fds, 1, 1); // wait up to 1ms for the update to finish
+    read(mem_update_done_fds[0].fd, &count, sizeof(count)); // clear the interrupt
+    write(mem_update_running_fds[0].fd, &val, sizeof(val)); // clear the start interrupt
+
+    if(ret <= 0) {
+        std::cout << "Timeout waiting for FPGA update finish" << std::endl;
+        return 3;   // timeout
+    }
+
+    return 0;
+}
+
+fpga_cycle_info Fpga_Interface::get_cycle_info() {
+    // the FPGA writes these with the rest of the PL to PS control memory, so they cost no extra AXI transfers
+
+    error_if_nullptr();
+
+    fpga_cycle_info info;
+    info.status = fpga_status[0];
+    info.sequence = fpga_status[1];
+    info.dma_start = fpga_cycle_timestamps[0];
+    info.dma_done = fpga_cycle_timestamps[1];
+    info.axi_start = fpga_cycle_timestamps[2];
+    info.axi_done = fpga_cycle_timestamps[3];
+    info.overruns = *fpga_overrun_counter;
+
+    return info;
+}
+
 void* Fpga_Interface::get_PS_to_PL_control_pointer(uint32_t offset) {
     error_if_nullptr();
     return (char*)ocm_base_pointer + mem_layout.PS_to_PL_control_base_addr_offset + offset;
@@ -229,12 +427,19 @@ void Fpga_Interface::cache_invalidate(void* addr, uint32_t size) {
 }
 
 void Fpga_Interface::cache_flush_all() {
+    if(mem_layout.axi_coherent) {
+        return; // the ACP snoops the CPU caches
+    }
     cache_flush((char*)ocm_base_pointer + mem_layout.PS_to_PL_control_base_addr_offset, mem_layout.PS_to_PL_control_size);
     cache_flush((char*)ocm_base_pointer + mem_layout.PS_to_PL_data_base_addr_offset, mem_layout.PS_to_PL_data_size);
     cache_flush((char*)ocm_base_pointer + mem_layout.PS_to_PL_dma_instructions_base_addr_offset, mem_layout.PS_to_PL_dma_instructions_size);
+    cache_flush(fpga_transfer_descriptors, mem_layout.transfer_descriptors * 2 * sizeof(uint64_t));
 }
 
 void Fpga_Interface::cache_invalidate_all() {
+    if(mem_layout.axi_coherent) {
+        return;
+    }
     cache_invalidate((char*)ocm_base_pointer + mem_layout.PL_to_PS_data_base_addr_offset, mem_layout.PL_to_PS_data_size);
     cache_invalidate((char*)ocm_base_pointer + mem_layout.PL_to_PS_control_base_addr_offset, mem_layout.PL_to_PS_control_size);
 }
@@ -1,7 +1,9 @@
 #include "fpga_module_manager.h"
 #include "fpga_module_driver_factory.h"
+#include "ocm_layout.h"
 #include <fstream>
 #include <chrono>
+#include <algorithm>
 
 fpga_module_manager::fpga_module_manager(){
     config = json::object();
@@ -56,11 +58,45 @@ uint32_t fpga_module_manager::load_mem_layout(){
     success &= load_json_value(driver_settings_json, "PS_TO_PL_DMA_INSTRUCTION_OFFSET", &mem_layout.PS_to_PL_dma_instructions_base_addr_offset);
     success &= load_json_value(driver_settings_json, "PS_TO_PL_DMA_INSTRUCTION_SIZE", &mem_layout.PS_to_PL_dma_instructions_size);
     success &= load_json_value(driver_settings_json, "DATA_MEMORY_SIZE", &mem_layout.data_memory_size);
+    success &= load_json_value(driver_settings_json, "INSTRUCTION_BANKS", &instruction_bank_count);
+    success &= load_json_value(driver_settings_json, "TRANSFER_LENGTHS_OFFSET", &mem_layout.transfer_lengths_offset);
+    success &= load_json_value(driver_settings_json, "CYCLE_PERIOD_OFFSET", &mem_layout.cycle_period_offset);
+    success &= load_json_value(driver_settings_json, "CYCLE_CLOCK_FREQUENCY", &mem_layout.cycle_clock_frequency);
+    success &= load_json_value(driver_settings_json, "CYCLE_TIMESTAMPS_OFFSET", &mem_layout.cycle_timestamps_offset);
+    success &= load_json_value(driver_settings_json, "OVERRUN_COUNTER_OFFSET", &mem_layout.overrun_counter_offset);
+    success &= load_json_value(driver_settings_json, "AXI_DESCRIPTOR_OFFSET", &mem_layout.transfer_descriptors_offset);
+    success &= load_json_value(driver_settings_json, "AXI_DESCRIPTORS", &mem_layout.transfer_descriptors);
+    success &= load_json_value(driver_settings_json, "AXI_COHERENT", &mem_layout.axi_coherent);
 
     if (!success) {
         std::cerr << "Error: Failed to load driver data from config." << std::endl;
         return 1;
     }
+
+    // the layout is generated with the bitstream, a config from a different build would have the FPGA and the PS use different memory
+    const uint32_t layout[][2] = {
+        {mem_layout.OCM_BASE_ADDR, ocm_layout::OCM_BASE_ADDR},
+        {mem_layout.OCM_SIZE, ocm_layout::OCM_SIZE},
+        {mem_layout.PS_to_PL_control_base_addr_offset, ocm_layout::PS_TO_PL_CONTROL_OFFSET},
+        {mem_layout.PS_to_PL_control_size, ocm_layout::PS_TO_PL_CONTROL_SIZE},
+        {mem_layout.PL_to_PS_control_base_addr_offset, ocm_layout::PL_TO_PS_CONTROL_OFFSET},
+        {mem_layout.PL_to_PS_control_size, ocm_layout::PL_TO_PS_CONTROL_SIZE},
+        {mem_layout.PS_to_PL_data_base_addr_offset, ocm_layout::PS_TO_PL_DATA_OFFSET},
+        {mem_layout.PS_to_PL_data_size, ocm_layout::PS_TO_PL_DATA_SIZE},
+        {mem_layout.PL_to_PS_data_base_addr_offset, ocm_layout::PL_TO_PS_DATA_OFFSET},
+        {mem_layout.PL_to_PS_data_size, ocm_layout::PL_TO_PS_DATA_SIZE},
+        {mem_layout.PS_to_PL_dma_instructions_base_addr_offset, ocm_layout::PS_TO_PL_DMA_INSTRUCTION_OFFSET},
+        {mem_layout.PS_to_PL_dma_instructions_size, ocm_layout::PS_TO_PL_DMA_INSTRUCTION_SIZE},
+        {mem_layout.transfer_descriptors_offset, ocm_layout::AXI_DESCRIPTOR_OFFSET},
+        {instruction_bank_count, ocm_layout::INSTRUCTION_BANKS},
+    };
+    for (const auto& value : layout) {
+        if (value[0] != value[1]) {
+            std::cerr << "Error: OCM layout in config does not match ocm_layout.h, rebuild the software with the header of the loaded bitstream." << std::endl;
+            return 1;
+        }
+    }
+
     return 0;
 }
 
@@ -164,13 +200,42 @@ uint32_t fpga_module_manager::run_update(){
 
 uint32_t fpga_module_manager::write_instructions_to_fpga(){
     // write the instructions to the FPGA memory
+    // the FPGA only reads them back while an upload is requested, so unchanged instructions cost no AXI bandwidth
     // TODO: add support for multiple instruction blocks (when instruction count becomes very large)
+
+    if(instruction_upload_pending){
+        // the last transfer loaded the idle bank, start running it
+        instruction_bank = (instruction_bank + 1) % instruction_bank_count;
+        instruction_upload_pending = false;
+        fpga_interface->set_instruction_bank(instruction_bank, instruction_bank, false);
+        return 0;
+    }
+
+    // drivers edit the instructions directly (Dynamic_Register) and can allocate more PS memory at any time, so compare against the last upload
+    if(instructions_uploaded && fpga_instructions_old == uploaded_instructions
+        && allocated_PS_PL_address == uploaded_PS_PL_address && allocated_PL_PS_address == uploaded_PL_PS_address){
+        return 0;
+    }
+
     uint32_t index = 0;
     for(auto instruction : fpga_instructions_old){
         reinterpret_cast<uint64_t*>(PS_PL_dma_instructions_ptr)[index] = instruction;
         index++;
     }
 
+    // only transfer the data the drivers use, 0 would transfer the whole region so unused regions still move 1 word
+    uint32_t PS_to_PL_data_words = std::max<uint32_t>((allocated_PS_PL_address + 7) / 8, 1);
+    uint32_t PL_to_PS_data_words = std::max<uint32_t>((allocated_PL_PS_address + 7) / 8, 1);
+    fpga_interface->set_transfer_lengths(PS_to_PL_data_words, PL_to_PS_data_words, index);
+
+    fpga_interface->set_instruction_bank(instruction_bank, (instruction_bank + 1) % instruction_bank_count, true);
+    instruction_upload_pending = true;
+
+    uploaded_instructions = fpga_instructions_old;
+    uploaded_PS_PL_address = allocated_PS_PL_address;
+    uploaded_PL_PS_address = allocated_PL_PS_address;
+    instructions_uploaded = true;
+
     return 0;
 }
 
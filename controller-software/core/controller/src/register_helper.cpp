@@ -20,6 +20,12 @@ Register::Register(json* json_data, const std::string register_name, uint16_t re
     full_name = prefix_name + "." + pl_data.name + ":" + std::to_string(pl_data.index);
 }
 
+Register::Register(const PL_data& pl_data, std::string full_name){
+    // register from the constants of a generated <module>_registers.h, nothing is looked up
+    this->pl_data = pl_data;
+    this->full_name = full_name;
+}
+
 Register::~Register(){
 }
 
@@ -36,10 +42,19 @@ void Address_Map_Loader::setup(std::string name, json* config, fpga_mem* base_me
 
     node_index = (*config)[module_name]["node_address"].get<uint8_t>();
 
-    json data = (*config)[module_name]["node"];
+    // the register map is only parsed when a register is looked up by name, drivers that use the generated register header never parse it
+    base_group = nullptr;
+}
+
+Group* Address_Map_Loader::get_base_group(){
+    // parse the register map of the module on the first lookup by name
+    if(base_group == nullptr){
+        json data = (*config)[module_name]["node"];
 
-    base_group = new Group(&data, "base_group", 1, 0, "");
-    base_group->full_name = module_name + ":" + std::to_string(module_index);    // override the base group name to just be the module name
+        base_group = new Group(&data, "base_group", 1, 0, "");
+        base_group->full_name = module_name + ":" + std::to_string(module_index);    // override the base group name to just be the module name
+    }
+    return base_group;
 }
 
 Register* Address_Map_Loader::get_register_by_full_name(std::string full_name){
@@ -55,6 +70,22 @@ uint8_t Address_Map_Loader::get_node_index(){
     return node_index;
 }
 
+bool Address_Map_Loader::check_map_hash(const char* map_hash){
+    // check the map in the config is the one a generated register header was built from
+    // the header addresses are compile time constants, so a different bitstream would silently access the wrong registers
+
+    std::string config_hash;
+    if(!load_json_value((*config)[module_name]["node"], "map_hash", &config_hash)){
+        return false;
+    }
+
+    if(config_hash != map_hash){
+        std::cerr << "Error: Register map of " << module_name << " (" << config_hash << ") does not match the register header (" << map_hash << "), regenerate the headers with the bitstream" << std::endl;
+        return false;
+    }
+    return true;
+}
+
 Dynamic_Register::Dynamic_Register(Address_Map_Loader* loader, Register* reg){
     this->instructions = loader->instructions;
     loader->sync_with_PS(reg);
@@ -268,6 +299,9 @@ Group* Group::get_group(std::string group_name, uint16_t index){
 template <typename T>
 Register* Register::get_register(std::string register_name){
     // get a sub-register, no index needed
+    if(json_data == nullptr){
+        throw std::runtime_error("Register has no map data, use the get/set helpers of its generated header for sub-registers");
+    }
     json data = (*json_data)["sub_registers"];
     auto reg = new Register(&data, register_name, 0, 0, full_name);
     reg->is_sub_register = true;
@@ -290,7 +324,7 @@ Register* Address_Map_Loader::get_register(std::string register_name, uint16_t i
     // allowed return types are automatically found by the bit width of the register and the type of the variable defined in the json file
     // specifying a larger matching type is acceptable, but specifying a smaller type will throw an error (uint8 -> uint16 is fine, uint16 -> uint8 is not)
     
-    auto reg = base_group->get_register<T>(register_name, index);
+    auto reg = get_base_group()->get_register<T>(register_name, index);
     return reg;
 }
 template Register* Address_Map_Loader::get_register<uint8_t>(std::string register_name, uint16_t index);
@@ -412,7 +446,7 @@ void Address_Map_Loader::verify_type_compatibility(register_json_data* config){
 Group* Address_Map_Loader::get_group(std::string group_name, uint16_t index){
     // get a group of registers
 
-    return base_group->get_group(group_name, index);
+    return get_base_group()->get_group(group_name, index);
 }
 
 void Dynamic_Register::set_register(Register* reg){